@@ -0,0 +1,59 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Arranque en frío: tiempo de importación de cada capa y tiempo hasta el primer
+# paso simulado, cada medición en un intérprete nuevo. También indica qué
+# módulos pesados quedaron cargados (el núcleo no debe traer IPython ni websockets).
+# agentpy se mide aparte: importa matplotlib, scipy y pandas por su cuenta.
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = '''
+import json, sys, time
+inicio = time.perf_counter()
+import agentpy
+agentpy_s = time.perf_counter() - inicio
+import {modulo}
+importacion = time.perf_counter() - inicio
+primer_paso = None
+if {simular}:
+    from modelo import TrafficModel
+    model = TrafficModel()
+    model.setup()
+    model.step()
+    primer_paso = time.perf_counter() - inicio
+print(json.dumps({{'agentpy': agentpy_s, 'import': importacion, 'step': primer_paso,
+                  'cargados': [m for m in ('IPython', 'websockets') if m in sys.modules]}}))
+'''
+
+
+def medir(modulo, simular, repeticiones):
+    muestras = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, '-c', SCRIPT.format(modulo=modulo, simular=simular)],
+                                cwd=RAIZ, capture_output=True, text=True, check=True).stdout
+        muestras.append(json.loads(salida.strip().splitlines()[-1]))
+    mediana = {k: statistics.median(m[k] for m in muestras) for k in ('agentpy', 'import')}
+    mediana['step'] = statistics.median(m['step'] for m in muestras) if simular else None
+    mediana['cargados'] = muestras[0]['cargados']
+    return mediana
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de importación y hasta el primer paso, en frío")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'módulo':>14} {'agentpy s':>10} {'propio s':>9} {'primer paso s':>14}  cargados")
+    for modulo, simular in (('modelo', True), ('servidor', False), ('visualizacion', False)):
+        r = medir(modulo, simular, args.repeat)
+        paso = f"{r['step']:.3f}" if r['step'] is not None else '-'
+        print(f"{modulo:>14} {r['agentpy']:>10.3f} {r['import'] - r['agentpy']:>9.3f} {paso:>14}  {', '.join(r['cargados']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
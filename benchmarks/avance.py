@@ -0,0 +1,71 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapas import generate_city
+from modelo import TrafficModel
+
+# Corridas largas y poco pobladas: la mayor parte del tiempo los coches ya
+# llegaron o esperan en rojo. Compara simular tick por tick contra run_ticks con
+# fast_forward (salta al siguiente evento de semáforo) y verifica que el estado
+# final sea el mismo.
+
+
+def estado(model):
+    model.update()
+    return (tuple(tl.state for tl in model.traffic_lights), tuple(model.grid.positions[c] for c in model.cars),
+            tuple(c.velocity for c in model.cars))
+
+
+def correr(engine, fast_forward, args):
+    random.seed(args.seed)
+    city = generate_city(args.intersecciones, args.intersecciones, cars_per_approach=1)
+    model = TrafficModel({'map': city, 'engine': engine, 'fast_forward': fast_forward})
+    pasos = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+        step = model.step
+
+        def contar():
+            nonlocal pasos
+            pasos += 1
+            step()
+        model.step = contar
+        inicio = time.perf_counter()
+        if fast_forward:
+            model.run_ticks(args.ticks)
+        else:
+            for _ in range(args.ticks):
+                model.step()
+        t = time.perf_counter() - inicio
+    return t, pasos, estado(model)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tick por tick contra avance rápido entre eventos de semáforo")
+    parser.add_argument('--intersecciones', type=int, default=3)
+    parser.add_argument('--ticks', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'motor':>8} {'modo':>13} {'pasos':>8} {'segundos':>9} {'aceleración':>12}")
+    for engine in ('agents', 'vector'):
+        base, referencia = None, None
+        for fast_forward in (False, True):
+            t, pasos, final = correr(engine, fast_forward, args)
+            if referencia is None:
+                base, referencia = t, final
+            assert final == referencia, "El avance rápido cambió el resultado"
+            modo = 'fast_forward' if fast_forward else 'tick a tick'
+            print(f"{engine:>8} {modo:>13} {pasos:>8} {t:>9.3f} {base / t:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
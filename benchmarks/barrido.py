@@ -0,0 +1,44 @@
+import argparse
+import os
+import sys
+import time
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from experimentos import sweep
+
+# Escalamiento del barrido de parámetros con el número de procesos. Todas las
+# corridas tienen el mismo costo (mismo mapa y número de pasos, distinta
+# semilla), y los resultados deben ser idénticos con cualquier número de procesos.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aceleración del barrido contra número de procesos")
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count()} & set(range(1, os.cpu_count() + 1))))
+    parser.add_argument('--runs', type=int, default=32)
+    parser.add_argument('--intersecciones', type=int, default=6)
+    parser.add_argument('--steps', type=int, default=200)
+    args = parser.parse_args()
+
+    configs = [{'intersections': args.intersecciones, 'cars_per_approach': 2, 'cycle_length': 26,
+                'controller': 'fixed', 'routing': 'astar', 'conflicts': 'negotiate', 'seed': seed,
+                'steps': args.steps, 'engine': 'vector'}
+               for seed in range(args.runs)]
+    print(f"{'procesos':>9} {'segundos':>9} {'aceleración':>12} {'eficiencia':>11}")
+    base = referencia = None
+    for workers in args.workers:
+        inicio = time.perf_counter()
+        rows = sweep(configs, workers)
+        t = time.perf_counter() - inicio
+        # NaN (sin viajes completados) no es igual a sí mismo: se compara como None
+        metricas = [{k: None if v != v else v for k, v in row.items() if k != 'seconds'} for row in rows]
+        if referencia is None:
+            base, referencia = t, metricas
+        assert metricas == referencia, "Resultados distintos según el número de procesos"
+        print(f"{workers:>9} {t:>9.2f} {base / t:>11.2f}x {base / t / workers:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import contextlib
+import functools
+import io
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from instantaneas import Checkpoint, checkpoint, fork, resume
+from mapas import generate_city
+from modelo import TrafficModel
+from motor_vectorial import GREEN, RED, STATES
+from rutas import heuristic
+
+# Retomar una corrida desde una instantánea (instantaneas.py) contra volver a
+# simularla desde el tick cero, en el motor de agentes con llegadas continuas y
+# en el vectorial. Mide el tamaño de la instantánea, el tiempo de tomarla y de
+# restaurarla (incluye armar el modelo nuevo), y verifica que la corrida
+# restaurada sigue igual que la original. Después bifurca la instantánea en
+# corridas "¿y si…?" en paralelo: una sin cambios y otras en las que un semáforo
+# de la intersección más cargada se pone en verde en ese momento.
+
+
+def parametros(motor, args):
+    city = generate_city(args.intersecciones, args.intersecciones, block=args.manzana)
+    if motor == 'vector':
+        return {'map': city, 'engine': 'vector'}
+    return {'map': city, 'arrivals': args.arrivals}
+
+
+def estado(model):
+    return checkpoint(model).to_bytes()
+
+
+def dar_verde(light, model):
+    # ¿Y si este semáforo se pone en verde ahora? Los demás de su intersección pasan a rojo.
+    group = light - light % 4
+    states = [GREEN if i == light else RED for i in range(group, min(group + 4, len(model.traffic_lights)))]
+    if model.engine is not None:
+        model.engine.light_state[group:group + len(states)] = states
+    for tl, state in zip(model.traffic_lights[group:group + len(states)], states):
+        tl.state = STATES[state]
+
+
+def resultado(model):
+    if model.fleet is not None:
+        stats = model.fleet.stats()
+        return f"{stats['retired']} viajes, demora {stats['mean_delay']:.1f}"
+    distance = [heuristic(model.grid.positions[car], car.destination) for car in model.cars]
+    return f"{sum(d == 0 for d in distance)} llegaron, distancia restante {sum(distance)}"
+
+
+def medir(motor, args):
+    p = parametros(motor, args)
+    random.seed(args.seed)
+    inicio = time.perf_counter()
+    model = TrafficModel(p)
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+        model.run_ticks(args.ticks)
+    simular = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    data = checkpoint(model).to_bytes()
+    tomar = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    restored = resume(p, Checkpoint.from_bytes(data))
+    restaurar = time.perf_counter() - inicio
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.run_ticks(args.check)
+        restored.run_ticks(args.check)
+    assert estado(model) == estado(restored), "La corrida restaurada se separó de la original"
+    model.end()
+    restored.end()
+    return p, Checkpoint.from_bytes(data), len(data), simular, tomar, restaurar
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Instantáneas: retomar y bifurcar contra volver a simular")
+    parser.add_argument('--intersecciones', type=int, default=8)
+    parser.add_argument('--manzana', type=int, default=6)
+    parser.add_argument('--arrivals', type=float, default=0.02)
+    parser.add_argument('--ticks', type=int, default=1000, help="Tick de la instantánea")
+    parser.add_argument('--check', type=int, default=200, help="Ticks para verificar la corrida restaurada")
+    parser.add_argument('--branches', type=int, default=4)
+    parser.add_argument('--horizon', type=int, default=300, help="Ticks de cada rama")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'motor':>7} {'tick':>6} {'KB':>7} {'simular s':>10} {'tomar ms':>9} {'restaurar ms':>13} {'vs. simular':>12}")
+    for motor in ('agents', 'vector'):
+        p, ck, size, simular, tomar, restaurar = medir(motor, args)
+        print(f"{motor:>7} {args.ticks:>6} {size / 1024:>7.1f} {simular:>10.2f} {tomar * 1e3:>9.1f} "
+              f"{restaurar * 1e3:>13.1f} {simular / restaurar:>11.0f}x")
+
+        # Los semáforos de la intersección con más coches en ese momento
+        busiest = np.bincount(ck.arrays['car_light'][ck.arrays['car_light'] >= 0] // 4).argmax()
+        lights = [4 * int(busiest) + i % 4 for i in range(args.branches - 1)]
+        changes = [None] + [functools.partial(dar_verde, light) for light in lights]
+        inicio = time.perf_counter()
+        resultados = fork(p, ck, changes, args.horizon, measure=resultado, workers=args.workers)
+        tiempo = time.perf_counter() - inicio
+        print(f"{'':>7} {args.branches} ramas de {args.horizon} ticks en {tiempo:.2f} s "
+              f"(sin la instantánea, {args.branches * simular:.2f} s más para volver a simular hasta el tick {args.ticks}); "
+              f"sin cambios: {resultados[0]}")
+        for light, r in zip(lights, resultados[1:]):
+            print(f"{'':>7} verde al semáforo {light}: {r}")
+
+
+if __name__ == "__main__":
+    main()
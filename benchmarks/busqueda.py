@@ -0,0 +1,117 @@
+import argparse
+import heapq
+import os
+import sys
+import time
+
+import numpy as np
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rutas import a_star_search, heuristic
+
+
+# Implementación anterior con diccionarios y búsqueda lineal en el heap, para comparar
+def a_star_search_diccionarios(grid, start, goal):
+    neighbors = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+    close_set = set()
+    came_from = {}
+    gscore = {start: 0}
+    fscore = {start: heuristic(start, goal)}
+    oheap = []
+    heapq.heappush(oheap, (fscore[start], start))
+
+    while oheap:
+        current = heapq.heappop(oheap)[1]
+
+        if current == goal:
+            data = []
+            while current in came_from:
+                data.append(current)
+                current = came_from[current]
+            data.append(start)
+            data.reverse()
+            return data
+
+        close_set.add(current)
+        for i, j in neighbors:
+            neighbor = current[0] + i, current[1] + j
+            tentative_g_score = gscore[current] + 1
+
+            if 0 <= neighbor[0] < grid.shape[0] and 0 <= neighbor[1] < grid.shape[1]:
+                if grid[neighbor[0]][neighbor[1]] == 0:
+                    continue
+            else:
+                continue
+
+            if neighbor in close_set and tentative_g_score >= gscore.get(neighbor, float('inf')):
+                continue
+
+            if tentative_g_score < gscore.get(neighbor, float('inf')) or neighbor not in [i[1] for i in oheap]:
+                came_from[neighbor] = current
+                gscore[neighbor] = tentative_g_score
+                fscore[neighbor] = tentative_g_score + heuristic(neighbor, goal)
+                heapq.heappush(oheap, (fscore[neighbor], neighbor))
+
+    return []
+
+
+def mapa_aleatorio(rng, size, densidad=0.7, esquinas=False):
+    grid = (rng.random((size, size)) < densidad).astype(int)
+    # Calles abiertas cada 10 celdas (y en los bordes) para que el mapa sea conexo
+    grid[::10, :] = grid[:, ::10] = grid[-1, :] = grid[:, -1] = 1
+    celdas = np.argwhere(grid == 1)
+    if esquinas:
+        # Primera y última celda transitable: rutas de esquina a esquina
+        start, goal = celdas[0], celdas[-1]
+    else:
+        start, goal = celdas[rng.choice(len(celdas), 2, replace=False)]
+    return grid, tuple(int(v) for v in start), tuple(int(v) for v in goal)
+
+
+def verificar(rng, casos):
+    # Las rutas deben coincidir con la implementación anterior (misma longitud y mismas celdas)
+    for _ in range(casos):
+        grid, start, goal = mapa_aleatorio(rng, int(rng.integers(5, 60)))
+        esperada = a_star_search_diccionarios(grid, start, goal)
+        obtenida = a_star_search(grid, start, goal)
+        assert len(obtenida) == len(esperada), (start, goal, len(obtenida), len(esperada))
+        assert obtenida == esperada, (start, goal)
+
+
+def medir(funcion, grid, start, goal, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        path = funcion(grid, start, goal)
+    return (time.perf_counter() - inicio) / repeticiones, len(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de a_star_search contra tamaño de mapa")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 100, 250, 500, 1000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--check', type=int, default=300, help="Casos aleatorios a verificar")
+    parser.add_argument('--legacy-max', type=int, default=250,
+                        help="Tamaño máximo en el que también se mide la versión anterior")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    verificar(rng, args.check)
+    print(f"{args.check} rutas aleatorias idénticas a la implementación anterior")
+
+    print(f"{'mapa':>10} {'largo':>7} {'arreglos ms':>12} {'anterior ms':>12}")
+    for size in args.sizes:
+        grid, start, goal = mapa_aleatorio(rng, size, esquinas=True)
+        t, largo = medir(a_star_search, grid, start, goal, args.repeat)
+        anterior = ''
+        if size <= args.legacy_max:
+            t_ant, largo_ant = medir(a_star_search_diccionarios, grid, start, goal, 1)
+            assert largo_ant == largo
+            anterior = f"{t_ant * 1e3:.1f}"
+        print(f"{size:>4}x{size:<5} {largo:>7} {t * 1e3:>12.1f} {anterior:>12}")
+
+
+if __name__ == "__main__":
+    main()
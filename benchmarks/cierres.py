@@ -0,0 +1,102 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapas import generate_city
+from modelo import TrafficModel
+from rutas import a_star_search, path_cache
+
+# Costo de volver a planear tras cerrar una celda (o un tramo de carril) a mitad
+# de la corrida: A* desde cero para cada coche afectado contra la reparación
+# incremental de las distancias a los destinos (DistanceFields) y la lectura de
+# las rutas nuevas. La celda cerrada es la que más rutas cruzan. Las distancias
+# se crean completas la primera vez que se necesitan; eso se mide aparte. Verifica
+# que las rutas reparadas midan lo mismo que las de A*.
+
+
+def preparar(n, args):
+    random.seed(args.seed)
+    path_cache.clear()
+    city = generate_city(n, n, block=args.manzana, cars_per_approach=args.coches)
+    model = TrafficModel({'map': city, 'engine': 'vector'})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+        model.step()  # Todos los coches calculan su ruta con A*
+    return model
+
+
+def cierre(model, lane):
+    # La celda más transitada (sin coches ni destinos encima) y las siguientes `lane` del mismo carril
+    engine = model.engine
+    uses = np.bincount(engine.path_cells, minlength=engine.rows * engine.cols)
+    uses[engine.cell] = 0
+    uses[engine.dest] = 0
+    row, col = divmod(int(np.argmax(uses)), engine.cols)
+    cells = [(row, col + i) for i in range(lane) if col + i < engine.cols and model.grid_map[row, col + i]]
+    return cells
+
+
+def afectados(engine, cells):
+    ids = [r * engine.cols + c for r, c in cells]
+    current = engine.path_start + engine.cursor
+    end = engine.path_start + engine.path_len
+    hits = np.concatenate(([0], np.cumsum(np.isin(engine.path_cells, ids))))
+    return np.flatnonzero((engine.path_len > 0) & (hits[end] > hits[np.minimum(current + 1, end)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replanear tras un cierre: A* completo contra reparación incremental")
+    parser.add_argument('--intersecciones', type=int, nargs='+', default=[8, 16, 32])
+    parser.add_argument('--manzana', type=int, default=8)
+    parser.add_argument('--coches', type=int, default=2, help="Coches por acceso de cada intersección")
+    parser.add_argument('--lane', type=int, default=1, help="Celdas cerradas a lo largo del carril")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'mapa':>9} {'coches':>7} {'afectados':>9} {'A* ms':>8} {'campos ms':>9} {'reparar ms':>10} "
+          f"{'celdas':>8} {'vs. A*':>7}")
+    for n in args.intersecciones:
+        model = preparar(n, args)
+        engine = model.engine
+        cells = cierre(model, args.lane)
+        cars = afectados(engine, cells)
+        goals = {divmod(int(engine.dest[i]), engine.cols) for i in cars}
+
+        # Distancias completas (BFS) de los destinos afectados: se calculan una vez y luego se reparan
+        inicio = time.perf_counter()
+        for goal in goals:
+            model.routes.field(goal)
+        campos = time.perf_counter() - inicio
+
+        # Antes: A* desde cero en el mapa nuevo para cada coche afectado
+        grid = model.grid_map.copy()
+        for cell in cells:
+            grid[cell] = 0
+        inicio = time.perf_counter()
+        referencia = [a_star_search(grid, divmod(int(engine.cell[i]), engine.cols),
+                                    divmod(int(engine.dest[i]), engine.cols)) for i in cars]
+        completo = time.perf_counter() - inicio
+
+        tocadas = model.routes.touched
+        inicio = time.perf_counter()
+        model.edit_cells(cells, 0)
+        reparar = time.perf_counter() - inicio
+        tocadas = model.routes.touched - tocadas
+
+        largos = engine.path_len[cars] - engine.cursor[cars]
+        assert (largos == [len(path) for path in referencia]).all(), "Rutas reparadas de otro largo que las de A*"
+        print(f"{f'{engine.rows}x{engine.cols}':>9} {len(engine.cars):>7} {len(cars):>9} {completo * 1e3:>8.1f} "
+              f"{campos * 1e3:>9.1f} {reparar * 1e3:>10.1f} {tocadas:>8} {completo / reparar:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
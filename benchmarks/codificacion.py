@@ -0,0 +1,75 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapas import generate_city
+from modelo import TrafficModel
+from protocolo import DeltaEncoder, bytes_to_frame, frame_to_bytes, frame_to_json
+
+# Tiempo de codificación y tamaño por mensaje: JSON contra frames binarios,
+# para keyframes (estado completo) y deltas, en ciudades generadas.
+
+
+def verificar(frame):
+    decodificado = bytes_to_frame(frame_to_bytes(frame))
+    assert decodificado['type'] == frame['type'] and decodificado['seq'] == frame['seq']
+    for clave, valor in frame.items():
+        if isinstance(valor, np.ndarray):
+            assert np.array_equal(decodificado[clave], valor), clave
+
+
+def medir(intersecciones, pasos, repeticiones):
+    model = TrafficModel({'map': generate_city(intersecciones, intersecciones, block=10, cars_per_approach=5),
+                          'engine': 'vector'})
+    model.setup()
+    resultados = {}
+    for tipo, intervalo in (('keyframe', 1), ('delta', pasos + 1)):
+        encoder = DeltaEncoder(model, keyframe_interval=intervalo)
+        encoder.frame()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(pasos):
+                model.step()
+        model.update()
+        frame = encoder.frame()
+        assert frame['type'] == tipo
+        verificar(frame)
+
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            texto = json.dumps(frame_to_json(frame))
+        t_json = (time.perf_counter() - inicio) / repeticiones
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            datos = frame_to_bytes(frame)
+        t_binario = (time.perf_counter() - inicio) / repeticiones
+        resultados[tipo] = (len(texto.encode()), t_json, len(datos), t_binario)
+    return len(model.cars), resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Codificación de actualizaciones: JSON contra binario")
+    parser.add_argument('--intersecciones', type=int, nargs='+', default=[2, 10, 30])
+    parser.add_argument('--steps', type=int, default=5, help="Ticks entre el frame base y el delta medido")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'coches':>8} {'tipo':>9} {'JSON B':>10} {'JSON ms':>9} {'bin B':>10} {'bin ms':>8} "
+          f"{'tamaño':>7} {'tiempo':>7}")
+    for n in args.intersecciones:
+        coches, resultados = medir(n, args.steps, args.repeat)
+        for tipo, (b_json, t_json, b_bin, t_bin) in resultados.items():
+            print(f"{coches:>8} {tipo:>9} {b_json:>10} {t_json * 1e3:>9.3f} {b_bin:>10} {t_bin * 1e3:>8.3f} "
+                  f"{b_json / b_bin:>6.1f}x {t_json / t_bin:>6.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import time
+
+import agentpy as ap
+import numpy as np
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modelo import Car, OccupancyGrid, TrafficLight, TrafficModel
+from rutas import path_cache
+
+# Escenario sintético: carriles horizontales con un coche cada dos celdas,
+# todos con semáforo en verde y ruta recta hasta el borde derecho.
+ANCHO = 64
+
+
+class ColisionesModel(TrafficModel):
+    def setup(self):
+        n = self.p['cars']
+        por_carril = ANCHO // 2
+        carriles = -(-n // por_carril)
+        self.grid_map = np.ones((carriles, ANCHO), dtype=int)
+        self.grid = OccupancyGrid(self, self.grid_map.shape, torus=False)
+        self.traffic_lights = ap.AgentList(self, 1, TrafficLight)
+        self.traffic_lights[0].state = "green"
+        self.cars = ap.AgentList(self, n, Car)
+        self.global_timer = 0
+        self.routing = 'astar'
+        self.path_cache = path_cache
+        self.set_map(self.grid_map)
+
+        posiciones = [(i // por_carril, 2 * (i % por_carril)) for i in range(n)]
+        self.grid.add_agents(self.cars, positions=posiciones)
+        for car, (fila, columna) in zip(self.cars, posiciones):
+            car.trafficLight = self.traffic_lights[0]
+            car.destination = [fila, ANCHO - 1]
+            car.path = [(fila, c) for c in range(columna, ANCHO)]
+
+    def step(self):
+        # Sin actualizar el semáforo para que siga en verde durante la medición
+        self.global_timer += 1
+        for car in self.cars:
+            car.update()
+
+
+def check_collision_lineal(self, position):
+    # Implementación anterior (recorre todos los agentes), para comparar
+    for agent in self.model.grid.agents:
+        if agent is not self and self.model.grid.positions[agent] == position:
+            return agent
+    return False
+
+
+def medir(n, pasos):
+    model = ColisionesModel({'cars': n})
+    model.setup()
+    inicio = time.perf_counter()
+    for _ in range(pasos):
+        model.step()
+    return (time.perf_counter() - inicio) / pasos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo de TrafficModel.step contra número de coches")
+    parser.add_argument('--cars', type=int, nargs='+', default=[8, 100, 1000, 10000, 50000])
+    parser.add_argument('--steps', type=int, default=10)
+    parser.add_argument('--lineal-max', type=int, default=2000,
+                        help="Máximo de coches para medir también el recorrido lineal anterior")
+    args = parser.parse_args()
+
+    print(f"{'coches':>8} {'ms/paso':>10} {'us/coche':>10} {'lineal us/coche':>16}")
+    for n in args.cars:
+        t = medir(n, args.steps)
+        lineal = ''
+        if n <= args.lineal_max:
+            indexado = Car.check_collision
+            Car.check_collision = check_collision_lineal
+            try:
+                lineal = f"{medir(n, args.steps) / n * 1e6:.2f}"
+            finally:
+                Car.check_collision = indexado
+        print(f"{n:>8} {t * 1e3:>10.2f} {t / n * 1e6:>10.2f} {lineal:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import resource
+import sys
+import time
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapas import generate_city
+from modelo import TrafficModel
+
+# Prueba de resistencia de la operación continua (flota.py): simula millones de
+# ticks con coches entrando y saliendo y muestra la memoria residente, los
+# coches en el mapa, los del pool y los agentes creados. Tras el calentamiento
+# la memoria debe quedarse plana: los coches que salen se reutilizan y de los
+# viajes solo se guardan totales.
+
+
+def memoria_residente():
+    # MiB residentes del proceso (Linux); en otros sistemas, el máximo alcanzado
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria residente durante una corrida continua larga")
+    parser.add_argument('--intersecciones', type=int, default=2)
+    parser.add_argument('--arrivals', type=float, default=0.003, help="Probabilidad de llegada por entrada y tick")
+    parser.add_argument('--ticks', type=int, default=2_000_000)
+    parser.add_argument('--samples', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    model = TrafficModel({'map': generate_city(args.intersecciones, args.intersecciones), 'arrivals': args.arrivals})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+    fleet = model.fleet
+    agentes = len(model.cars)
+    every = max(1, args.ticks // args.samples)
+    print(f"{len(fleet.entries)} entradas, llegadas {args.arrivals} por entrada y tick, {args.ticks} ticks")
+    print(f"{'tick':>10} {'RSS MiB':>8} {'en mapa':>8} {'pool':>5} {'agentes':>8} {'entraron':>9} {'salieron':>9} "
+          f"{'atorados':>9} {'t. viaje':>9} {'ticks/s':>8}")
+    muestras = []
+    consola = sys.stdout
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) as avisos:
+        for t in range(1, args.ticks + 1):
+            model.step()
+            if t % every == 0:
+                stats = fleet.stats()
+                agentes = max(agentes, stats['active'] + stats['pooled'])
+                muestras.append((t, memoria_residente()))
+                print(f"{t:>10} {muestras[-1][1]:>8.1f} {stats['active']:>8} {stats['pooled']:>5} {agentes:>8} "
+                      f"{stats['spawned']:>9} {stats['retired']:>9} {stats['teleported']:>9} {stats['mean_travel_time']:>9.1f} "
+                      f"{every / (time.perf_counter() - inicio):>8.0f}", file=consola)
+                avisos.seek(0)
+                avisos.truncate()  # Los avisos de rutas no se acumulan
+                inicio = time.perf_counter()
+    if len(muestras) > 2:
+        # Desde la segunda muestra (tras el calentamiento) hasta la última
+        (t0, m0), (t1, m1) = muestras[1], muestras[-1]
+        print(f"Crecimiento tras el calentamiento: {(m1 - m0) * 1024:+.0f} KiB "
+              f"({(m1 - m0) * 1024 / (t1 - t0) * 1e6:+.0f} KiB por millón de ticks)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapas import generate_city
+from modelo import Car, TrafficModel
+from protocolo import car_positions
+from rutas import MOVES, bfs_distances
+
+# Conflictos reactivos (cada coche revisa la celda siguiente y negocia en cada
+# tick) contra planeación cooperativa con reservas (reservas.py) en una ciudad
+# densa: viajes completados, tiempo medio de viaje, ticks detenidos, coches
+# atorados (sin llegar y sin moverse en los últimos --stuck ticks) y costo por
+# tick. Con negotiate se cuentan las revisiones de colisión; con reservations,
+# las veces que un coche planea y los nodos que expande la búsqueda.
+#
+# En generate_city varios coches comparten la celda de salida y el primero que
+# llega se queda ahí, así que los viajes completados tienen un tope. Por eso, por
+# defecto (--salidas distintas) cada coche recibe su propia celda de salida: la
+# libre más cercana a la de siempre. Con --salidas compartidas se usan las del
+# mapa, y el avance (celdas recorridas hacia el destino, por tick) mide el flujo
+# sin ese tope.
+
+
+def salidas_distintas(calc_destino):
+    # Envuelve Car.calcDestino: la salida de siempre o, si otro coche ya la tiene, la celda de calle
+    # libre más cercana (búsqueda en anchura)
+    def calcular(self, posicion, direccion, grid):
+        destino = tuple(int(v) for v in calc_destino(self, posicion, direccion, grid))
+        tomadas = self.model.__dict__.setdefault('salidas_tomadas', set())
+        queue, seen = deque([destino]), {destino}
+        while queue:
+            cell = queue.popleft()
+            if cell not in tomadas:
+                tomadas.add(cell)
+                return list(cell)
+            for dr, dc in MOVES:
+                r, c = cell[0] + dr, cell[1] + dc
+                if 0 <= r < len(grid) and 0 <= c < len(grid[0]) and grid[r][c] != 0 and (r, c) not in seen:
+                    seen.add((r, c))
+                    queue.append((r, c))
+        return list(destino)
+    return calcular
+
+
+def correr(conflicts, args):
+    random.seed(args.seed)
+    city = generate_city(args.intersecciones, args.intersecciones, block=args.manzana,
+                         cars_per_approach=args.coches)
+    model = TrafficModel({'map': city, 'conflicts': conflicts})
+    revisiones = 0
+    check_collision = Car.check_collision
+
+    def contar(self, position):
+        nonlocal revisiones
+        revisiones += 1
+        return check_collision(self, position)
+
+    Car.check_collision = contar
+    calc_destino = Car.calcDestino
+    if args.salidas == 'distintas':
+        Car.calcDestino = salidas_distintas(calc_destino)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.setup()
+            n = len(model.cars)
+            arrival = np.full(n, -1, dtype=np.int64)
+            moved = np.zeros(n, dtype=np.int64)  # Último tick en que se movió cada coche
+            stalls = 0
+            positions = start = car_positions(model)
+            simular = 0.0
+            for t in range(1, args.steps + 1):
+                inicio = time.perf_counter()
+                model.step()
+                simular += time.perf_counter() - inicio
+                new_positions = car_positions(model)
+                if t == 1:
+                    destinations = np.array([car.destination for car in model.cars], dtype=np.int64).reshape(-1, 2)
+                arrived = (new_positions == destinations).all(axis=1)
+                still = (new_positions == positions).all(axis=1)
+                stalls += int((still & ~arrived & (arrival < 0)).sum())
+                moved[~still] = t
+                arrival[arrived & (arrival < 0)] = t
+                positions = new_positions
+    finally:
+        Car.check_collision = check_collision
+        Car.calcDestino = calc_destino
+    fields = {}
+    for destination in map(tuple, destinations):
+        if destination not in fields:
+            fields[destination] = bfs_distances(model.grid_map, destination)
+
+    def distancia(rows):
+        return np.array([fields[tuple(d)][tuple(p)] for d, p in zip(destinations, rows)])
+
+    done = arrival >= 0
+    stuck = int((~done & (moved <= args.steps - args.stuck)).sum())
+    planner = model.planner
+    return {'cars': n, 'trips': int(done.sum()),
+            'travel': float(arrival[done].mean()) if done.any() else float('nan'),
+            'progress': float((distancia(start) - distancia(positions)).sum()) / args.steps,
+            'stalls': stalls, 'stuck': stuck, 'ms': simular / args.steps * 1e3,
+            'checks': revisiones, 'replans': planner.replans if planner else 0,
+            'expansions': planner.expansions if planner else 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conflictos reactivos contra reservas espacio-temporales")
+    parser.add_argument('--intersecciones', type=int, default=4)
+    parser.add_argument('--manzana', type=int, default=6)
+    parser.add_argument('--coches', type=int, default=3, help="Coches por acceso de cada intersección")
+    parser.add_argument('--steps', type=int, default=400)
+    parser.add_argument('--stuck', type=int, default=100, help="Ticks sin moverse para contar un coche como atorado")
+    parser.add_argument('--salidas', choices=['distintas', 'compartidas'], default='distintas',
+                        help="Una celda de salida por coche o las del mapa (con tope de viajes)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    filas = {conflicts: correr(conflicts, args) for conflicts in ('negotiate', 'reservations')}
+    print(f"{filas['negotiate']['cars']} coches, {args.steps} pasos, salidas {args.salidas}")
+    print(f"{'conflictos':>13} {'viajes':>7} {'viajes/100t':>11} {'t. viaje':>9} {'avance/t':>9} {'detenidos':>10} "
+          f"{'atorados':>9} {'ms/tick':>8} {'revisiones':>11} {'planes':>7} {'expansiones':>12}")
+    for conflicts, f in filas.items():
+        print(f"{conflicts:>13} {f['trips']:>7} {f['trips'] / args.steps * 100:>11.1f} {f['travel']:>9.1f} {f['progress']:>9.2f} "
+              f"{f['stalls']:>10} {f['stuck']:>9} {f['ms']:>8.2f} {f['checks']:>11} {f['replans']:>7} "
+              f"{f['expansions']:>12}")
+
+
+if __name__ == "__main__":
+    main()
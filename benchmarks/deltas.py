@@ -0,0 +1,69 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapas import generate_city
+from modelo import TrafficModel
+from protocolo import GONE, DeltaEncoder, full_snapshot
+
+# Bytes por tick del protocolo delta contra el estado completo, en ciudades
+# generadas de distinto tamaño (motor vectorial para llegar a flotas grandes).
+
+
+def aplicar(estado, mensaje):
+    # Lo que haría un cliente: un keyframe reemplaza el estado y un delta lo modifica
+    if mensaje['type'] == 'keyframe':
+        estado.clear()
+    estado.update({('tl', m['id']): m['state'] for m in mensaje['traffic_lights']})
+    for m in mensaje['cars']:
+        if tuple(m['position']) == GONE:
+            estado.pop(('car', m['id']), None)  # Salió del mapa (llegadas continuas)
+        else:
+            estado[('car', m['id'])] = tuple(m['position'])
+
+
+def medir(intersecciones, pasos, keyframes):
+    model = TrafficModel({'map': generate_city(intersecciones, intersecciones, block=6, cars_per_approach=3),
+                          'engine': 'vector'})
+    model.setup()
+    encoder = DeltaEncoder(model, keyframe_interval=keyframes)
+    estado = {}
+    aplicar(estado, encoder.encode())
+    completo = delta = movidos = 0
+    for _ in range(pasos):
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.step()
+        model.update()
+        mensaje = encoder.encode()
+        aplicar(estado, mensaje)
+        snapshot = full_snapshot(model)
+        esperado = {('tl', tl.id): tl.state for tl in model.traffic_lights}
+        esperado.update({('car', car.id): tuple(model.grid.positions[car]) for car in model.cars})
+        assert estado == esperado, mensaje['seq']
+        completo += len(json.dumps(snapshot))
+        delta += len(json.dumps(mensaje))
+        movidos += len(mensaje['cars']) if mensaje['type'] == 'delta' else 0
+    return len(model.cars), completo / pasos, delta / pasos, movidos / pasos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes por tick: estado completo contra deltas con keyframes")
+    parser.add_argument('--intersecciones', type=int, nargs='+', default=[1, 4, 10, 20])
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--keyframes', type=int, default=50, help="Ticks entre keyframes")
+    args = parser.parse_args()
+
+    print(f"{'coches':>8} {'movidos/tick':>13} {'completo B/tick':>16} {'delta B/tick':>13} {'ahorro':>8}")
+    for n in args.intersecciones:
+        coches, completo, delta, movidos = medir(n, args.steps, args.keyframes)
+        print(f"{coches:>8} {movidos:>13.1f} {completo:>16.0f} {delta:>13.0f} {completo / delta:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
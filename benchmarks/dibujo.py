@@ -0,0 +1,78 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapas import generate_city
+from modelo import TrafficModel
+from visualizacion import Renderer, animation_plot
+
+# Tiempo por cuadro de la animación según el tamaño del mapa: animation_plot
+# (un rectángulo por celda, redibujado en cada cuadro) contra Renderer con
+# blitting (fondo dibujado una vez; por cuadro solo semáforos y coches).
+
+
+def modelo(intersections):
+    random.seed(0)
+    model = TrafficModel({'map': generate_city(intersections, intersections)})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+    return model
+
+
+def por_cuadro(model, frames, dibujar):
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(frames):
+            model.step()
+            dibujar()
+    return (time.perf_counter() - inicio) / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo por cuadro: animation_plot contra Renderer con blitting")
+    parser.add_argument('--intersecciones', type=int, nargs='+', default=[1, 3, 6])
+    parser.add_argument('--frames', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'mapa':>9} {'animation_plot ms':>18} {'Renderer ms':>12} {'aceleración':>12}")
+    for n in args.intersecciones:
+        model = modelo(n)
+        fig, ax = plt.subplots()
+
+        def completo():
+            animation_plot(model, ax)
+            fig.canvas.draw()
+        t_completo = por_cuadro(model, args.frames, completo)
+        plt.close(fig)
+
+        model = modelo(n)
+        fig, ax = plt.subplots()
+        renderer = Renderer(model, ax)
+        fig.canvas.draw()
+        fondo = fig.canvas.copy_from_bbox(ax.bbox)
+
+        def blit():
+            fig.canvas.restore_region(fondo)
+            for artist in renderer.draw():
+                ax.draw_artist(artist)
+            fig.canvas.blit(ax.bbox)
+        t_blit = por_cuadro(model, args.frames, blit)
+        plt.close(fig)
+
+        rows, cols = model.grid_map.shape
+        print(f"{f'{rows}x{cols}':>9} {t_completo * 1e3:>18.1f} {t_blit * 1e3:>12.2f} {t_completo / t_blit:>11.0f}x")
+
+
+if __name__ == "__main__":
+    main()
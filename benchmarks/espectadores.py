@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deltas import aplicar
+from difusion import Hub
+from mapas import generate_city
+from modelo import TrafficModel
+from protocolo import DeltaEncoder
+from trabajador import SimulationWorker
+
+# Costo por tick de servir a N espectadores: una simulación por conexión
+# (como simulation_server) contra una simulación compartida con Hub. Verifica
+# además que un cliente lento que se resincroniza termina con el estado correcto.
+
+
+def ciudad(intersecciones):
+    return generate_city(intersecciones, intersecciones, block=6, cars_per_approach=3)
+
+
+def por_conexion(city, espectadores, pasos):
+    sesiones = []
+    for _ in range(espectadores):
+        model = TrafficModel({'map': city, 'engine': 'vector'})
+        model.setup()
+        sesiones.append((model, DeltaEncoder(model)))
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(pasos):
+            for model, encoder in sesiones:
+                model.step()
+                model.update()
+                json.dumps(encoder.encode())
+    return (time.perf_counter() - inicio) / pasos
+
+
+def compartida(city, espectadores, pasos):
+    model = TrafficModel({'map': city, 'engine': 'vector'})
+    model.setup()
+    worker = SimulationWorker(model)
+    hub = Hub(worker.encoder)
+    suscriptores = [hub.subscribe() for _ in range(espectadores)]
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(pasos):
+            worker.tick()
+            hub.publish(worker.ring.latest)
+            for s in suscriptores:
+                while not s.queue.empty():
+                    s.queue.get_nowait().encode(s.encoding)
+    return (time.perf_counter() - inicio) / pasos
+
+
+async def cliente_lento(city, pasos):
+    # Un suscriptor que no lee durante varios ticks: su cola no pasa del límite y,
+    # tras el salto al keyframe, el estado reconstruido coincide con el modelo
+    model = TrafficModel({'map': city, 'engine': 'vector'})
+    model.setup()
+    worker = SimulationWorker(model)
+    hub = Hub(worker.encoder, queue_size=4)
+    rapido, lento = hub.subscribe(), hub.subscribe()
+    estado_rapido, estado_lento = {}, {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for t in range(pasos):
+            worker.tick()
+            hub.publish(worker.ring.latest)
+            assert lento.queue.qsize() <= 4
+            while not rapido.queue.empty():
+                aplicar(estado_rapido, json.loads(await rapido.next()))
+            if t % 10 == 9:
+                while not lento.queue.empty():
+                    aplicar(estado_lento, json.loads(await lento.next()))
+                assert estado_lento == estado_rapido, t
+    return lento.dropped, lento.resyncs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Una simulación por conexión contra una simulación compartida")
+    parser.add_argument('--viewers', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--intersecciones', type=int, default=6)
+    parser.add_argument('--steps', type=int, default=20)
+    args = parser.parse_args()
+    city = ciudad(args.intersecciones)
+
+    descartados, resincronizaciones = asyncio.run(cliente_lento(city, 100))
+    print(f"Cliente lento: {descartados} mensajes descartados, {resincronizaciones} resincronizaciones, "
+          f"estado final correcto")
+
+    print(f"{'espectadores':>12} {'por conexión ms/tick':>21} {'compartida ms/tick':>19} {'ahorro':>8}")
+    for n in args.viewers:
+        separado = por_conexion(city, n, args.steps)
+        junto = compartida(city, n, args.steps)
+        print(f"{n:>12} {separado * 1e3:>21.2f} {junto * 1e3:>19.2f} {separado / junto:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metricas
+from mapas import generate_city
+from modelo import TrafficModel
+
+# Costo de la instrumentación por paso: sin instrumentar, con metricas.enable()
+# y de nuevo tras metricas.disable() (debe volver al costo original).
+
+
+def por_paso(engine, args):
+    random.seed(0)
+    model = TrafficModel({'map': generate_city(args.intersecciones, args.intersecciones), 'engine': engine})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+        model.step()  # Primer paso (rutas) fuera de la medición
+        inicio = time.perf_counter()
+        for _ in range(args.steps):
+            model.step()
+    return (time.perf_counter() - inicio) / args.steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sobrecosto de metricas.enable() por paso")
+    parser.add_argument('--intersecciones', type=int, default=4)
+    parser.add_argument('--steps', type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'motor':>8} {'sin medir µs':>13} {'midiendo µs':>12} {'sobrecosto':>11} {'desactivado µs':>15}")
+    for engine in ('agents', 'vector'):
+        base = por_paso(engine, args)
+        metricas.enable()
+        medido = por_paso(engine, args)
+        metricas.disable()
+        despues = por_paso(engine, args)
+        print(f"{engine:>8} {base * 1e6:>13.0f} {medido * 1e6:>12.0f} {medido / base - 1:>10.0%} {despues * 1e6:>15.0f}")
+    print(f"Funciones medidas: {', '.join(sorted(metricas.registry.histograms))}")
+
+
+if __name__ == "__main__":
+    main()
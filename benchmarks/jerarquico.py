@@ -0,0 +1,79 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import grafo
+from mapas import generate_city, load_city, save_city
+from rutas import a_star_search, map_version, passable_mask
+
+# Planeación de rutas con A* sobre celdas contra A* sobre el grafo de
+# intersecciones (grafo.py), entre pares de calles al azar. "Grafo" es solo la
+# búsqueda (lo que paga un coche al planear; los tramos se expanden al llegar a
+# ellos) y "grafo + celdas" incluye expandir la ruta completa, como hace el motor
+# vectorial. También mide armar el grafo contra leerlo del archivo junto al mapa,
+# y verifica que las rutas midan lo mismo que las de A*.
+
+
+def medir(n, args, carpeta):
+    path = os.path.join(carpeta, f'ciudad{n}.npy')
+    save_city(generate_city(n, n, block=args.manzana), path)
+    city = load_city(path)
+    grid = np.asarray(city.grid)
+    version = map_version(grid)
+
+    grafo._graphs.clear()
+    inicio = time.perf_counter()
+    graph = grafo.load_graph(grid, version, city.source)  # Arma el grafo y lo guarda
+    armar = time.perf_counter() - inicio
+    grafo._graphs.clear()
+    inicio = time.perf_counter()
+    grafo.load_graph(grid, version, city.source)
+    leer = time.perf_counter() - inicio
+
+    rng = random.Random(args.seed)
+    roads = np.argwhere(grid != 0).tolist()
+    pairs = [(tuple(rng.choice(roads)), tuple(rng.choice(roads))) for _ in range(args.routes)]
+    mask = passable_mask(grid)
+    inicio = time.perf_counter()
+    referencia = [a_star_search(grid, start, goal, mask) for start, goal in pairs]
+    celdas = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    for start, goal in pairs:
+        graph.route(start, goal)
+    busqueda = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    rutas = [graph.path(start, goal) for start, goal in pairs]
+    completa = time.perf_counter() - inicio
+    assert [len(r) for r in referencia] == [len(r) for r in rutas], "Rutas del grafo de otro largo que las de A*"
+    return grid, graph, armar, leer, celdas, busqueda, completa
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A* sobre celdas contra A* sobre el grafo de intersecciones")
+    parser.add_argument('--intersecciones', type=int, nargs='+', default=[8, 16, 32])
+    parser.add_argument('--manzana', type=int, default=8)
+    parser.add_argument('--routes', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'mapa':>9} {'calles':>7} {'nodos':>6} {'armar ms':>9} {'leer ms':>8} {'A* ms':>7} "
+          f"{'grafo ms':>9} {'+ celdas ms':>12} {'vs. A*':>7}")
+    with tempfile.TemporaryDirectory() as carpeta:
+        for n in args.intersecciones:
+            grid, graph, armar, leer, celdas, busqueda, completa = medir(n, args, carpeta)
+            por_ruta = 1e3 / args.routes
+            print(f"{f'{grid.shape[0]}x{grid.shape[1]}':>9} {int((grid != 0).sum()):>7} {len(graph.adjacency):>6} "
+                  f"{armar * 1e3:>9.1f} {leer * 1e3:>8.1f} {celdas * por_ruta:>7.2f} {busqueda * por_ruta:>9.2f} "
+                  f"{completa * por_ruta:>12.2f} {celdas / busqueda:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+import agentpy as ap
+import numpy as np
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modelo import Car, OccupancyGrid, TrafficLight, TrafficModel
+from motor_vectorial import VectorEngine
+from rutas import path_cache
+
+# Escenario sintético: carriles horizontales con un coche cada dos celdas y
+# cuatro semáforos en anillo (cada carril obedece a uno de ellos).
+ANCHO = 32
+
+
+class CarrilesModel(TrafficModel):
+    def setup(self):
+        n = self.p['cars']
+        por_carril = ANCHO // 2
+        carriles = -(-n // por_carril)
+        self.grid_map = np.ones((carriles, ANCHO), dtype=int)
+        self.grid = OccupancyGrid(self, self.grid_map.shape, torus=False)
+        self.traffic_lights = ap.AgentList(self, 4, TrafficLight)
+        for i, tl in enumerate(self.traffic_lights):
+            tl.neighbors.append(self.traffic_lights[(i + 1) % 4])
+        self.traffic_lights[0].state = "green"
+        self.cars = ap.AgentList(self, n, Car)
+        self.global_timer = 0
+        self.routing = 'astar'
+        self.path_cache = path_cache
+        self.set_map(self.grid_map)
+
+        posiciones = [(i // por_carril, 2 * (i % por_carril)) for i in range(n)]
+        self.grid.add_agents(self.cars, positions=posiciones)
+        for car, (fila, columna) in zip(self.cars, posiciones):
+            car.trafficLight = self.traffic_lights[fila % 4]
+            car.destination = [fila, ANCHO - 1]
+            car.path = [(fila, c) for c in range(columna, ANCHO)]
+        self.engine = VectorEngine(self) if self.p.get('engine') == 'vector' else None
+
+
+def estado(model):
+    return ([tl.state for tl in model.traffic_lights], [model.grid.positions[c] for c in model.cars],
+            [c.velocity for c in model.cars], [list(c.remaining_path()) for c in model.cars])
+
+
+def verificar(semillas, pasos):
+    # El motor vectorial debe coincidir tick a tick con el de agentes en el escenario de 12x12
+    for routing in ('astar', 'flow'):
+        for seed in range(semillas):
+            models = []
+            for engine in ('agents', 'vector'):
+                random.seed(seed)
+                model = TrafficModel({'engine': engine, 'routing': routing})
+                model.setup()
+                models.append(model)
+            for t in range(pasos):
+                for model in models:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        model.step()
+                        model.update()
+                assert estado(models[0]) == estado(models[1]), (routing, seed, t)
+
+
+def medir(n, engine, pasos):
+    model = CarrilesModel({'cars': n, 'engine': engine})
+    model.setup()
+    inicio = time.perf_counter()
+    for _ in range(pasos):
+        model.step()
+    return pasos / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pasos por segundo: motor de agentes contra motor vectorial")
+    parser.add_argument('--cars', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--steps', type=int, default=20, help="Ticks medidos (los mismos en ambos motores)")
+    parser.add_argument('--check', type=int, default=20, help="Semillas a verificar en el escenario de 12x12")
+    args = parser.parse_args()
+
+    verificar(args.check, 150)
+    print(f"{args.check} semillas x 150 ticks idénticas entre ambos motores (12x12, astar y flow)")
+
+    print(f"{'coches':>8} {'agentes pasos/s':>16} {'vector pasos/s':>15} {'aceleración':>12}")
+    for n in args.cars:
+        agentes = medir(n, 'agents', args.steps)
+        vector = medir(n, 'vector', args.steps)
+        print(f"{n:>8} {agentes:>16.2f} {vector:>15.1f} {vector / agentes:>11.0f}x")
+
+
+if __name__ == "__main__":
+    main()
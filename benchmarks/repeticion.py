@@ -0,0 +1,90 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grabacion import Recording, record_run
+from mapas import generate_city
+from modelo import TrafficModel
+from protocolo import DeltaEncoder, bytes_to_frame, frame_to_bytes
+
+# Costo de repetir una grabación contra volver a simular: tiempo de CPU por tick
+# de simular y codificar en vivo, de leer los frames grabados tal cual (lo que
+# hace el servidor con clientes binarios) y de buscar un tick al azar
+# (keyframe_at). Verifica además que los frames repetidos sean los de la corrida en vivo.
+
+
+def modelo(args):
+    random.seed(args.seed)
+    model = TrafficModel({'map': generate_city(args.intersecciones, args.intersecciones), 'engine': args.engine})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Repetición de una grabación contra simulación en vivo")
+    parser.add_argument('--intersecciones', type=int, default=4)
+    parser.add_argument('--ticks', type=int, default=2000)
+    parser.add_argument('--engine', default='vector', choices=['agents', 'vector'])
+    parser.add_argument('--seeks', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        path = os.path.join(carpeta, 'corrida.trj')
+        model = modelo(args)
+        inicio = time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            record_run(model, path, args.ticks)
+        grabar = time.process_time() - inicio
+
+        # Misma corrida en vivo, sin grabar: simular y codificar cada tick
+        model = modelo(args)
+        encoder = DeltaEncoder(model)
+        vivos = [frame_to_bytes(encoder.frame())]
+        inicio = time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(args.ticks):
+                model.step()
+                vivos.append(frame_to_bytes(encoder.frame()))
+        simular = time.process_time() - inicio
+
+        recording = Recording(path)
+        inicio = time.process_time()
+        repetidos = [bytes(data) for _, data in recording.records(0)]
+        leer = time.process_time() - inicio
+
+        # El primer frame grabado es un keyframe con el mapa; en vivo, el primero es el mismo keyframe sin mapa
+        distintos = sum(a != b for a, b in zip(vivos[1:], repetidos[1:]))
+        primero = bytes_to_frame(repetidos[0])
+        distintos += not all((primero[k] == v).all() if hasattr(v, 'all') else primero[k] == v
+                             for k, v in bytes_to_frame(vivos[0]).items())
+        assert len(repetidos) == len(vivos) and not distintos, f"{distintos} frames repetidos distintos de los en vivo"
+
+        random.seed(args.seed)
+        ticks = [random.randrange(args.ticks + 1) for _ in range(args.seeks)]
+        inicio = time.process_time()
+        for tick in ticks:
+            recording.keyframe_at(tick)
+        buscar = time.process_time() - inicio
+        recording.close()
+        tamaño = os.path.getsize(path)
+
+    n = args.ticks + 1
+    print(f"{n} ticks, {tamaño / 1024:.1f} KiB ({tamaño / n:.0f} B/tick), frames idénticos a los en vivo")
+    print(f"{'operación':>22} {'µs/tick':>10} {'vs. simular':>12}")
+    for nombre, t, cuantos in (('simular y codificar', simular, n), ('simular y grabar', grabar, n),
+                               ('repetir (leer frames)', leer, n), ('buscar tick', buscar, args.seeks)):
+        print(f"{nombre:>22} {t / cuantos * 1e6:>10.1f} {simular / n / (t / cuantos):>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from difusion import Hub
+from mapas import generate_city
+from modelo import TrafficModel
+from trabajador import SimulationWorker
+
+# Ritmo de simulación y respuesta del bucle de asyncio: el paso dentro del bucle
+# (como antes en simulation_server) contra SimulationWorker en su propio hilo.
+# Un latido cada 10 ms mide cuánto se retrasa el bucle.
+
+
+async def latido(retrasos, fin):
+    while not fin.is_set():
+        antes = time.perf_counter()
+        await asyncio.sleep(0.01)
+        retrasos.append(time.perf_counter() - antes - 0.01)
+
+
+def modelo(intersecciones):
+    model = TrafficModel({'map': generate_city(intersecciones, intersecciones, block=6, cars_per_approach=3)})
+    model.setup()
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.step()  # Calentamiento: el primer tick planea las rutas de todos los coches
+    return model
+
+
+async def en_linea(model, ticks, tasa):
+    retrasos, fin = [], asyncio.Event()
+    tarea = asyncio.ensure_future(latido(retrasos, fin))
+    inicio = time.perf_counter()
+    for _ in range(ticks):
+        model.step()
+        model.update()
+        await asyncio.sleep(1 / tasa)
+    fin.set()
+    await tarea
+    return ticks / (time.perf_counter() - inicio), max(retrasos), 0
+
+
+async def en_hilo(model, ticks, tasa):
+    retrasos, fin = [], asyncio.Event()
+    tarea = asyncio.ensure_future(latido(retrasos, fin))
+    worker = SimulationWorker(model, rate=tasa, max_steps=ticks)
+    hub = Hub(worker.encoder)
+    suscriptor = hub.subscribe()
+    seguir = asyncio.ensure_future(hub.follow(worker))
+    inicio = time.perf_counter()
+    while await suscriptor.next() is not None:
+        pass
+    await seguir
+    fin.set()
+    await tarea
+    return ticks / (time.perf_counter() - inicio), max(retrasos), worker.metrics.max_lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ritmo de ticks y retraso del bucle de eventos")
+    parser.add_argument('--intersecciones', type=int, nargs='+', default=[4, 30])
+    parser.add_argument('--ticks', type=int, default=20)
+    parser.add_argument('--rate', type=float, default=10.0, help="Ticks por segundo objetivo")
+    args = parser.parse_args()
+
+    print(f"{'coches':>7} {'modo':>9} {'ticks/s':>8} {'bucle máx. ms':>14} {'retraso máx. ms':>16}")
+    for n in args.intersecciones:
+        for nombre, modo in (('en bucle', en_linea), ('hilo', en_hilo)):
+            model = modelo(n)
+            with contextlib.redirect_stdout(io.StringIO()):
+                tasa, bucle, retraso = asyncio.run(modo(model, args.ticks, args.rate))
+            print(f"{len(model.cars):>7} {nombre:>9} {tasa:>8.1f} {bucle * 1e3:>14.1f} {retraso * 1e3:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
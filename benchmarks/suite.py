@@ -0,0 +1,218 @@
+import argparse
+import asyncio
+import contextlib
+import functools
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from difusion import Message
+from mapas import generate_city
+from modelo import TrafficModel
+from protocolo import DeltaEncoder
+from rutas import a_star_search, passable_mask
+import servidor
+
+# Suite de escalamiento: latencia de A* contra tamaño del mapa, pasos por segundo
+# contra número de coches (de 8 a 100k), memoria por agente y tiempo de
+# codificar y enviar un tick contra el tamaño de la flota. Los resultados se
+# escriben en JSON (--output) y se pueden comparar con una corrida guardada
+# (--baseline): se marca como regresión lo que empeore más que --tolerance.
+#
+#   python benchmarks/suite.py --output base.json
+#   python benchmarks/suite.py --baseline base.json
+
+# Coches por intersección con manzanas de 8 (4 por acceso, ver mapas.generate_city)
+CARS_PER_INTERSECTION = 16
+FLEETS = (8, 100, 1000, 10000, 100000)
+QUICK_FLEETS = (8, 100, 1000)
+AGENTS_MAX_CARS = 10000  # Flotas mayores solo con el motor vectorial y sin la vista de agentes
+
+
+def city_for(cars):
+    # Ciudad cuadrada con al menos `cars` coches; si sobran, se descartan los últimos
+    side = max(1, int(np.ceil(np.sqrt(cars / CARS_PER_INTERSECTION))))
+    city = generate_city(side, side, block=8, cars_per_approach=4)
+    city.cars, city.directions = city.cars[:cars], city.directions[:cars]
+    return city
+
+
+@functools.lru_cache(maxsize=1)  # El paso y el envío de la misma flota comparten modelo
+def build(cars, engine):
+    random.seed(0)
+    model = TrafficModel({'map': city_for(cars), 'engine': engine})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+        model.step()  # Primer paso (cálculo de rutas) fuera de las mediciones
+    return model
+
+
+def timeit(function, repeat, budget=2.0, setup=None):
+    # Mediana de `repeat` ejecuciones (menos si se acaba el presupuesto de segundos);
+    # `setup` corre antes de cada una, fuera de la medición
+    samples, start = [], time.perf_counter()
+    while len(samples) < repeat and (not samples or time.perf_counter() - start < budget):
+        if setup is not None:
+            setup()
+        t = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - t)
+    return statistics.median(samples)
+
+
+def bench_astar(sizes, repeat):
+    for n in sizes:
+        city = generate_city(n, n)
+        grid = np.asarray(city.grid)
+        roads = np.argwhere(grid == 1)
+        start, goal = tuple(map(int, roads[0])), tuple(map(int, roads[-1]))  # Esquinas opuestas
+        mask = passable_mask(grid)
+        t = timeit(lambda: a_star_search(grid, start, goal, mask), repeat)
+        yield f"a_star/grid={grid.shape[0]}x{grid.shape[1]}", t * 1e3, 'ms'
+
+
+def bench_step(cars, repeat):
+    for engine in ('agents', 'vector'):
+        if engine == 'agents' and cars > AGENTS_MAX_CARS:
+            continue
+        model = build(cars, engine)
+        with contextlib.redirect_stdout(io.StringIO()):
+            t = timeit(model.step, repeat)
+        yield f"step/{engine}/cars={cars}", 1 / t, 'steps/s'
+
+
+def bench_memory(cars):
+    # Memoria asignada por el modelo (setup y primer paso) dividida entre agentes
+    for engine in ('agents', 'vector'):
+        random.seed(0)
+        city = city_for(cars)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        model = TrafficModel({'map': city, 'engine': engine})
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.setup()
+            model.step()
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        agents = len(model.cars) + len(model.traffic_lights)
+        yield f"memory/{engine}/cars={cars}", used / agents, 'bytes/agent'
+
+
+class NullSocket:
+    # Conexión que solo cuenta lo enviado (el costo medido es el de servidor.py, no el de la red)
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, data):
+        self.sent += len(data)
+
+
+def bench_send(cars, repeat):
+    model = build(cars, 'vector')
+    websocket = NullSocket()
+    encoder = DeltaEncoder(model)
+    loop = asyncio.new_event_loop()
+
+    def full():
+        loop.run_until_complete(servidor.send_position_update(websocket, model))
+
+    def step():
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.step()
+
+    def delta(encoding):
+        message = Message(encoder.frame())
+        loop.run_until_complete(servidor.send(websocket, message.encode(encoding)))
+
+    try:
+        if cars <= AGENTS_MAX_CARS:
+            # El formato completo lee la vista de agentes (model.update copia todas las rutas)
+            model.update()
+            yield f"send/full_json/cars={cars}", timeit(full, repeat) * 1e3, 'ms'
+        # Antes de cada medición avanza un paso (sin medirlo) para que el delta tenga cambios
+        for encoding in ('json', 'binary'):
+            t = timeit(lambda: delta(encoding), repeat, setup=step)
+            yield f"send/delta_{encoding}/cars={cars}", t * 1e3, 'ms'
+    finally:
+        loop.close()
+
+
+# Sentido de mejora por unidad
+HIGHER_IS_BETTER = {'steps/s'}
+
+
+def compare(results, baseline, tolerance):
+    # Imprime la comparación y devuelve los nombres que empeoraron más que `tolerance`
+    previous = {r['name']: r for r in baseline['results']}
+    regressions = []
+    print(f"\n{'medición':<34} {'base':>12} {'actual':>12} {'cambio':>8}")
+    for r in results:
+        old = previous.get(r['name'])
+        if old is None or not old['value']:
+            print(f"{r['name']:<34} {'-':>12} {r['value']:>12.4g} {'nuevo':>8}")
+            continue
+        ratio = r['value'] / old['value']
+        worse = ratio < 1 - tolerance if r['unit'] in HIGHER_IS_BETTER else ratio > 1 + tolerance
+        flag = '  REGRESIÓN' if worse else ''
+        print(f"{r['name']:<34} {old['value']:>12.4g} {r['value']:>12.4g} {ratio - 1:>+8.0%}{flag}")
+        if worse:
+            regressions.append(r['name'])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite de escalamiento de la simulación y el servidor")
+    parser.add_argument('--quick', action='store_true', help="Solo flotas pequeñas (hasta 1000 coches)")
+    parser.add_argument('--only', nargs='+', choices=['astar', 'step', 'memory', 'send'],
+                        default=['astar', 'step', 'memory', 'send'])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', default=None, help="Archivo JSON donde guardar los resultados")
+    parser.add_argument('--baseline', default=None, help="JSON de una corrida anterior con qué comparar")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Cambio relativo que cuenta como regresión")
+    args = parser.parse_args()
+
+    fleets = QUICK_FLEETS if args.quick else FLEETS
+    benches = []
+    if 'astar' in args.only:
+        benches.append(bench_astar((1, 2, 4, 8) if args.quick else (1, 2, 4, 8, 16, 32), args.repeat))
+    for cars in fleets:
+        if 'step' in args.only:
+            benches.append(bench_step(cars, args.repeat))
+        if 'send' in args.only:
+            benches.append(bench_send(cars, args.repeat))
+    if 'memory' in args.only:
+        benches.append(bench_memory(min(fleets[-1], AGENTS_MAX_CARS)))
+    results = []
+    for bench in benches:
+        for measurement, value, unit in bench:
+            print(f"{measurement:<34} {value:>12.4g} {unit}", flush=True)
+            results.append({'name': measurement, 'value': value, 'unit': unit})
+
+    report = {'meta': {'python': platform.python_version(), 'numpy': np.__version__,
+                       'machine': platform.machine(), 'platform': platform.platform(),
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'args': vars(args)},
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regresiones (tolerancia {args.tolerance:.0%})")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
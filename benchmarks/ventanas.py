@@ -0,0 +1,130 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deltas import aplicar
+from difusion import Hub, Message
+from mapas import generate_city
+from modelo import TrafficModel
+from motor_vectorial import STATES
+from trabajador import SimulationWorker
+from vistas import SpatialIndex
+
+# Bytes y costo de codificación por tick de un suscriptor con viewport (vistas.py)
+# según el área que ve, contra el suscriptor de siempre (la ciudad completa, cuyo
+# frame se codifica una vez para todos). El índice espacial de los coches se arma
+# una vez por tick para todas las áreas y se mide aparte. Verifica que el estado que reconstruye cada cliente coincide con lo que hay en
+# su área, también tras moverla y con un ritmo menor al de la simulación.
+
+
+def esperado(tick, encoder, rect):
+    r0, c0, r1, c1 = rect
+
+    def dentro(p):
+        return r0 <= p[0] < r1 and c0 <= p[1] < c1
+
+    estado = {('tl', i): STATES[s] for i, p, s in zip(encoder.light_ids.tolist(), encoder.light_positions.tolist(),
+                                                tick.states.tolist()) if dentro(p)}
+    estado.update({('car', i): tuple(p) for i, p in zip(tick.car_ids.tolist(), tick.positions.tolist())
+                   if dentro(p)})
+    return estado
+
+
+def area(shape, fraccion):
+    # Rectángulo centrado con `fraccion` del área del mapa
+    lado = fraccion ** 0.5
+    alto, ancho = max(1, round(shape[0] * lado)), max(1, round(shape[1] * lado))
+    r0, c0 = (shape[0] - alto) // 2, (shape[1] - ancho) // 2
+    return r0, c0, r0 + alto, c0 + ancho
+
+
+def medir(args):
+    model = TrafficModel({'map': generate_city(args.intersecciones, args.intersecciones, block=6,
+                                               cars_per_approach=3), 'engine': 'vector'})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+    worker = SimulationWorker(model)
+    shape = model.grid_map.shape
+    fracciones = [None] + [1 / 4 ** k for k in range(args.niveles)]
+    hub = Hub(worker.encoder, ticks_per_second=10)
+    suscriptores = [hub.subscribe('binary', None if f is None else area(shape, f)) for f in fracciones]
+    resultados = [{'json': 0, 'binary': 0, 'tiempo': 0.0, 'coches': 0} for _ in fracciones]
+    estados = [{} for _ in fracciones]
+    for s, estado in zip(suscriptores, estados):
+        aplicar(estado, json.loads(s.queue.get_nowait().encode('json')))
+
+    indice = 0.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(args.steps):
+            worker.tick()
+            tick = worker.ring.latest
+            # Lo que hace Hub.publish, midiendo por separado el índice y cada suscriptor
+            inicio = time.perf_counter()
+            hub.car_index = (tick.seq, SpatialIndex(tick.positions, shape))
+            indice += time.perf_counter() - inicio
+            for s, r, estado in zip(suscriptores, resultados, estados):
+                inicio = time.perf_counter()
+                mensaje = hub.view_message(s.view, tick) if s.view is not None else Message(tick.frame)
+                data = mensaje.encode('binary')
+                r['tiempo'] += time.perf_counter() - inicio
+                r['binary'] += len(data)
+                r['json'] += len(mensaje.encode('json'))
+                aplicar(estado, json.loads(mensaje.encode('json')))
+                if s.view is not None:
+                    r['coches'] += sum(key[0] == 'car' for key in estado)
+                    assert estado == esperado(tick, worker.encoder, s.view.rect), tick.seq
+            hub.latest = tick
+    return shape, len(model.cars), fracciones, suscriptores, resultados, indice / args.steps, worker, hub, estados
+
+
+def verificar_cambios(worker, hub, s, estado, pasos):
+    # Mueve el área a la esquina opuesta y baja el ritmo a 2 por segundo (cada 5 ticks a 10/s); al
+    # pedir una actualización llega en el siguiente tick
+    shape = worker.model.grid_map.shape
+    hub.update_view(s, (shape[0] // 2, shape[1] // 2, shape[0], shape[1]), rate=2)
+    recibidos = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for t in range(pasos):
+            if t == pasos // 2:
+                hub.poll(s)
+            worker.tick()
+            tick = worker.ring.latest
+            hub.publish(tick)
+            while not s.queue.empty():
+                recibidos += 1
+                aplicar(estado, json.loads(s.queue.get_nowait().encode('json')))
+                assert estado == esperado(tick, worker.encoder, s.view.rect), tick.seq
+    return recibidos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes y costo por suscriptor según el área que ve")
+    parser.add_argument('--intersecciones', type=int, default=24)
+    parser.add_argument('--niveles', type=int, default=4, help="Áreas de 1, 1/4, 1/16... del mapa")
+    parser.add_argument('--steps', type=int, default=60)
+    args = parser.parse_args()
+
+    shape, coches, fracciones, suscriptores, resultados, indice, worker, hub, estados = medir(args)
+    print(f"Mapa {shape[0]}x{shape[1]}, {coches} coches, {args.steps} ticks; índice espacial "
+          f"{indice * 1e6:.0f} µs/tick (uno para todas las áreas)")
+    print(f"{'área':>12} {'coches vistos':>14} {'JSON B/tick':>12} {'binario B/tick':>15} {'µs/tick':>9}")
+    for f, s, r in zip(fracciones, suscriptores, resultados):
+        nombre = 'completa' if f is None else f"1/{round(1 / f)}"
+        vistos = f"{r['coches'] / args.steps:.0f}" if s.view is not None else f"{coches}"
+        print(f"{nombre:>12} {vistos:>14} {r['json'] / args.steps:>12.0f} {r['binary'] / args.steps:>15.0f} "
+              f"{r['tiempo'] / args.steps * 1e6:>9.0f}")
+    for s in suscriptores[:-1]:
+        hub.unsubscribe(s)
+    recibidos = verificar_cambios(worker, hub, suscriptores[-1], estados[-1], 30)
+    print(f"Área movida y a 2 actualizaciones/s: {recibidos} frames en 30 ticks, estado correcto")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+# Los módulos del simulador están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mapas import generate_city
+from modelo import TrafficModel
+from rutas import path_cache
+
+# Escalamiento del motor por zonas (particion.py) de 1 a N procesos contra el
+# motor vectorial en un solo proceso: tiempo de preparación (incluye calcular
+# las rutas, en paralelo por zona), pasos por segundo y eficiencia (aceleración
+# respecto a una zona dividida entre el número de procesos). Verifica que el
+# estado final sea idéntico al del motor vectorial.
+
+
+def estado(model):
+    model.update()
+    engine = model.engine
+    return engine.cell.copy(), engine.velocity.copy(), engine.light_state.copy()
+
+
+def correr(engine, workers, args):
+    random.seed(args.seed)
+    path_cache.clear()  # Cada corrida calcula sus rutas
+    city = generate_city(args.intersecciones, args.intersecciones, block=8, cars_per_approach=4)
+    model = TrafficModel({'map': city, 'engine': engine, 'workers': workers})
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        model.setup()
+        model.step()  # Primer paso (rutas en el motor vectorial) dentro de la preparación
+        preparar = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        for _ in range(args.steps):
+            model.step()
+        simular = time.perf_counter() - inicio
+    final = estado(model)
+    model.end()
+    return len(model.cars), preparar, simular, final
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escalamiento del motor por zonas de 1 a N procesos")
+    parser.add_argument('--intersecciones', type=int, default=16, help="Intersecciones por lado")
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help="Número de procesos a probar, además de 1 (por defecto 2, 4... hasta los núcleos)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    cores = os.cpu_count() or 1
+    workers = sorted({1, *(args.workers or [2 ** i for i in range(cores.bit_length())])})
+
+    coches, preparar, simular, referencia = correr('vector', None, args)
+    print(f"{coches} coches, {args.steps} pasos, {cores} núcleos")
+    print(f"{'motor':>8} {'procesos':>8} {'preparar s':>10} {'pasos/s':>9} {'aceleración':>12} {'eficiencia':>10}")
+    print(f"{'vector':>8} {1:>8} {preparar:>10.2f} {args.steps / simular:>9.1f}")
+    for n in workers:
+        _, preparar, simular, final = correr('tiled', n, args)
+        assert all(np.array_equal(a, b) for a, b in zip(final, referencia)), \
+            f"El motor por zonas con {n} procesos cambió el resultado"
+        if n == 1:
+            una = simular
+        print(f"{'tiled':>8} {n:>8} {preparar:>10.2f} {args.steps / simular:>9.1f} {una / simular:>11.2f}x "
+              f"{una / simular / n:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
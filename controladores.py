@@ -0,0 +1,141 @@
+import numpy as np
+
+from motor_vectorial import GREEN, RED, YELLOW
+
+# Controladores de semáforos intercambiables. Un controlador recibe en cada tick
+# los estados de todos los semáforos (índices en STATES) y la demanda de cada
+# acceso, y los actualiza en su lugar:
+#
+#     controller.step(states, queues, now)
+#     controller.next_event(states, queues, now)  # Tick del siguiente cambio posible (fast_forward)
+#
+# next_event se consulta tras un tick en el que ningún coche pudo avanzar: hasta
+# que cambie un semáforo, las posiciones y por lo tanto las colas no cambian, así
+# que el controlador puede decir cuándo volverá a cambiar algo (None si nunca).
+#
+# Cada semáforo controla un acceso (un cuadrante de su intersección, ver
+# mapas.SpatialLookup) y la demanda de un acceso es el número de coches de ese
+# semáforo que avanzarían con verde: los que tienen libre su siguiente celda (o
+# aún no calculan su ruta). Los coches atorados detrás de otros no cuentan, así
+# que un verde no se queda esperando a una cola que no se mueve. Ambos motores
+# la calculan por tick con un bincount (TrafficModel.approach_queues y
+# VectorEngine.approach_queues).
+#
+# Sin controlador (controller='fixed') los semáforos siguen el ciclo fijo de
+# siempre, con el anillo de mensajes. ActuatedController da el verde según
+# las colas, como un semáforo actuado: mantiene el verde mientras su acceso tenga
+# coches (al menos min_green y a lo sumo max_green ticks si otro acceso espera),
+# pasa por amarillo y da el verde al acceso con más coches. Opera sobre todas las
+# intersecciones a la vez, con arreglos de (intersecciones, semáforos por
+# intersección); las intersecciones son los grupos de semáforos del mapa
+# (CityMap.light_groups), cada uno en el orden de su anillo.
+
+MIN_GREEN = 5  # Ticks mínimos de verde antes de cambiar por una cola vacía
+MAX_GREEN = 40  # Ticks máximos de verde si otro acceso espera
+
+
+class ActuatedController:
+    def __init__(self, groups, n_lights, yellow_time, min_green=MIN_GREEN, max_green=MAX_GREEN):
+        if not 0 < min_green <= max_green:
+            raise ValueError(f"Se necesita 0 < min_green <= max_green: {min_green}, {max_green}")
+        groups = [list(group) for group in groups if len(group)]
+        lights = [i for group in groups for i in group]
+        if len(set(lights)) != len(lights) or not all(0 <= i < n_lights for i in lights):
+            raise ValueError("Los grupos de semáforos deben ser disjuntos y de semáforos del mapa")
+        self.n_lights = n_lights
+        self.groups = len(groups)
+        self.size = max((len(group) for group in groups), default=1)
+        # Semáforo de cada acceso de cada intersección (-1 en los que faltan a las más chicas)
+        self.index = np.full((self.groups, self.size), -1, dtype=np.int64)
+        for row, group in zip(self.index, groups):
+            row[:len(group)] = group
+        self.present = self.index >= 0
+        self.yellow_time = yellow_time
+        self.min_green = min_green
+        self.max_green = max_green
+        self.active = None  # Acceso en verde (o en amarillo) de cada intersección
+        self.since = None  # Tick en el que entró en ese estado
+        self.switches = 0
+
+    def start(self, states, now):
+        # Parte del estado actual: el primer semáforo en verde (o amarillo) de cada intersección
+        grid = self.grid(states, RED)
+        lit = grid != RED
+        self.active = np.where(lit.any(axis=1), lit.argmax(axis=1), 0)
+        rows = np.arange(self.groups)
+        grid[:] = RED
+        grid[rows, self.active] = GREEN
+        self.write(states, grid)
+        self.since = np.full(self.groups, now, dtype=np.int64)
+
+    def grid(self, values, fill):
+        # (intersecciones, semáforos por intersección); los accesos que faltan quedan con `fill`
+        grid = np.full(self.index.shape, fill, dtype=np.int64)
+        grid[self.present] = values[self.index[self.present]]
+        return grid
+
+    def write(self, states, grid):
+        states[self.index[self.present]] = grid[self.present]
+
+    def demand(self, queues):
+        # Cola del acceso activo de cada intersección, el orden del anillo a partir del siguiente, y si
+        # en alguno de los otros accesos hay coches esperando
+        queue = self.grid(queues, -1)  # Sin semáforo: nunca recibe el verde
+        rows = np.arange(self.groups)
+        order = (self.active[:, None] + np.arange(1, self.size)) % self.size
+        others = queue[rows[:, None], order]
+        return queue[rows, self.active], order, others, others.max(axis=1, initial=-1) > 0
+
+    def step(self, states, queues, now):
+        if self.active is None:
+            self.start(states, now)
+        grid = self.grid(states, RED)
+        rows = np.arange(self.groups)
+        own, order, others, waiting = self.demand(queues)
+        elapsed = now - self.since
+        state = grid[rows, self.active]
+
+        # Verde: termina si ya pasó el mínimo y su acceso se vació, o al llegar al máximo, y solo si
+        # otro acceso espera (si no, el verde se queda donde está)
+        end = (state == GREEN) & waiting & (elapsed >= self.min_green) & ((own <= 0) | (elapsed >= self.max_green))
+        grid[rows[end], self.active[end]] = YELLOW
+        self.since[end] = now
+        # Amarillo: al terminar pasa a rojo y el verde va al acceso con más coches (a igualdad, el
+        # siguiente en el anillo)
+        done = (state == YELLOW) & (elapsed >= self.yellow_time)
+        if self.size > 1:
+            following = order[rows, others.argmax(axis=1)]
+        else:
+            following = self.active  # Un solo semáforo: vuelve a su verde
+        grid[rows[done], self.active[done]] = RED
+        self.active[done] = following[done]
+        grid[rows[done], self.active[done]] = GREEN
+        self.since[done] = now
+        self.switches += int(end.sum())
+        self.write(states, grid)
+
+    def next_event(self, states, queues, now):
+        # Con las colas fijas, step solo cambia un verde al cumplir min_green (acceso vacío) o max_green
+        # si otro acceso espera, y un amarillo al cumplir yellow_time
+        if self.active is None:
+            return now + 1  # El primer paso fija el verde de cada intersección
+        rows = np.arange(self.groups)
+        state = self.grid(states, RED)[rows, self.active]
+        own, _, _, waiting = self.demand(queues)
+        limit = np.where(own <= 0, self.min_green, self.max_green)
+        due = np.concatenate((self.since[(state == GREEN) & waiting] + limit[(state == GREEN) & waiting],
+                              self.since[state == YELLOW] + self.yellow_time))
+        return max(int(due.min()), now + 1) if due.size else None
+
+
+def make_controller(spec, model):
+    # 'fixed', 'actuated' o un controlador ya construido (cualquier objeto con step y next_event)
+    if spec is None or spec == 'fixed':
+        return None  # El ciclo fijo de siempre, sin pasar por esta interfaz
+    if spec == 'actuated':
+        return ActuatedController(model.city.light_groups(), len(model.traffic_lights),
+                                  model.red_at - model.yellow_at, model.p.get('min_green', MIN_GREEN),
+                                  model.p.get('max_green', MAX_GREEN))
+    if hasattr(spec, 'step'):
+        return spec
+    raise ValueError(f"Controlador de semáforos desconocido: {spec}")
@@ -0,0 +1,207 @@
+import asyncio
+import json
+
+from protocolo import frame_to_bytes, frame_to_json, keyframe_to_full_json
+from vistas import SpatialIndex, View, clip_viewport
+
+# Difusión de una sola simulación a muchos clientes. El Hub publica un frame por
+# tick (delta o keyframe, ver protocolo.py) y cada codificación se genera una
+# sola vez y se comparte entre todos los suscriptores. Cada suscriptor tiene una
+# cola acotada: si se llena (cliente lento), se descartan los mensajes pendientes
+# y se reemplazan por un keyframe del estado actual, sin frenar a los demás.
+# Los ticks llegan de un SimulationWorker (trabajador.py) que corre en otro hilo.
+#
+# Los suscriptores con codificación 'full' reciben el formato JSON original (estado
+# completo en cada tick): el keyframe del tick, también armado una sola vez.
+#
+# Un suscriptor con viewport (ver vistas.py) recibe en cambio sus propios frames,
+# solo con lo que hay en su área y al ritmo que pidió; el índice espacial de los
+# coches se arma una vez por tick y lo comparten todos.
+QUEUE_SIZE = 8
+
+
+class Message:
+    def __init__(self, frame):
+        self.frame = frame
+        self.encoded = {}
+
+    def encode(self, encoding):
+        # Codificado una vez por formato; los suscriptores reciben los mismos bytes
+        if encoding not in self.encoded:
+            if encoding == 'binary':
+                self.encoded[encoding] = frame_to_bytes(self.frame)
+            elif encoding == 'full':
+                self.encoded[encoding] = json.dumps(keyframe_to_full_json(self.frame))  # Solo keyframes
+            else:
+                self.encoded[encoding] = json.dumps(frame_to_json(self.frame))
+        return self.encoded[encoding]
+
+
+# Marca de fin de la transmisión en la cola de un suscriptor
+END = None
+
+
+class Subscriber:
+    def __init__(self, encoding, queue_size):
+        self.encoding = encoding
+        self.view = None  # View si se suscribió a un área
+        self.queue = asyncio.Queue(queue_size)
+        self.dropped = 0  # Mensajes descartados por ir atrasado
+        self.resyncs = 0  # Veces que saltó a un keyframe
+
+    async def next(self):
+        # Siguiente mensaje codificado, o None si la simulación terminó
+        message = await self.queue.get()
+        return message if message is END else message.encode(self.encoding)
+
+
+class Hub:
+    def __init__(self, encoder, queue_size=QUEUE_SIZE, ticks_per_second=None):
+        self.encoder = encoder  # Solo para armar keyframes (ids, posiciones de semáforos y mapa)
+        self.queue_size = queue_size
+        self.ticks_per_second = ticks_per_second  # Para convertir el ritmo de las vistas a ticks
+        self.shape = encoder.model.grid_map.shape
+        self.light_index = SpatialIndex(encoder.light_positions, self.shape)
+        self.car_index = None  # (seq, SpatialIndex) de los coches del último tick que alguna vista leyó
+        self.latest = encoder.last  # Último Tick publicado
+        self.subscribers = set()
+        self.resync = None  # Keyframe del tick actual, compartido por los que se atrasan
+        self.published = 0
+        self.frames_lost = 0  # Ticks de la simulación que el Hub no alcanzó a leer
+        self.dropped = 0  # Totales de los suscriptores que ya se fueron
+        self.resyncs = 0
+        self.wake = asyncio.Event()
+        self.loop = None
+        self.task = None  # Tarea de follow() en el servidor
+
+    def subscribe(self, encoding='json', viewport=None, rate=None):
+        # El suscriptor empieza con un keyframe (con mapa) del último tick publicado; con viewport o
+        # rate, solo de su área (por defecto el mapa completo; ValueError si queda fuera del mapa)
+        subscriber = Subscriber(encoding, self.queue_size)
+        if encoding == 'full' and (viewport is not None or rate is not None):
+            raise ValueError("Las áreas y el ritmo requieren updates=delta")
+        if viewport is None and rate is None:
+            subscriber.queue.put_nowait(Message(self.encoder.snapshot(include_map=True, tick=self.latest)))
+        else:
+            subscriber.view = View(clip_viewport(viewport or (0, 0, *self.shape), self.shape),
+                                   None if rate is None else float(rate))
+            subscriber.queue.put_nowait(self.view_message(subscriber.view, self.latest))
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def update_view(self, subscriber, viewport=None, rate=None):
+        # Cambia el área o el ritmo de un suscriptor; al cambiar de área recibe un keyframe de la nueva
+        if subscriber.encoding == 'full':
+            raise ValueError("Las áreas y el ritmo requieren updates=delta")
+        rect = clip_viewport(viewport, self.shape) if viewport is not None else None
+        if subscriber.view is None:
+            if rect is None and rate is None:
+                return
+            subscriber.view = View(rect or (0, 0, *self.shape))
+        elif rect is not None:
+            subscriber.view.move(rect)
+        if rate is not None:
+            subscriber.view.rate = float(rate)
+
+    def poll(self, subscriber):
+        # El cliente pide una actualización: la recibe en el siguiente tick aunque su ritmo no toque.
+        # Sin área, ya recibe todos los ticks y no hay nada que hacer.
+        if subscriber.view is not None:
+            subscriber.view.polled = True
+
+    def view_message(self, view, tick):
+        if self.car_index is None or self.car_index[0] != tick.seq:
+            self.car_index = (tick.seq, SpatialIndex(tick.positions, self.shape))
+        return Message(view.frame(tick, self.car_index[1], self.light_index, self.encoder))
+
+    def unsubscribe(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.discard(subscriber)
+            self.dropped += subscriber.dropped
+            self.resyncs += subscriber.resyncs
+
+    def publish(self, tick):
+        # Frame del tick para todos los suscriptores
+        message = Message(tick.frame)
+        full = None  # Keyframe del tick para los suscriptores 'full'
+        self.latest = tick
+        self.resync = None
+        self.published += 1
+        for subscriber in self.subscribers:
+            view = subscriber.view
+            if view is not None and not view.due(tick.seq, self.ticks_per_second):
+                continue
+            if subscriber.queue.full():
+                self.skip_to_keyframe(subscriber)
+            elif view is not None:
+                subscriber.queue.put_nowait(self.view_message(view, tick))
+            elif subscriber.encoding == 'full':
+                if full is None:
+                    full = Message(tick.frame if tick.frame['type'] == 'keyframe' else self.encoder.snapshot(tick=tick))
+                subscriber.queue.put_nowait(full)
+            else:
+                subscriber.queue.put_nowait(message)
+        return message
+
+    def publish_gap(self, tick):
+        # Se perdieron ticks intermedios: todos saltan al keyframe de `tick`
+        self.latest = tick
+        self.resync = None
+        for subscriber in self.subscribers:
+            self.skip_to_keyframe(subscriber)
+
+    def skip_to_keyframe(self, subscriber):
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+            subscriber.dropped += 1
+        if subscriber.view is not None:
+            # El cliente ya no tiene lo que la vista cree que tiene
+            subscriber.view.keyframe = True
+            subscriber.queue.put_nowait(self.view_message(subscriber.view, self.latest))
+        else:
+            if self.resync is None:
+                self.resync = Message(self.encoder.snapshot(tick=self.latest))
+            subscriber.queue.put_nowait(self.resync)
+        subscriber.resyncs += 1
+
+    def close(self):
+        for subscriber in self.subscribers:
+            if subscriber.queue.full():
+                subscriber.queue.get_nowait()
+                subscriber.dropped += 1
+            subscriber.queue.put_nowait(END)
+
+    def notify(self):
+        # Llamado desde el hilo de simulación
+        self.loop.call_soon_threadsafe(self.wake.set)
+
+    async def follow(self, worker):
+        # Lee los ticks del anillo del worker y los publica, mientras haya suscriptores
+        self.loop = asyncio.get_running_loop()
+        worker.on_tick = self.notify
+        worker.start()
+        try:
+            while self.subscribers:
+                await self.wake.wait()
+                self.wake.clear()
+                ticks, lost = worker.ring.since(self.latest.seq)
+                if lost:
+                    self.frames_lost += lost
+                    self.publish_gap(ticks[-1])
+                else:
+                    for tick in ticks:
+                        self.publish(tick)
+                if worker.stopped.is_set() and self.latest is worker.ring.latest:
+                    break
+        finally:
+            worker.stop()
+            self.close()
+
+    def stats(self):
+        return {
+            'subscribers': len(self.subscribers),
+            'published': self.published,
+            'frames_lost': self.frames_lost,
+            'dropped': self.dropped + sum(s.dropped for s in self.subscribers),
+            'resyncs': self.resyncs + sum(s.resyncs for s in self.subscribers),
+        }
@@ -0,0 +1,138 @@
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from mapas import generate_city
+from modelo import TrafficModel
+from protocolo import car_positions
+
+# Barrido de parámetros sin interfaz gráfica. Cada corrida es independiente:
+# genera su ciudad, fija la semilla y simula en un proceso del pool, y solo
+# devuelve una fila de métricas (no hay estado compartido que serializar), así
+# que escala con el número de núcleos. Los resultados salen en el orden del
+# barrido, sin importar cuántos procesos se usen.
+
+# Columnas de salida: parámetros de la corrida y métricas
+COLUMNS = ('intersections', 'cars_per_approach', 'cycle_length', 'controller', 'routing', 'conflicts', 'seed', 'steps',
+           'cars', 'trips_completed', 'mean_travel_time', 'stall_ticks', 'seconds')
+
+
+def cycle_phases(cycle_length):
+    # Amarillo y rojo en la misma proporción del ciclo que los de TrafficModel (10 y 13 de 26), con al
+    # menos un tick de verde, amarillo y rojo
+    red_at = max(2, round(cycle_length * TrafficModel.red_at / TrafficModel.cycle_length))
+    yellow_at = min(red_at - 1, max(1, round(cycle_length * TrafficModel.yellow_at / TrafficModel.cycle_length)))
+    return yellow_at, red_at
+
+
+def validate(config):
+    # Mismas comprobaciones que TrafficModel.setup y generate_city, antes de repartir el barrido al pool
+    # (un error dentro de un proceso tumbaría todo el barrido)
+    yellow_at, red_at = cycle_phases(config['cycle_length'])
+    if not 0 < yellow_at < red_at < config['cycle_length']:
+        raise ValueError(f"Ciclo inválido: longitud {config['cycle_length']} (se necesitan al menos 3 ticks)")
+    if config['intersections'] < 1 or config['cars_per_approach'] < 0 or config['steps'] < 0:
+        raise ValueError(f"Corrida inválida: {config}")
+
+
+def run(config):
+    # Una corrida: parámetros -> fila de métricas. Reproducible para la misma semilla.
+    random.seed(config['seed'])
+    np.random.seed(config['seed'])
+    city = generate_city(config['intersections'], config['intersections'],
+                         cars_per_approach=config['cars_per_approach'])
+    # Las reservas solo funcionan con el motor de agentes
+    engine = 'agents' if config['conflicts'] == 'reservations' else config['engine']
+    yellow_at, red_at = cycle_phases(config['cycle_length'])
+    model = TrafficModel({'map': city, 'engine': engine, 'routing': config['routing'],
+                          'cycle_length': config['cycle_length'], 'yellow_at': yellow_at, 'red_at': red_at,
+                          'controller': config['controller'], 'conflicts': config['conflicts']})
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+        n = len(model.cars)
+        arrival = np.full(n, -1, dtype=np.int64)  # Tick de llegada (-1 = en camino)
+        stalls = 0
+        positions = car_positions(model)
+        for t in range(1, config['steps'] + 1):
+            model.step()
+            new_positions = car_positions(model)
+            if t == 1:
+                destinations = np.array([car.destination for car in model.cars], dtype=np.int64).reshape(-1, 2)
+            arrived = (new_positions == destinations).all(axis=1)
+            stalls += int(((new_positions == positions).all(axis=1) & ~arrived & (arrival < 0)).sum())
+            arrival[arrived & (arrival < 0)] = t
+            positions = new_positions
+        model.update()
+    done = arrival >= 0
+    return {**{k: config[k] for k in COLUMNS[:8]},
+            'cars': n,
+            'trips_completed': int(done.sum()),
+            'mean_travel_time': float(arrival[done].mean()) if done.any() else float('nan'),
+            'stall_ticks': stalls,
+            'seconds': time.perf_counter() - start}
+
+
+def sweep(configs, workers=None):
+    for config in configs:
+        validate(config)
+    if workers == 1:
+        return [run(c) for c in configs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run, configs, chunksize=1))
+
+
+def save(rows, path):
+    # Salida por columnas: .npz (un arreglo por columna) o .csv
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        np.savez(path, **{c: np.array([row[c] for row in rows]) for c in COLUMNS})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Barrido de parámetros de TrafficModel en paralelo")
+    parser.add_argument('--intersecciones', type=int, nargs='+', default=[2, 4], help="Tamaño del mapa (NxN)")
+    parser.add_argument('--coches', type=int, nargs='+', default=[1, 2], help="Coches por acceso de cada intersección")
+    parser.add_argument('--cycle', type=int, nargs='+', default=[26],
+                        help="Longitud del ciclo de semáforos (amarillo y rojo en la misma proporción que el de 26)")
+    parser.add_argument('--controller', nargs='+', default=['fixed'], choices=['fixed', 'actuated'],
+                        help="Semáforos de ciclo fijo o actuados por demanda")
+    parser.add_argument('--routing', nargs='+', default=['astar'], choices=['astar', 'flow', 'graph'])
+    parser.add_argument('--conflicts', nargs='+', default=['negotiate'], choices=['negotiate', 'reservations'])
+    parser.add_argument('--seeds', type=int, default=4, help="Semillas 0..N-1 por combinación")
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--engine', default='vector', choices=['agents', 'vector'])
+    parser.add_argument('--workers', type=int, default=None, help="Procesos (por defecto, todos los núcleos)")
+    parser.add_argument('--output', default='resultados.npz')
+    args = parser.parse_args()
+
+    configs = [{'intersections': i, 'cars_per_approach': c, 'cycle_length': cycle, 'controller': controller,
+                'routing': routing, 'conflicts': conflicts, 'seed': seed, 'steps': args.steps, 'engine': args.engine}
+               for i, c, cycle, controller, routing, conflicts, seed in itertools.product(
+                   args.intersecciones, args.coches, args.cycle, args.controller, args.routing,
+                   args.conflicts, range(args.seeds))
+               if not (conflicts == 'reservations' and controller == 'actuated')]  # Las reservas suponen ciclo fijo
+    start = time.perf_counter()
+    try:
+        rows = sweep(configs, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    save(rows, args.output)
+    print(f"{len(rows)} corridas en {time.perf_counter() - start:.1f} s "
+          f"({args.workers or os.cpu_count()} procesos) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import random
+
+import numpy as np
+
+from rutas import heuristic
+
+# Operación continua: en lugar de una flota fija, en cada tick entran coches por
+# los puntos de entrada del escenario (las posiciones iniciales de sus coches,
+# con su dirección y semáforo) con una probabilidad por entrada, y los coches
+# que llegan a su destino salen del mapa. Si la celda de entrada está ocupada,
+# la llegada se pierde (se cuenta en `rejected`).
+#
+# Con entradas continuas los coches terminan formando ciclos en las
+# intersecciones (cada uno espera la celda del siguiente) que negotiate no
+# resuelve. Como hace SUMO con su time-to-teleport, un coche que lleva `patience`
+# ticks sin moverse se retira del mapa (se cuenta en `teleported`).
+#
+# Los coches que salen vuelven a un pool y se reutilizan (con el mismo id) en la
+# siguiente entrada, así que el número de agentes no pasa del máximo de coches
+# simultáneos y la memoria no crece con la duración de la corrida. De cada viaje
+# solo se acumulan totales: el tiempo de viaje y la demora, lo que tardó de más
+# respecto a ir en línea recta (distancia de Manhattan) sin detenerse.
+
+PATIENCE = 200  # Ticks sin moverse antes de retirar a un coche atorado
+
+
+class Fleet:
+    def __init__(self, model, car_type, arrivals, patience=PATIENCE):
+        self.model = model
+        self.car_type = car_type
+        city = model.city
+        self.entries = list(city.cars)
+        self.directions = list(city.directions)
+        self.lights = [model.environment.light_at(position) for position in self.entries]
+        # Probabilidad de una llegada por tick: la misma para todas las entradas o una por entrada
+        self.rates = np.broadcast_to(np.asarray(arrivals, dtype=float), (len(self.entries),)).copy()
+        if ((self.rates < 0) | (self.rates > 1)).any():
+            raise ValueError(f"Las tasas de llegada deben estar entre 0 y 1: {arrivals}")
+        self.patience = patience
+        self.rng = np.random.default_rng(random.getrandbits(64))  # Reproducible con random.seed
+        self.pool = []  # Coches fuera del mapa, listos para volver a entrar
+        self.departures = {car.id: model.global_timer for car in model.cars}  # Tick de entrada de cada coche
+        self.origins = {car.id: model.grid.positions[car] for car in model.cars}  # Celda de entrada
+        self.still = {}  # Id -> (posición, desde qué tick está ahí)
+        self.version = 0  # Cambia cada vez que entra o sale un coche (ver DeltaEncoder)
+        self.spawned = 0
+        self.retired = 0
+        self.rejected = 0
+        self.teleported = 0
+        self.travel_time = 0  # Suma de los tiempos de viaje de los coches que salieron
+        self.delay = 0  # Suma de sus demoras
+
+    def step(self, now):
+        # Retira a los coches que llegaron a su destino y hace entrar a los nuevos
+        grid, cars = self.model.grid, self.model.cars
+        arrived, stuck = [], []
+        for car in cars:
+            position = grid.positions[car]
+            if car.destination is not None and position == tuple(car.destination):
+                arrived.append(car)
+                continue
+            since = self.still.get(car.id)
+            if since is None or since[0] != position:
+                self.still[car.id] = (position, now)
+            elif now - since[1] >= self.patience:
+                stuck.append(car)
+        if arrived or stuck:
+            gone = arrived + stuck
+            grid.remove_agents(gone)
+            removed = set(gone)
+            cars[:] = [car for car in cars if car not in removed]
+            for car in arrived:
+                travel = now - self.departures[car.id]
+                self.travel_time += travel
+                self.delay += travel - heuristic(self.origins[car.id], car.destination)
+            for car in gone:
+                self.still.pop(car.id, None)
+                del self.departures[car.id]
+                del self.origins[car.id]
+            self.pool += gone
+            self.retired += len(arrived)
+            self.teleported += len(stuck)
+            self.version += 1
+        for entry in np.flatnonzero(self.rng.random(len(self.rates)) < self.rates).tolist():
+            position = self.entries[entry]
+            if grid.agent_at(position) is not None:
+                self.rejected += 1
+                continue
+            car = self.pool.pop() if self.pool else self.car_type(self.model)
+            car.setup()
+            car.direction = self.directions[entry]
+            car.trafficLight = self.lights[entry]
+            grid.add_agents([car], positions=[position])
+            car.setDestino()  # Ya, no en su primer update: otro coche puede negociar con él antes
+            cars.append(car)
+            self.departures[car.id] = now
+            self.origins[car.id] = position
+            self.spawned += 1
+            self.version += 1
+
+    def stats(self):
+        return {'active': len(self.model.cars), 'pooled': len(self.pool), 'spawned': self.spawned,
+                'retired': self.retired, 'rejected': self.rejected, 'teleported': self.teleported,
+                'mean_travel_time': self.travel_time / self.retired if self.retired else float('nan'),
+                'mean_delay': self.delay / self.retired if self.retired else float('nan')}
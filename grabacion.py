@@ -0,0 +1,217 @@
+import argparse
+import contextlib
+import io
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from protocolo import GONE, HEADER, KEYFRAME_INTERVAL, KINDS, DeltaEncoder, bytes_to_frame, frame_to_bytes
+
+# Grabación de corridas para repetirlas sin volver a simular. El archivo es la
+# secuencia de frames binarios del protocolo (ver protocolo.py), cada uno con su
+# largo delante: el primero es un keyframe con el mapa y luego un keyframe cada
+# keyframe_interval ticks, con deltas entre ellos. Se escribe por bloques (la
+# memoria usada no crece con la corrida) y al cerrar se agrega un índice de
+# keyframes; si la grabación no se cerró, el índice se reconstruye recorriendo
+# los frames. La lectura usa el archivo mapeado en memoria.
+#
+#   cabecera FILE_HEADER: 'TRJ1', versión, reservado, ticks por segundo (float32)
+#   frames: largo (uint32) y el frame
+#   índice: INDEX_DTYPE[n] (seq, posición del keyframe) y FOOTER (posición del índice, n, 'TIDX')
+
+MAGIC = b'TRJ1'
+INDEX_MAGIC = b'TIDX'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sHHf')
+RECORD = struct.Struct('<I')
+FOOTER = struct.Struct('<QI4s')
+INDEX_DTYPE = np.dtype([('seq', '<u4'), ('offset', '<u8')])
+CHUNK_BYTES = 1 << 18  # Bytes acumulados antes de escribir a disco
+
+
+class Recorder:
+    def __init__(self, path, ticks_per_second=10.0, chunk_bytes=CHUNK_BYTES):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.chunk_bytes = chunk_bytes
+        self.buffer = bytearray(FILE_HEADER.pack(MAGIC, VERSION, 0, ticks_per_second))
+        self.offset = 0  # Posición en el archivo del inicio de `buffer`
+        self.keyframes = []  # (seq, posición) de cada keyframe
+        self.ticks = 0
+
+    def write(self, encoder, tick):
+        # Agrega el frame de un Tick ya emitido por `encoder`; el primero se guarda como keyframe con el mapa
+        frame = encoder.snapshot(include_map=True, tick=tick) if not self.ticks else tick.frame
+        data = frame_to_bytes(frame)
+        if frame['type'] == 'keyframe':
+            self.keyframes.append((frame['seq'], self.offset + len(self.buffer)))
+        self.buffer += RECORD.pack(len(data))
+        self.buffer += data
+        self.ticks += 1
+        if len(self.buffer) >= self.chunk_bytes:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.offset += len(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        if self.file.closed:
+            return
+        index = np.array(self.keyframes, dtype=INDEX_DTYPE)
+        self.buffer += index.tobytes()
+        self.buffer += FOOTER.pack(self.offset + len(self.buffer) - index.nbytes, len(index), INDEX_MAGIC)
+        self.flush()
+        self.file.close()
+
+
+class Recording:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = memoryview(self.mmap)
+        magic, version, _, self.ticks_per_second = FILE_HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"No es una grabación (versión {VERSION}): {path}")
+        self.end = len(self.data)
+        index = None
+        if self.end >= FILE_HEADER.size + FOOTER.size:
+            index_offset, count, index_magic = FOOTER.unpack_from(self.data, self.end - FOOTER.size)
+            if index_magic == INDEX_MAGIC:
+                index = np.frombuffer(self.data, dtype=INDEX_DTYPE, count=count, offset=index_offset)
+                self.end = index_offset
+        if index is None:
+            index = self.rebuild_index()
+        self.keyframe_seqs = index['seq'].astype(np.int64)
+        self.keyframe_offsets = index['offset'].astype(np.int64)
+        if not len(index):
+            raise ValueError(f"Grabación vacía: {path}")
+        first = bytes_to_frame(self.record(self.keyframe_offsets[0])[0])
+        self.map = first['map'].copy()  # Sin vistas del archivo abiertas: close() puede soltar el mapeo
+        self.last_seq = self.keyframe_seqs[-1]
+        for seq, _ in self.records(self.last_seq):
+            self.last_seq = seq
+
+    def rebuild_index(self):
+        # Grabación sin cerrar: recorre los frames completos y anota los keyframes. Se detiene
+        # en el primer frame cortado o que no sigue la secuencia (p. ej. un índice a medio escribir).
+        entries, offset, expected = [], FILE_HEADER.size, 0
+        keyframe = KINDS.index('keyframe')
+        while offset + RECORD.size + HEADER.size <= self.end:
+            (length,) = RECORD.unpack_from(self.data, offset)
+            if length < HEADER.size or offset + RECORD.size + length > self.end:
+                break
+            kind, _, _, seq = HEADER.unpack_from(self.data, offset + RECORD.size)[:4]
+            if seq != expected or kind >= len(KINDS):
+                break
+            if kind == keyframe:
+                entries.append((seq, offset))
+            offset += RECORD.size + length
+            expected += 1
+        self.end = offset
+        return np.array(entries, dtype=INDEX_DTYPE)
+
+    def record(self, offset):
+        # Frame guardado en `offset` (vista, sin copiar) y la posición del siguiente
+        (length,) = RECORD.unpack_from(self.data, offset)
+        start = offset + RECORD.size
+        return self.data[start:start + length], start + length
+
+    def records(self, seq):
+        # (seq, frame) desde el keyframe anterior o igual a `seq` hasta el final
+        offset = self.keyframe_offsets[max(0, np.searchsorted(self.keyframe_seqs, seq, side='right') - 1)]
+        while offset < self.end:
+            data, offset = self.record(offset)
+            yield HEADER.unpack_from(data)[3], data
+
+    def after(self, seq):
+        # (seq, frame) de los ticks posteriores a `seq`, tal como se grabaron
+        for frame_seq, data in self.records(seq + 1):
+            if frame_seq > seq:
+                yield frame_seq, data
+
+    def keyframe_at(self, seq, include_map=False):
+        # Estado completo en `seq` como keyframe: el keyframe guardado anterior más los deltas hasta `seq`
+        seq = min(max(seq, 0), self.last_seq)
+        frame = None
+        for frame_seq, data in self.records(seq):
+            if frame_seq > seq:
+                break
+            decoded = bytes_to_frame(data)
+            if frame is None:
+                frame = {key: value.copy() if isinstance(value, np.ndarray) else value
+                         for key, value in decoded.items() if key != 'map'}
+                light_index = {i: n for n, i in enumerate(frame['light_ids'].tolist())}
+                car_index = {i: n for n, i in enumerate(frame['car_ids'].tolist())}
+                continue
+            lights = [light_index[i] for i in decoded['light_ids'].tolist()]
+            frame['light_states'][lights] = decoded['light_states']
+            ids = decoded['car_ids'].tolist()
+            if all(i in car_index for i in ids) and not (decoded['car_positions'] < 0).any():
+                frame['car_positions'][[car_index[i] for i in ids]] = decoded['car_positions']
+            else:
+                # Entraron o salieron coches (ver protocolo.py): los nuevos van al final, como en model.cars
+                cars = dict(zip(frame['car_ids'].tolist(), frame['car_positions'].tolist()))
+                for i, position in zip(ids, decoded['car_positions'].tolist()):
+                    if tuple(position) == GONE:
+                        cars.pop(i, None)
+                    else:
+                        cars[i] = position
+                frame['car_ids'] = np.array(list(cars), dtype=frame['car_ids'].dtype)
+                frame['car_positions'] = np.array(list(cars.values()),
+                                                  dtype=frame['car_positions'].dtype).reshape(-1, 2)
+                car_index = {i: n for n, i in enumerate(cars)}
+            frame['seq'] = frame['base'] = frame_seq
+            frame['type'] = 'keyframe'
+        if include_map:
+            frame['map'] = self.map
+        return frame
+
+    def close(self):
+        self.data.release()
+        self.mmap.close()
+
+
+def record_run(model, path, steps, keyframe_interval=KEYFRAME_INTERVAL, ticks_per_second=10.0):
+    # Simula sin pausas y graba cada tick (el modelo ya debe tener setup())
+    encoder = DeltaEncoder(model, keyframe_interval)
+    recorder = Recorder(path, ticks_per_second)
+    try:
+        encoder.frame()
+        recorder.write(encoder, encoder.last)
+        for _ in range(steps):
+            model.step()
+            encoder.frame()
+            recorder.write(encoder, encoder.last)
+    finally:
+        recorder.close()
+    return recorder
+
+
+def main():
+    from modelo import TrafficModel
+
+    parser = argparse.ArgumentParser(description="Graba una corrida de TrafficModel para repetirla después")
+    parser.add_argument('path', help="Archivo de salida (.trj)")
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--map', default=None, help="Escenario (ver mapas.py); por defecto el cruce de 12x12")
+    parser.add_argument('--engine', default='vector', choices=['agents', 'vector'])
+    parser.add_argument('--keyframe-interval', type=int, default=KEYFRAME_INTERVAL)
+    parser.add_argument('--rate', type=float, default=10.0, help="Ticks por segundo al repetir a velocidad 1")
+    args = parser.parse_args()
+
+    model = TrafficModel({'map': args.map, 'engine': args.engine})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+        record_run(model, args.path, args.steps, args.keyframe_interval, args.rate)
+    recording = Recording(args.path)
+    print(f"{recording.last_seq + 1} ticks, {len(recording.keyframe_seqs)} keyframes, "
+          f"{os.path.getsize(args.path) / 1024:.1f} KiB -> {args.path}")
+    recording.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+import heapq
+import os
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from rutas import MOVES
+
+# Ruteo jerárquico para ciudades grandes. El mapa se comprime en un grafo de
+# intersecciones y tramos de calle: las calles son franjas de filas (o columnas)
+# completamente transitables, como en SpatialLookup; sus cruces son las
+# intersecciones y lo que queda de cada franja entre dos cruces (o hasta el borde
+# del mapa) es un tramo. Los nodos son las celdas de las intersecciones, unidas
+# entre sí por pasos de 1 y, a través de cada tramo, con las de la intersección
+# de enfrente con el largo del tramo precalculado. A* corre sobre ese grafo (unas
+# decenas de nodos por cruce en lugar de todas las celdas de cada calle) y la ruta
+# se guarda como tramos (`legs`: celda de llegada y región por la que se llega)
+# que se expanden a celdas solo cuando el coche llega al inicio de cada uno.
+#
+# Las rutas miden lo mismo que las de A* sobre celdas: dentro de un tramo
+# rectangular sin cierres el camino más corto entre dos extremos mide la
+# distancia de Manhattan, y cambiar de carril dentro del tramo cuesta lo mismo
+# que hacerlo en la intersección. Los tramos con celdas cerradas (o junto a una
+# intersección con cierres) se miden con una BFS dentro del tramo, incluyendo las
+# vueltas que salen de una intersección y regresan a ella.
+#
+# Las calles que no forman parte de ninguna franja (p. ej. un carril con una celda
+# cerrada de origen, o callejones) quedan fuera del grafo. Una ruta desde o hacia
+# ellas, o que podría ser más corta pasando por ellas, no sale del grafo: route
+# devuelve None y el coche usa A* sobre celdas.
+#
+# El grafo se guarda en disco junto al mapa (ciudad.grafo.npz junto a
+# ciudad.npy) con la versión del mapa, así que un servidor que vuelve a abrir el
+# mismo mapa lo lee en lugar de recalcularlo.
+
+BOX, HORIZONTAL, VERTICAL = 0, 1, 2  # Tipos de región: intersección y tramos
+
+
+def bands(full):
+    # (inicio, fin) de cada franja de filas (o columnas) completamente transitables
+    index = np.flatnonzero(full)
+    if not index.size:
+        return []
+    starts = index[np.r_[True, np.diff(index) > 1]]
+    ends = index[np.r_[np.diff(index) > 1, True]] + 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def gaps(spans, n):
+    # Intervalos entre franjas (y hasta los bordes), sin los vacíos
+    edges = [0] + [v for span in spans for v in span] + [n]
+    return [(a, b) for a, b in zip(edges[::2], edges[1::2]) if a < b]
+
+
+def decompose(grid):
+    # Regiones (r0, r1, c0, c1, tipo): primero las intersecciones y luego los tramos
+    road = np.asarray(grid) != 0
+    rows, cols = road.shape
+    row_bands, col_bands = bands(road.all(axis=1)), bands(road.all(axis=0))
+    regions = [(r0, r1, c0, c1, BOX) for r0, r1 in row_bands for c0, c1 in col_bands]
+    regions += [(r0, r1, c0, c1, HORIZONTAL) for r0, r1 in row_bands for c0, c1 in gaps(col_bands, cols)]
+    regions += [(r0, r1, c0, c1, VERTICAL) for c0, c1 in col_bands for r0, r1 in gaps(row_bands, rows)]
+    return np.array(regions, dtype=np.int64).reshape(-1, 5)
+
+
+class IntersectionGraph:
+    def __init__(self, grid, regions=None, links=None):
+        self.grid = np.asarray(grid)
+        self.rows, self.cols = self.grid.shape
+        self.passable = (self.grid != 0).ravel().tobytes()
+        self.regions = decompose(self.grid) if regions is None else regions
+        self.region_of = np.full(self.rows * self.cols, -1, dtype=np.int64)
+        for i, (r0, r1, c0, c1, _) in enumerate(self.regions.tolist()):
+            self.region_of.reshape(self.rows, self.cols)[r0:r1, c0:c1] = i
+        # Calles fuera del grafo (filas y columnas), para saber qué rutas podrían pasar por ellas
+        outside = np.flatnonzero(np.frombuffer(self.passable, dtype=np.uint8).astype(bool) & (self.region_of < 0))
+        self.outside = np.divmod(outside, self.cols)
+        # Aristas (a, b, largo, región), en ambos sentidos al armar la adyacencia
+        if links is None:
+            links = self.links_of(range(len(self.regions)))
+        self.links = links
+        both = np.concatenate((links, links[:, [1, 0, 2, 3]]))
+        both = both[np.argsort(both[:, 0], kind='stable')]
+        nodes, starts = np.unique(both[:, 0], return_index=True)
+        entries = list(zip(*both[:, 1:].T.tolist()))
+        bounds = starts.tolist() + [len(entries)]
+        self.adjacency = {node: entries[a:b] for node, a, b in zip(nodes.tolist(), bounds, bounds[1:])}
+
+    def links_of(self, regions):
+        links = [(a, b, cost, region) for region in regions for a, b, cost in self.region_edges(region)]
+        return np.array(links, dtype=np.int64).reshape(-1, 4)
+
+    def ends(self, region):
+        # Celdas de las intersecciones vecinas pegadas al tramo, de un lado y del otro
+        r0, r1, c0, c1, kind = self.regions[region].tolist()
+        if kind == HORIZONTAL:
+            sides = [[r * self.cols + c0 - 1 for r in range(r0, r1)] if c0 > 0 else [],
+                     [r * self.cols + c1 for r in range(r0, r1)] if c1 < self.cols else []]
+        else:
+            sides = [[(r0 - 1) * self.cols + c for c in range(c0, c1)] if r0 > 0 else [],
+                     [r1 * self.cols + c for c in range(c0, c1)] if r1 < self.rows else []]
+        return [[cell for cell in side if self.passable[cell]] for side in sides]
+
+    def boxes_at(self, region):
+        # Intersecciones en los extremos de un tramo
+        r0, r1, c0, c1, kind = self.regions[region].tolist()
+        if kind == HORIZONTAL:
+            cells = [(r0, c0 - 1)] if c0 > 0 else []
+            cells += [(r0, c1)] if c1 < self.cols else []
+        else:
+            cells = [(r0 - 1, c0)] if r0 > 0 else []
+            cells += [(r1, c0)] if r1 < self.rows else []
+        return {int(self.region_of[r * self.cols + c]) for r, c in cells}
+
+    def clean(self, region):
+        # ¿La región y las intersecciones en sus extremos no tienen celdas cerradas?
+        r0, r1, c0, c1, kind = self.regions[region].tolist()
+        if kind == HORIZONTAL:
+            c0, c1 = max(c0 - 1, 0), min(c1 + 1, self.cols)
+        elif kind == VERTICAL:
+            r0, r1 = max(r0 - 1, 0), min(r1 + 1, self.rows)
+        return bool(self.grid[r0:r1, c0:c1].all())
+
+    def region_edges(self, region):
+        r0, r1, c0, c1, kind = self.regions[region].tolist()
+        if kind == BOX:
+            # Pasos de 1 entre celdas vecinas de la intersección
+            cells = [r * self.cols + c for r in range(r0, r1) for c in range(c0, c1)]
+            links = []
+            for cell in cells:
+                if not self.passable[cell]:
+                    continue
+                row, col = divmod(cell, self.cols)
+                if col + 1 < c1 and self.passable[cell + 1]:
+                    links.append((cell, cell + 1, 1))
+                if row + 1 < r1 and self.passable[cell + self.cols]:
+                    links.append((cell, cell + self.cols, 1))
+            return links
+        near, far = self.ends(region)
+        if self.clean(region):
+            # Largo del tramo más los cambios de carril
+            length = (c1 - c0 if kind == HORIZONTAL else r1 - r0) + 1
+            return [(a, b, length + abs(self.lane(a, kind) - self.lane(b, kind))) for a in near for b in far]
+        links = []
+        ends = near + far
+        for i, a in enumerate(ends):
+            dist = self.flood(region, a, ends)
+            links += [(a, b, dist[b]) for b in ends[i + 1:] if b in dist]
+        return links
+
+    def lane(self, cell, kind):
+        row, col = divmod(cell, self.cols)
+        return row if kind == HORIZONTAL else col
+
+    def flood(self, region, source, extra=()):
+        # Distancias BFS desde `source` sin salir de la región (más las celdas `extra`)
+        extra = set(extra)
+        dist = {source: 0}
+        queue = deque([source])
+        while queue:
+            cell = queue.popleft()
+            if cell != source and cell in extra and self.region_of[cell] != region:
+                continue  # Un extremo en otra intersección: se llega pero no se sigue por ahí
+            row, col = divmod(cell, self.cols)
+            for dr, dc in MOVES:
+                r, c = row + dr, col + dc
+                if not (0 <= r < self.rows and 0 <= c < self.cols):
+                    continue
+                n = r * self.cols + c
+                if n in dist or not self.passable[n] or (self.region_of[n] != region and n not in extra):
+                    continue
+                dist[n] = dist[cell] + 1
+                queue.append(n)
+        return dist
+
+    def attach(self, cell):
+        # Nodos a los que se llega desde una celda (o desde los que se llega a ella) y a qué distancia
+        region = int(self.region_of[cell])
+        if self.regions[region, 4] == BOX:
+            return region, {cell: 0}
+        ends = [end for side in self.ends(region) for end in side]
+        dist = self.flood(region, cell, ends)
+        return region, {end: dist[end] for end in ends if end in dist}
+
+    def covers(self, cell):
+        return self.passable[cell] and self.region_of[cell] >= 0
+
+    def shortest(self, start, goal, length):
+        # ¿Ninguna ruta que pase por una calle fuera del grafo puede medir menos que `length`? Una que
+        # pasa por la celda u mide al menos heuristic(start, u) + heuristic(u, goal).
+        rows, cols = self.outside
+        if not rows.size:
+            return True
+        (start_row, start_col), (goal_row, goal_col) = divmod(start, self.cols), divmod(goal, self.cols)
+        detour = (np.abs(rows - start_row) + np.abs(cols - start_col) + np.abs(rows - goal_row)
+                  + np.abs(cols - goal_col)).min()
+        return length <= detour
+
+    def route(self, start, goal):
+        # Tramos de la ruta más corta como [(celda de llegada, región), ...]; [] si no hay ruta y
+        # None si el inicio o el destino no son calles del grafo, o si la ruta podría ser más corta
+        # por calles fuera del grafo (ahí se usa A* sobre celdas)
+        start = int(start[0]) * self.cols + int(start[1])
+        goal = int(goal[0]) * self.cols + int(goal[1])
+        if not (self.covers(start) and self.covers(goal)):
+            return None
+        if start == goal:
+            return None  # Ya está en el destino: la ruta de una celda sale de A*
+        start_region, sources = self.attach(start)
+        goal_region, targets = self.attach(goal)
+        goal_row, goal_col = divmod(goal, self.cols)
+        best, best_node = float('inf'), None
+        if start_region == goal_region and self.regions[start_region, 4] != BOX:
+            best = self.flood(start_region, start).get(goal, best)  # Sin pasar por una intersección
+
+        gscore, parent = {}, {}
+        heap = []
+        for node, d in sources.items():
+            gscore[node] = d
+            parent[node] = (None, start_region) if node != start else None
+            row, col = divmod(node, self.cols)
+            heapq.heappush(heap, (d + abs(row - goal_row) + abs(col - goal_col), node))
+        closed = set()
+        while heap:
+            f, node = heapq.heappop(heap)
+            if f >= best:
+                break
+            if node in closed:
+                continue  # Entrada obsoleta
+            closed.add(node)
+            g = gscore[node]
+            if node in targets and g + targets[node] < best:
+                best, best_node = g + targets[node], node
+            for neighbor, cost, region in self.adjacency.get(node, ()):
+                tentative = g + cost
+                if neighbor in closed or tentative >= gscore.get(neighbor, best):
+                    continue
+                gscore[neighbor] = tentative
+                parent[neighbor] = (node, region)
+                row, col = divmod(neighbor, self.cols)
+                heapq.heappush(heap, (tentative + abs(row - goal_row) + abs(col - goal_col), neighbor))
+
+        if not self.shortest(start, goal, best):
+            return None
+        if best == float('inf'):
+            return []
+        if best_node is None:
+            return [(goal, start_region)]
+        legs = [] if best_node == goal else [(goal, goal_region)]
+        node = best_node
+        while parent[node] is not None:
+            previous, region = parent[node]
+            legs.append((node, region))
+            if previous is None:
+                break
+            node = previous
+        legs.reverse()
+        return legs
+
+    def expand(self, cell, node, region):
+        # Celdas de un tramo de la ruta, desde `cell` (incluida) hasta `node`
+        if self.regions[region, 4] == BOX:
+            return (divmod(cell, self.cols), divmod(node, self.cols))
+        dist = self.flood(region, node, (cell, node))
+        cells = [cell]
+        while cell != node:
+            row, col = divmod(cell, self.cols)
+            for dr, dc in MOVES:
+                r, c = row + dr, col + dc
+                n = r * self.cols + c
+                if 0 <= r < self.rows and 0 <= c < self.cols and dist.get(n, -1) == dist[cell] - 1:
+                    cell = n
+                    break
+            cells.append(cell)
+        return tuple(divmod(cell, self.cols) for cell in cells)
+
+    def path(self, start, goal):
+        # Ruta completa en celdas (para los motores que guardan rutas en arreglos); None como route
+        legs = self.route(start, goal)
+        if legs is None or not legs:
+            return legs
+        cells = [tuple(start)]
+        for node, region in legs:
+            row, col = cells[-1]
+            cells += self.expand(row * self.cols + col, node, region)[1:]
+        return cells
+
+    def edited(self, grid, cells):
+        # Grafo del mapa con celdas cambiadas: se recalculan las regiones que las contienen y los tramos
+        # junto a las intersecciones afectadas; las franjas son las del mapa original (una celda abierta
+        # fuera de ellas queda fuera del grafo)
+        graph = IntersectionGraph.__new__(IntersectionGraph)
+        graph.grid = np.asarray(grid)
+        graph.rows, graph.cols = self.rows, self.cols
+        graph.passable = (graph.grid != 0).ravel().tobytes()
+        graph.regions, graph.region_of = self.regions, self.region_of
+        cells = np.asarray(cells, dtype=np.int64)
+        touched = {int(region) for region in self.region_of[cells] if region >= 0}
+        boxes = {region for region in touched if self.regions[region, 4] == BOX}
+        for region in range(len(self.regions)):
+            if region not in touched and self.regions[region, 4] != BOX and boxes & self.boxes_at(region):
+                touched.add(region)
+        links = self.links[~np.isin(self.links[:, 3], list(touched))]
+        links = np.concatenate((links, graph.links_of(sorted(touched))))
+        IntersectionGraph.__init__(graph, grid, self.regions, links)
+        return graph
+
+
+# Grafo en disco junto al mapa, con la versión del mapa para detectar cambios
+def graph_file(source):
+    base, _ = os.path.splitext(source)
+    return base + '.grafo.npz'
+
+
+def save_graph(graph, version, path):
+    with open(path, 'wb') as f:
+        np.savez(f, version=np.array(version), regions=graph.regions, links=graph.links)
+
+
+def read_graph(grid, version, path):
+    with np.load(path) as data:
+        if str(data['version']) != version:
+            return None
+        return IntersectionGraph(grid, data['regions'], data['links'])
+
+
+# Grafos ya armados en el proceso (p. ej. las sesiones del servidor con el mismo mapa), los
+# GRAPH_CACHE_SIZE usados más recientemente, como rutas.PathCache: un barrido o un servidor que
+# abre muchos mapas no los guarda todos. Los hilos de las sesiones la comparten (con candado;
+# armar o leer un grafo ocurre fuera de él).
+GRAPH_CACHE_SIZE = 16
+_graphs = OrderedDict()
+_graphs_lock = threading.Lock()
+
+
+def load_graph(grid, version, source=None):
+    # Grafo del mapa: de memoria, del archivo junto al mapa o recién armado (y guardado ahí)
+    with _graphs_lock:
+        graph = _graphs.pop(version, None)
+        if graph is not None:
+            _graphs[version] = graph  # Al final: usado más recientemente
+            return graph
+    path = graph_file(source) if source else None
+    if path and os.path.exists(path):
+        try:
+            graph = read_graph(grid, version, path)
+        except (OSError, ValueError, KeyError):
+            graph = None  # Archivo dañado: se vuelve a armar
+    if graph is None:
+        graph = IntersectionGraph(grid)
+        if path:
+            try:
+                save_graph(graph, version, path)
+            except OSError:
+                pass  # Carpeta de solo lectura: se arma en cada arranque
+    with _graphs_lock:
+        _graphs[version] = graph
+        if len(_graphs) > GRAPH_CACHE_SIZE:
+            _graphs.popitem(last=False)
+    return graph
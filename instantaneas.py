@@ -0,0 +1,355 @@
+import contextlib
+import io
+import struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from controladores import ActuatedController
+from modelo import Car, TrafficModel
+from motor_vectorial import EMPTY, STATES, STATIC, VectorEngine
+from rutas import MOVES
+
+# Instantáneas (checkpoints) del estado completo de un TrafficModel para
+# guardar una corrida y retomarla, o para bifurcarla en varias corridas "¿y si…?"
+# desde el mismo tick sin volver a simular desde el inicio. No se serializan los
+# agentes de agentpy: el estado se guarda como arreglos NumPy (posiciones,
+# rutas pendientes, semáforos, flota, controlador y el estado del generador de
+# llegadas) y se restaura sobre un modelo nuevo armado con los mismos
+# parámetros, que aporta lo que no cambia durante la corrida (mapa original,
+# semáforos, agentes iniciales). Un modelo restaurado sigue exactamente igual
+# que el original.
+#
+#     model = resume(parameters, Checkpoint.load('corrida.ckp'))
+#     results = fork(parameters, checkpoint, [None, close_lane, force_green], ticks=500)
+#
+# Solo se guardan las rutas desde la celda actual de cada coche (una ruta
+# recortada se sigue igual que la completa), como su primera celda y un byte
+# por paso (índice en MOVES); las celdas van como índices planos en int32. La
+# agenda de semáforos no se guarda: se rehace en el primer paso a partir de sus
+# estados (ver semaforos.py). Los motores por zonas y las reservas no tienen
+# instantáneas.
+#
+#   cabecera FILE_HEADER: 'CKP1', versión
+#   arreglos FIELDS en orden, cada uno en formato .npy (sin pickle)
+
+MAGIC = b'CKP1'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sHH')
+FIELDS = ('meta', 'map', 'light_state', 'car_id', 'car_cell', 'car_dest', 'car_light', 'car_velocity',
+          'car_direction', 'path_len', 'path_first', 'path_moves', 'leg_len', 'legs', 'fleet', 'fleet_rng', 'pool',
+          'departure', 'origin', 'still_cell', 'still_since', 'controller')
+# Posiciones en 'meta'
+TICK, IDLE, ID_COUNTER, ROWS, COLS, LIGHTS, VECTOR, SWITCHES = range(8)
+# Contadores de la flota en 'fleet', en este orden
+FLEET_COUNTERS = ('version', 'spawned', 'retired', 'rejected', 'teleported', 'travel_time', 'delay')
+MASK64 = (1 << 64) - 1
+CELL = np.int32
+
+
+class Checkpoint:
+    def __init__(self, arrays):
+        self.arrays = arrays
+
+    @property
+    def tick(self):
+        return int(self.arrays['meta'][TICK])
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        buffer.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+        for name in FIELDS:
+            np.lib.format.write_array(buffer, np.ascontiguousarray(self.arrays[name]), allow_pickle=False)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        buffer = io.BytesIO(data)
+        magic, version, _ = FILE_HEADER.unpack(buffer.read(FILE_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"No es una instantánea (versión {VERSION})")
+        return cls({name: np.lib.format.read_array(buffer, allow_pickle=False) for name in FIELDS})
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+def supported(model):
+    if model.planner is not None or (model.engine is not None and type(model.engine) is not VectorEngine):
+        raise ValueError("Las instantáneas solo funcionan con los motores de agentes y vectorial, sin reservas")
+    if model.controller is not None and not isinstance(model.controller, ActuatedController):
+        raise ValueError(f"Controlador sin instantáneas: {model.controller}")
+
+
+def directions(model):
+    # Tabla de direcciones (índice guardado -> dirección), igual para todo modelo del mismo escenario
+    return list(dict.fromkeys(model.city.directions))
+
+
+def concat(parts, dtype=np.int64, width=None):
+    shape = (0,) if width is None else (0, width)
+    return np.concatenate(parts).astype(dtype) if parts else np.empty(shape, dtype=dtype)
+
+
+def encode_paths(cells, lengths, cols):
+    # Rutas concatenadas (celdas planas, `lengths` por coche) -> primera celda por coche (-1 sin ruta) y
+    # el índice en MOVES de cada paso
+    starts = np.cumsum(lengths) - lengths
+    routed = lengths > 0
+    first = np.full(len(lengths), -1, dtype=np.int64)
+    first[routed] = cells[starts[routed]]
+    steps = np.delete(np.diff(cells), starts[routed][1:] - 1)  # Sin los saltos entre una ruta y la siguiente
+    moves = np.full(len(steps), len(MOVES), dtype=np.uint8)
+    for k, (dr, dc) in enumerate(MOVES):
+        moves[steps == dr * cols + dc] = k
+    if (moves == len(MOVES)).any():
+        raise ValueError("Ruta con celdas no contiguas")
+    return first, moves
+
+
+def decode_paths(first, moves, lengths, cols):
+    # Inverso de encode_paths: celdas planas concatenadas
+    offsets = np.array([dr * cols + dc for dr, dc in MOVES], dtype=np.int64)
+    routed = lengths > 0
+    starts = (np.cumsum(lengths) - lengths)[routed]
+    steps = np.zeros(int(lengths.sum()), dtype=np.int64)
+    steps[np.delete(np.arange(len(steps)), starts)] = offsets[moves]
+    total = np.cumsum(steps)
+    route = np.repeat(np.arange(len(starts)), lengths[routed])
+    return first[routed].astype(np.int64)[route] + total - total[starts][route]
+
+
+def checkpoint(model):
+    # Instantánea del estado actual (tras model.step; no hace falta model.update)
+    supported(model)
+    rows, cols = model.grid_map.shape
+    engine = model.engine
+    cars = list(model.cars)
+    light_index = model.light_index
+    table = {d: i for i, d in enumerate(directions(model))}
+    arrays = {'map': np.asarray(model.grid_map, dtype=np.uint8),
+              'car_id': np.array([car.id for car in cars], dtype=np.int64),
+              'car_direction': np.array([table[car.direction] for car in cars], dtype=np.int8)}
+    if engine is not None:
+        arrays['light_state'] = engine.light_state[:-1].copy()
+        current = engine.path_start + engine.cursor
+        remaining = engine.path_len - engine.cursor
+        starts = np.cumsum(remaining) - remaining
+        cells = engine.path_cells[np.arange(remaining.sum()) + np.repeat(current - starts, remaining)]
+        arrays.update(car_cell=engine.cell, car_dest=engine.dest, car_light=engine.light,
+                      car_velocity=engine.velocity.copy(), path_len=remaining,
+                      leg_len=np.zeros(len(cars), dtype=np.int64), legs=np.empty((0, 2), dtype=np.int64))
+    else:
+        positions = np.array([model.grid.positions[car] for car in cars], dtype=np.int64).reshape(-1, 2)
+        destinations = np.array([car.destination if car.destination is not None else (-1, -1) for car in cars],
+                                dtype=np.int64).reshape(-1, 2)
+        paths = [np.array(car.path[car.cursor:], dtype=np.int64).reshape(-1, 2) for car in cars]
+        flat = concat(paths, width=2)
+        cells = flat[:, 0] * cols + flat[:, 1]
+        arrays.update(
+            light_state=np.array([STATES.index(tl.state) for tl in model.traffic_lights], dtype=np.int8),
+            car_cell=positions[:, 0] * cols + positions[:, 1],
+            car_dest=np.where(destinations[:, 0] >= 0, destinations[:, 0] * cols + destinations[:, 1], -1),
+            car_light=np.array([light_index[id(car.trafficLight)] if car.trafficLight is not None else -1
+                                for car in cars], dtype=np.int64),
+            car_velocity=np.array([car.velocity for car in cars], dtype=np.int8),
+            path_len=np.array([len(p) for p in paths], dtype=np.int64),
+            leg_len=np.array([len(car.legs) for car in cars], dtype=np.int64),
+            legs=concat([np.array(car.legs, dtype=np.int64).reshape(-1, 2) for car in cars], width=2))
+
+    arrays['path_first'], arrays['path_moves'] = encode_paths(cells, arrays['path_len'], cols)
+
+    controller = model.controller
+    started = controller is not None and controller.active is not None
+    arrays['controller'] = (np.stack([controller.active, controller.since]) if started
+                            else np.empty((2, 0), dtype=np.int64))
+    arrays['meta'] = np.array([model.global_timer, model.idle, model._id_counter, rows, cols,
+                               len(model.traffic_lights), engine is not None,
+                               controller.switches if controller is not None else 0], dtype=np.int64)
+
+    fleet = model.fleet
+    if fleet is not None:
+        state = fleet.rng.bit_generator.state
+        still = [fleet.still.get(car.id) for car in cars]
+        arrays.update(
+            fleet=np.array([getattr(fleet, name) for name in FLEET_COUNTERS], dtype=np.int64),
+            fleet_rng=np.array([state['state']['state'] >> 64, state['state']['state'] & MASK64,
+                                state['state']['inc'] >> 64, state['state']['inc'] & MASK64,
+                                state['has_uint32'], state['uinteger']], dtype=np.uint64),
+            pool=np.array([car.id for car in fleet.pool], dtype=np.int64),
+            departure=np.array([fleet.departures[car.id] for car in cars], dtype=np.int64),
+            origin=np.array([fleet.origins[car.id][0] * cols + fleet.origins[car.id][1] for car in cars],
+                            dtype=np.int64),
+            still_cell=np.array([s[0][0] * cols + s[0][1] if s else -1 for s in still], dtype=np.int64),
+            still_since=np.array([s[1] if s else 0 for s in still], dtype=np.int64))
+    else:
+        empty = np.empty(0, dtype=np.int64)
+        arrays.update(fleet=empty, fleet_rng=np.empty(0, dtype=np.uint64), pool=empty, departure=empty,
+                      origin=empty, still_cell=empty, still_since=empty)
+    for name in ('car_cell', 'car_dest', 'car_light', 'path_len', 'path_first', 'leg_len', 'origin', 'still_cell'):
+        arrays[name] = arrays[name].astype(CELL)
+    return Checkpoint(arrays)
+
+
+def restore(model, checkpoint):
+    # Lleva un modelo recién armado (setup, con los mismos parámetros) al estado de la instantánea
+    supported(model)
+    a = checkpoint.arrays
+    meta = a['meta']
+    rows, cols = model.grid_map.shape
+    if (int(meta[ROWS]), int(meta[COLS]), int(meta[LIGHTS])) != (rows, cols, len(model.traffic_lights)) \
+            or bool(meta[VECTOR]) != (model.engine is not None) or (len(a['fleet']) > 0) != (model.fleet is not None):
+        raise ValueError("La instantánea es de un modelo con otro mapa, motor o flota")
+
+    # Celdas editadas durante la corrida (edit_cells, agrupadas por valor)
+    grid_map = a['map'].astype(model.grid_map.dtype)
+    changed = np.argwhere(grid_map != model.grid_map)
+    for value in np.unique(grid_map[tuple(changed.T)]).tolist():
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.edit_cells(changed[grid_map[tuple(changed.T)] == value], value)
+
+    model.global_timer = int(meta[TICK])
+    model.idle = bool(meta[IDLE])
+    model.signals = None  # Se rehace en el siguiente paso con los estados restaurados
+    states = a['light_state']
+    for tl, state in zip(model.traffic_lights, states.tolist()):
+        tl.state = STATES[state]
+    controller = model.controller
+    if controller is not None:
+        started = a['controller'].shape[1] > 0
+        controller.active = a['controller'][0].copy() if started else None
+        controller.since = a['controller'][1].copy() if started else None
+        controller.switches = int(meta[SWITCHES])
+
+    if model.engine is not None:
+        restore_engine(model.engine, a)
+    else:
+        restore_cars(model, a)
+    model._id_counter = int(meta[ID_COUNTER])
+    return model
+
+
+def restore_cars(model, a):
+    # Motor de agentes: los coches (los del escenario y los que creó la flota) con sus ids originales
+    cols = model.grid_map.shape[1]
+    known = {car.id: car for car in model.cars}
+    if model.fleet is not None:
+        known.update((car.id, car) for car in model.fleet.pool)
+
+    def agent(car_id):
+        car = known.get(car_id)
+        if car is None:
+            car = known[car_id] = Car(model)
+            car.id = car_id
+        return car
+
+    ids = a['car_id'].tolist()
+    cars = [agent(car_id) for car_id in ids]
+    model.grid.remove_agents([car for car in model.cars])
+    r, c = np.divmod(a['car_cell'], cols)
+    model.grid.add_agents(cars, positions=list(zip(r.tolist(), c.tolist())))
+    model.cars[:] = cars
+
+    table = directions(model)
+    dest_r, dest_c = np.divmod(a['car_dest'], cols)
+    path_len = a['path_len'].astype(np.int64)
+    path_r, path_c = np.divmod(decode_paths(a['path_first'], a['path_moves'], path_len, cols), cols)
+    cells = list(zip(path_r.tolist(), path_c.tolist()))
+    legs = [tuple(leg) for leg in a['legs'].tolist()]
+    path_end = np.cumsum(path_len).tolist()
+    leg_end = np.cumsum(a['leg_len']).tolist()
+    lights = model.traffic_lights
+    for i, car in enumerate(cars):
+        car.direction = table[a['car_direction'][i]]
+        light = int(a['car_light'][i])
+        car.trafficLight = lights[light] if light >= 0 else None
+        car.destination = [int(dest_r[i]), int(dest_c[i])] if a['car_dest'][i] >= 0 else None
+        car.velocity = int(a['car_velocity'][i])
+        path = tuple(cells[path_end[i] - int(path_len[i]):path_end[i]])
+        car.path, car.cursor = path if path else [], 0
+        car.legs = deque(legs[leg_end[i] - int(a['leg_len'][i]):leg_end[i]])
+
+    fleet = model.fleet
+    if fleet is not None:
+        for name, value in zip(FLEET_COUNTERS, a['fleet'].tolist()):
+            setattr(fleet, name, value)
+        s = [int(v) for v in a['fleet_rng'].tolist()]
+        fleet.rng.bit_generator.state = {'bit_generator': 'PCG64',
+                                         'state': {'state': s[0] << 64 | s[1], 'inc': s[2] << 64 | s[3]},
+                                         'has_uint32': s[4], 'uinteger': s[5]}
+        fleet.pool = [agent(car_id) for car_id in a['pool'].tolist()]
+        origin_r, origin_c = np.divmod(a['origin'], cols)
+        still_r, still_c = np.divmod(a['still_cell'], cols)
+        fleet.departures = dict(zip(ids, a['departure'].tolist()))
+        fleet.origins = dict(zip(ids, zip(origin_r.tolist(), origin_c.tolist())))
+        fleet.still = {car_id: ((sr, sc), since) for car_id, sr, sc, since, cell
+                       in zip(ids, still_r.tolist(), still_c.tolist(), a['still_since'].tolist(),
+                              a['still_cell'].tolist()) if cell >= 0}
+
+
+def restore_engine(engine, a):
+    # Motor vectorial: los arreglos directamente (los coches son los mismos, sin flota); los agentes
+    # se actualizan con sync()
+    if a['car_id'].tolist() != [car.id for car in engine.cars]:
+        raise ValueError("La instantánea es de un modelo con otros coches")
+    engine.light_state[:-1] = a['light_state']
+    engine.cell = a['car_cell'].astype(np.int64)
+    engine.dest = a['car_dest'].astype(np.int64)
+    engine.dest_row, engine.dest_col = np.divmod(engine.dest, engine.cols)
+    engine.light = a['car_light'].astype(np.int64)
+    engine.velocity = a['car_velocity'].copy()
+    engine.distance = engine.distance_to_destination(engine.cell, np.arange(len(engine.cars)))
+    engine.path_len = a['path_len'].astype(np.int64)
+    engine.path_start = np.cumsum(engine.path_len) - engine.path_len
+    engine.cursor = np.zeros(len(engine.cars), dtype=np.int64)
+    engine.path_cells = decode_paths(a['path_first'], a['path_moves'], engine.path_len, engine.cols)
+    engine.path_changed[:] = True
+    engine.advance_paths(np.arange(len(engine.cars)))
+    engine.occ[:] = EMPTY
+    for tl in engine.lights:
+        row, col = engine.model.grid.positions[tl]
+        engine.occ[row * engine.cols + col] = STATIC
+    engine.occ[engine.cell] = np.arange(len(engine.cars))
+    engine.idle = bool(a['meta'][IDLE])
+    for car, dest in zip(engine.cars, np.stack([engine.dest_row, engine.dest_col], axis=1).tolist()):
+        car.destination = dest
+    engine.sync()
+
+
+def resume(parameters, checkpoint):
+    # Modelo nuevo con `parameters` en el estado de la instantánea
+    model = TrafficModel(parameters)
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+    return restore(model, checkpoint)
+
+
+def run_branch(parameters, data, change, ticks, measure):
+    # Una rama: restaura, aplica el cambio (una función sobre el modelo, o None) y simula `ticks` ticks
+    model = resume(parameters, Checkpoint.from_bytes(data))
+    with contextlib.redirect_stdout(io.StringIO()):
+        if change is not None:
+            change(model)
+        model.run_ticks(ticks)
+    result = measure(model)
+    model.end()
+    return result
+
+
+def fork(parameters, checkpoint, changes, ticks, measure=checkpoint, workers=None):
+    # Una rama por cambio desde la misma instantánea, en paralelo como experimentos.sweep; los cambios
+    # y `measure` (modelo -> resultado, por defecto su instantánea final) deben poder enviarse a otro
+    # proceso (funciones de módulo o functools.partial). Los resultados salen en el orden de `changes`.
+    data = checkpoint.to_bytes()  # Lo que viaja a cada proceso
+    args = [(parameters, data, change, ticks, measure) for change in changes]
+    if workers == 1:
+        return [run_branch(*arg) for arg in args]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_branch, *zip(*args), chunksize=1))
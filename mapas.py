@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+# Escenario original de 12x12: una intersección, cuatro semáforos y siete coches
+DEFAULT_GRID = np.array([
+    [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
+    [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
+    [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
+    [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
+    [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+    [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+    [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+    [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+    [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
+    [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
+    [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
+    [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
+])
+DEFAULT_LIGHTS = [(3, 3), (9, 3), (9, 9), (3, 9)]
+DEFAULT_CARS = [(5, 3), (5, 2), (3, 7), (3, 8), (7, 9), (7, 10), (9, 5)]
+DEFAULT_DIRECTIONS = ['frente', 'frente', 'right', 'right', 'left', 'left', 'left']
+
+# Cuadrantes alrededor de una intersección, en el orden de sus semáforos (y del anillo):
+# 0 arriba-izquierda (va al este), 1 abajo-izquierda (al norte),
+# 2 abajo-derecha (al oeste), 3 arriba-derecha (al sur)
+LIGHTS_PER_INTERSECTION = 4
+
+
+def band_centers(is_road, n):
+    # Centro de cada franja de calles consecutivas; sin franjas, el centro del mapa
+    roads = np.flatnonzero(is_road)
+    if not roads.size:
+        return np.array([n // 2])
+    starts = roads[np.r_[True, np.diff(roads) > 1]]
+    ends = roads[np.r_[np.diff(roads) > 1, True]]
+    return starts + (ends - starts + 1) // 2
+
+
+# Búsqueda espacial precalculada a partir del mapa: las calles horizontales y
+# verticales son filas y columnas completamente transitables, y cada celda
+# pertenece a la intersección más cercana en cada eje. Solo guarda arreglos 1-D
+# (uno por fila y otro por columna), así que no crece con el área del mapa.
+class SpatialLookup:
+    def __init__(self, grid):
+        road = np.asarray(grid) != 0
+        self.shape = road.shape
+        self.center_rows = band_centers(road.all(axis=1), self.shape[0])
+        self.center_cols = band_centers(road.all(axis=0), self.shape[1])
+        self.row_band, self.upper = self.nearest(self.center_rows, self.shape[0])
+        self.col_band, self.left = self.nearest(self.center_cols, self.shape[1])
+
+    @staticmethod
+    def nearest(centers, n):
+        index = np.arange(n)
+        band = np.searchsorted((centers[:-1] + centers[1:]) / 2, index, side='right')
+        return band, index < centers[band]
+
+    def intersection(self, position):
+        return int(self.row_band[position[0]]) * len(self.center_cols) + int(self.col_band[position[1]])
+
+    def quadrant(self, position):
+        upper, left = self.upper[position[0]], self.left[position[1]]
+        if upper:
+            return 0 if left else 3
+        return 1 if left else 2
+
+    def sector(self, position):
+        # Índice del semáforo que controla la celda
+        return self.intersection(position) * LIGHTS_PER_INTERSECTION + self.quadrant(position)
+
+    def destination(self, position):
+        # Salida en el borde del mapa según el sentido del cuadrante
+        row, col = int(position[0]), int(position[1])
+        quadrant = self.quadrant(position)
+        if quadrant == 0:
+            return [row, self.shape[1] - 1]
+        elif quadrant == 3:
+            return [self.shape[0] - 1, col]
+        elif quadrant == 1:
+            return [0, col]
+        return [row, 0]
+
+
+# Mapa con sus semáforos y coches iniciales. Los semáforos van por intersección:
+# por defecto en grupos de cuatro consecutivos (como los pone generate_city), o
+# en los grupos dados (`groups`, índices de semáforos en el orden del anillo).
+class CityMap:
+    def __init__(self, grid, lights=(), cars=(), directions=None, source=None, groups=None):
+        self.grid = grid
+        self.source = source  # Archivo del que se leyó (ahí junto se guarda el grafo de intersecciones)
+        self.lights = [tuple(int(v) for v in p) for p in lights]
+        self.cars = [tuple(int(v) for v in p) for p in cars]
+        self.directions = list(directions) if directions is not None else ['frente'] * len(self.cars)
+        self.groups = [[int(i) for i in group] for group in groups] if groups is not None else None
+
+    def light_groups(self):
+        if self.groups is not None:
+            return self.groups
+        n = LIGHTS_PER_INTERSECTION
+        return [range(i, min(i + n, len(self.lights))) for i in range(0, len(self.lights), n)]
+
+
+def default_city():
+    return CityMap(DEFAULT_GRID, DEFAULT_LIGHTS, DEFAULT_CARS, DEFAULT_DIRECTIONS)
+
+
+# Ciudad tipo Manhattan con n_rows x n_cols intersecciones. Las manzanas miden
+# `block` celdas y las calles `road`; cada intersección lleva cuatro semáforos
+# en las esquinas y hasta `cars_per_approach` coches en el carril interior de
+# cada acceso.
+def generate_city(n_rows, n_cols, block=4, road=4, cars_per_approach=2):
+    if block < 1 or road < 2:
+        raise ValueError("Se necesita block >= 1 y road >= 2")
+    rows, cols = n_rows * (block + road) + block, n_cols * (block + road) + block
+    grid = np.zeros((rows, cols), dtype=np.int8)
+    road_starts_r = [block + i * (block + road) for i in range(n_rows)]
+    road_starts_c = [block + j * (block + road) for j in range(n_cols)]
+    for r in road_starts_r:
+        grid[r:r + road, :] = 1
+    for c in road_starts_c:
+        grid[:, c:c + road] = 1
+
+    # Los coches de un acceso no pasan de la mitad de la manzana (ahí empieza la intersección vecina)
+    per_approach = min(cars_per_approach, (block + 1) // 2)
+    lights, cars = [], []
+    for rs in road_starts_r:
+        for cs in road_starts_c:
+            re, ce = rs + road - 1, cs + road - 1
+            cr, cc = rs + road // 2, cs + road // 2
+            lights += [(rs - 1, cs - 1), (re + 1, cs - 1), (re + 1, ce + 1), (rs - 1, ce + 1)]
+            for i in range(per_approach):
+                cars += [(cr - 1, cs - 1 - i), (re + 1 + i, cc - 1), (cr, ce + 1 + i), (rs - 1 - i, cc)]
+    return CityMap(grid, lights, cars)
+
+
+# Archivos de mapa: la cuadrícula en .npy (o texto) y, opcionalmente, un .json al
+# lado con semáforos, coches, direcciones y grupos de semáforos. Los .npy se abren con memoria mapeada.
+def save_city(city, path):
+    base, _ = os.path.splitext(path)
+    np.save(base + '.npy', np.asarray(city.grid))
+    with open(base + '.json', 'w') as f:
+        extras = {'lights': city.lights, 'cars': city.cars, 'directions': city.directions}
+        if city.groups is not None:
+            extras['groups'] = city.groups
+        json.dump(extras, f)
+
+
+def load_city(path, mmap=True):
+    base, ext = os.path.splitext(path)
+    if ext == '.npy':
+        grid = np.load(path, mmap_mode='r' if mmap else None)
+    else:
+        grid = np.loadtxt(path, dtype=np.int8, delimiter=',' if ext == '.csv' else None, ndmin=2)
+    if grid.ndim != 2:
+        raise ValueError(f"El mapa debe ser bidimensional: {path}")
+    extras = {}
+    if os.path.exists(base + '.json'):
+        with open(base + '.json') as f:
+            extras = json.load(f)
+    return CityMap(grid, extras.get('lights', ()), extras.get('cars', ()), extras.get('directions'), source=path,
+                   groups=extras.get('groups'))
+
+
+def resolve_city(spec):
+    # Acepta None (escenario por defecto), una ruta de archivo o un CityMap ya construido
+    if spec is None:
+        return default_city()
+    if isinstance(spec, CityMap):
+        return spec
+    return load_city(spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera una ciudad tipo Manhattan y la guarda como .npy + .json")
+    parser.add_argument('salida', help="Ruta del mapa (p. ej. ciudad.npy)")
+    parser.add_argument('--intersecciones', type=int, nargs=2, default=[10, 10], metavar=('FILAS', 'COLUMNAS'))
+    parser.add_argument('--manzana', type=int, default=4)
+    parser.add_argument('--calle', type=int, default=4)
+    parser.add_argument('--coches', type=int, default=2, help="Coches por acceso de cada intersección")
+    args = parser.parse_args()
+    city = generate_city(*args.intersecciones, block=args.manzana, road=args.calle, cars_per_approach=args.coches)
+    save_city(city, args.salida)
+    print(f"{args.salida}: {city.grid.shape[0]}x{city.grid.shape[1]}, "
+          f"{len(city.lights)} semáforos, {len(city.cars)} coches")
+
+
+if __name__ == "__main__":
+    main()
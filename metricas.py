@@ -0,0 +1,212 @@
+import bisect
+import functools
+import inspect
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Instrumentación opcional de las rutas calientes: contadores e histogramas de
+# latencia por fase. Desactivada no cuesta nada: enable() reemplaza las funciones
+# medidas por versiones envueltas que toman el tiempo y disable() devuelve las
+# originales, así que el código sin instrumentar no tiene ni un `if`.
+
+# Límites superiores de las cubetas del histograma, en microsegundos (la última es +Inf)
+BUCKETS_US = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000, 500000,
+              1000000)
+BUCKETS_NS = tuple(b * 1000 for b in BUCKETS_US)
+
+# Funciones medidas: (módulo, clase o None, atributo) -> nombre de la métrica. Solo se
+# instrumentan los módulos ya importados (p. ej. servidor solo si corre el servidor).
+TARGETS = {
+    ('modelo', 'TrafficModel', 'step'): 'step',
+    ('modelo', 'TrafficLight', 'update'): 'light_update',
+    ('modelo', 'Car', 'update'): 'car_update',
+    ('modelo', 'Car', 'check_collision'): 'check_collision',
+    ('motor_vectorial', 'VectorEngine', 'update_lights'): 'light_update',
+    ('motor_vectorial', 'VectorEngine', 'update_cars'): 'car_update',
+    ('rutas', None, 'a_star_search'): 'a_star_search',
+    ('protocolo', 'DeltaEncoder', 'frame'): 'encode',
+    ('difusion', 'Message', 'encode'): 'serialize',
+    ('servidor', None, 'send_position_update'): 'send',
+    ('servidor', None, 'send'): 'send',
+}
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_NS) + 1)
+        self.count = 0
+        self.sum_ns = 0
+        self.max_ns = 0
+
+    def observe(self, ns):
+        self.counts[bisect.bisect_left(BUCKETS_NS, ns)] += 1
+        self.count += 1
+        self.sum_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def quantile(self, q):
+        # Estimación por el límite superior de la cubeta (en µs); el máximo si cae en +Inf
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, n in zip(BUCKETS_US, self.counts):
+            seen += n
+            if seen >= rank:
+                return float(bound)
+        return self.max_ns / 1000
+
+    def summary(self):
+        return {'count': self.count,
+                'mean_us': self.sum_ns / self.count / 1000 if self.count else 0.0,
+                'p50_us': self.quantile(0.5),
+                'p99_us': self.quantile(0.99),
+                'max_us': self.max_ns / 1000}
+
+
+class Registry:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()  # La simulación y el servidor registran desde hilos distintos
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}  # Nombre -> función sin argumentos, evaluada al consultar
+        self.originals = []
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, ns):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(ns)
+
+    def gauge(self, name, function):
+        self.gauges[name] = function
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        with self.lock:
+            data = {'counters': dict(self.counters),
+                    'latency': {name: h.summary() for name, h in sorted(self.histograms.items())}}
+        data['gauges'] = {name: function() for name, function in self.gauges.items()}
+        return data
+
+    def prometheus(self):
+        # Formato de texto de Prometheus; latencias en segundos
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                lines += [f"# TYPE traffic_{name}_total counter", f"traffic_{name}_total {value}"]
+            for name, h in sorted(self.histograms.items()):
+                lines.append(f"# TYPE traffic_{name}_seconds histogram")
+                cumulative = 0
+                for bound, n in zip(BUCKETS_US + ('+Inf',), h.counts):
+                    cumulative += n
+                    le = bound if bound == '+Inf' else f"{bound / 1e6:g}"
+                    lines.append(f'traffic_{name}_seconds_bucket{{le="{le}"}} {cumulative}')
+                lines += [f"traffic_{name}_seconds_sum {h.sum_ns / 1e9:.9f}",
+                          f"traffic_{name}_seconds_count {h.count}"]
+        for name, function in sorted(self.gauges.items()):
+            lines += [f"# TYPE traffic_{name} gauge", f"traffic_{name} {function()}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def timed(name, function):
+    # Versión de `function` que registra su duración en el histograma `name`
+    clock = time.perf_counter_ns
+    if inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                registry.observe(name, clock() - start)
+    else:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                registry.observe(name, clock() - start)
+    return wrapper
+
+
+def enable(modules=None):
+    # Instrumenta las funciones de TARGETS de los módulos ya importados (idempotente).
+    # `modules` permite indicar un módulo por nombre, p. ej. el servidor cuando corre como __main__.
+    if registry.enabled:
+        return
+    modules = {**sys.modules, **(modules or {})}
+    for (module_name, class_name, attribute), name in TARGETS.items():
+        module = modules.get(module_name)
+        if module is None:
+            continue
+        owner = getattr(module, class_name) if class_name else module
+        original = vars(owner)[attribute]
+        registry.originals.append((owner, attribute, original))
+        setattr(owner, attribute, timed(name, original))
+    registry.enabled = True
+
+
+def disable():
+    for owner, attribute, original in reversed(registry.originals):
+        setattr(owner, attribute, original)
+    registry.originals.clear()
+    registry.enabled = False
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body, content_type = registry.prometheus().encode(), 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body, content_type = json.dumps(registry.snapshot()).encode(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Sin una línea por consulta en la consola del servidor
+
+
+def serve(port, host='127.0.0.1'):
+    # Endpoint local de métricas (/metrics para Prometheus, /metrics.json) en un hilo aparte
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metricas', daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    # Perfil rápido de una corrida sin servidor: python metricas.py [pasos]
+    import contextlib
+    import io
+    from modelo import TrafficModel
+    enable()
+    model = TrafficModel()
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+        for _ in range(steps):
+            model.step()
+    print(json.dumps(registry.snapshot()['latency'], indent=2))
@@ -1,10 +1,17 @@
 import agentpy as ap
-import IPython
 import random
+import warnings
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-import heapq
+from collections import deque
+from motor_vectorial import STATES, VectorEngine
+from particion import TiledEngine
+from controladores import make_controller
+from flota import PATIENCE, Fleet
+from grafo import load_graph
+from reservas import WINDOW, CooperativePlanner
+from mapas import SpatialLookup, resolve_city
+from rutas import DistanceFields, FlowFields, heuristic, map_version, path_cache
+from semaforos import SignalScheduler
 
 # Definición del agente semáforo
 class TrafficLight(ap.Agent):
@@ -16,13 +23,15 @@ class TrafficLight(ap.Agent):
 
     def update(self, global_timer):
         # Cambiar el estado del semáforo basado en el temporizador global
-        cycle_length = 26
-        if self.state == "green" and global_timer % cycle_length == 10:
+        cycle_length = self.model.cycle_length
+        phase = global_timer % cycle_length
+        if self.state == "green" and phase == self.model.yellow_at:
             self.state = "yellow"
-        elif self.state == "yellow" and global_timer % cycle_length == 13:
+            self.schedule(global_timer)
+        elif self.state == "yellow" and phase == self.model.red_at:
             self.state = "red"
             self.sendMessage()
-        elif self.state == "red" and global_timer % cycle_length == 0:
+        elif self.state == "red" and phase == 0:
             pass  # Esperar a recibir mensaje
 
     def sendMessage(self):
@@ -31,69 +40,21 @@ class TrafficLight(ap.Agent):
 
     def receiveMessage(self):
         self.state = "green"
+        self.schedule(self.model.global_timer)
 
-# Heurística de A* (distancia de Manhattan)
-def heuristic(a, b):
-    return abs(a[0] - b[0]) + abs(a[1] - b[1])
-
-# Función de búsqueda A* mejorada
-def a_star_search(grid, start, goal):
-    if not (0 <= start[0] < grid.shape[0] and 0 <= start[1] < grid.shape[1]):
-        raise ValueError(f"Start position out of bounds: {start}")
-    if not (0 <= goal[0] < grid.shape[0] and 0 <= goal[1] < grid.shape[1]):
-        raise ValueError(f"Goal position out of bounds: {goal}")
-    
-    if grid[goal[0]][goal[1]] == 0:
-        raise ValueError(f"Goal position is not traversable: {goal}")
-
-    neighbors = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-    close_set = set()
-    came_from = {}
-    gscore = {start: 0}
-    fscore = {start: heuristic(start, goal)}
-    oheap = []
-    heapq.heappush(oheap, (fscore[start], start))
-
-    while oheap:
-        current = heapq.heappop(oheap)[1]
-
-        if current == goal:
-            data = []
-            while current in came_from:
-                data.append(current)
-                current = came_from[current]
-            data.append(start)
-            data.reverse()
-            return data
-
-        close_set.add(current)
-        for i, j in neighbors:
-            neighbor = current[0] + i, current[1] + j
-            tentative_g_score = gscore[current] + 1
-
-            if 0 <= neighbor[0] < grid.shape[0] and 0 <= neighbor[1] < grid.shape[1]:
-                if grid[neighbor[0]][neighbor[1]] == 0:
-                    continue
-            else:
-                continue
-
-            if neighbor in close_set and tentative_g_score >= gscore.get(neighbor, float('inf')):
-                continue
-
-            if tentative_g_score < gscore.get(neighbor, float('inf')) or neighbor not in [i[1] for i in oheap]:
-                came_from[neighbor] = current
-                gscore[neighbor] = tentative_g_score
-                fscore[neighbor] = tentative_g_score + heuristic(neighbor, goal)
-                heapq.heappush(oheap, (fscore[neighbor], neighbor))
-
-    return []
+    def schedule(self, global_timer):
+        # Avisa a la agenda del modelo de la siguiente transición de este semáforo
+        if self.model.signals is not None:
+            self.model.signals.watch(self, global_timer)
 
 # Definición del agente vehículo mejorada
 class Car(ap.Agent):
     def setup(self):
         self.velocity = 0  # Estacionario
         self.next = np.array([0, 0])  # Siguiente movimiento
-        self.path = []  # Ruta calculada por A*
+        self.path = []  # Ruta calculada por A* (compartida con la caché: no se modifica)
+        self.cursor = 0  # Índice en path de la celda actual
+        self.legs = deque()  # Tramos de la ruta en el grafo de intersecciones aún sin expandir (routing='graph')
         self.trafficLight = None  # Semáforo asignado
         self.destination = None
         self.direction = None
@@ -109,19 +70,12 @@ class Car(ap.Agent):
 
     def calcDestino(self, posicion, direccion, grid):
         columna, fila = posicion
-        destino = [columna, fila]
-        if columna < 6 and fila < 6:
-            destino = [columna, len(grid)-1]  
-        elif columna < 6 and fila >= 6:
-            destino = [len(grid)-1, fila]
-        elif columna >= 6 and fila < 6:
-            destino = [0, fila] 
-        elif columna >= 6 and fila >= 6:
-            destino = [columna, 0]
+        lookup = self.model.lookup
+        destino = lookup.destination(posicion)  # Salida según el cuadrante de la intersección
 
         while grid[destino[0]][destino[1]] == 0:
             if direccion == 'frente':
-                destino[0] += 1 if columna < grid.shape[0] // 2 else -1
+                destino[0] += 1 if lookup.upper[columna] else -1
             elif direccion == 'left':
                 destino[1] += 1
             elif direccion == 'right':
@@ -135,28 +89,91 @@ class Car(ap.Agent):
     def update(self):
         if self.destination is None:
             self.setDestino()
+        if self.model.routing == 'flow':
+            self.follow_flow_field()
+            return
         if not self.path:
-            try:
-                path = a_star_search(self.model.grid_map, self.model.grid.positions[self], tuple(self.destination))
-                if not path:
+            self.plan_route()
+
+        if len(self.path) > self.cursor + 1:
+            if self.advance(self.path[self.cursor + 1]):
+                self.cursor += 1  # Avanza sobre la ruta en lugar de recortarla
+                if self.legs and self.cursor + 1 == len(self.path):
+                    self.expand_leg()
+
+    def plan_route(self):
+        position = self.model.grid.positions[self]
+        try:
+            legs = self.model.graph.route(position, self.destination) if self.model.graph is not None else None
+            if legs is not None:
+                # Ruta en el grafo de intersecciones: las celdas de cada tramo se calculan al llegar a él
+                if not legs:
                     print(f"No se puede calcular la ruta para el coche {self}")
-                else:
-                    self.path = path
-            except ValueError as e:
-                print(e)
-        
-        if len(self.path) > 1:
-            next_position = self.path[1]
-            if self.trafficLight and self.trafficLight.state == "green" and not self.check_collision(next_position):
-                self.model.grid.move_to(self, next_position)
-                self.path.pop(0)  # Eliminar la posición alcanzada
-            elif self.check_collision(next_position):
-                self.negotiate(next_position)
+                    return
+                self.path, self.cursor, self.legs = (position,), 0, deque(legs)
+                self.expand_leg()
+                return
+            path = self.model.path_cache.find_path(self.model.grid_map, self.model.map_version,
+                                                   position, tuple(self.destination))
+            if not path:
+                print(f"No se puede calcular la ruta para el coche {self}")
+            else:
+                self.path, self.cursor = path, 0
+        except ValueError as e:
+            print(e)
+
+    def expand_leg(self):
+        graph = self.model.graph
+        row, col = self.path[self.cursor]
+        node, region = self.legs.popleft()
+        self.path, self.cursor = graph.expand(row * graph.cols + col, node, region), 0
+
+    def next_position(self):
+        # Celda a la que intentará avanzar en su próximo update (None si ya llegó o no tiene ruta)
+        if self.model.routing == 'flow':
+            try:
+                return self.model.flow_fields.next_hop(self.destination, self.model.grid.positions[self])
+            except ValueError:
+                return None
+        return self.path[self.cursor + 1] if len(self.path) > self.cursor + 1 else None
+
+    def remaining_path(self):
+        # Celdas de la ruta desde la actual (expandiendo los tramos pendientes)
+        path = tuple(self.path[self.cursor:])
+        graph = self.model.graph
+        for node, region in self.legs:
+            row, col = path[-1]
+            path += graph.expand(row * graph.cols + col, node, region)[1:]
+        return path
+
+    def follow_flow_field(self):
+        # Siguiente celda leída del campo de flujo compartido por el destino
+        position = self.model.grid.positions[self]
+        if position == tuple(self.destination):
+            return
+        try:
+            next_position = self.model.flow_fields.next_hop(self.destination, position)
+        except ValueError as e:
+            print(e)
+            return
+        if next_position is None:
+            print(f"No se puede calcular la ruta para el coche {self}")
+        else:
+            self.advance(next_position)
+
+    def advance(self, next_position):
+        blocked = self.check_collision(next_position)
+        if self.trafficLight and self.trafficLight.state == "green" and not blocked:
+            self.model.grid.move_to(self, next_position)
+            return True
+        elif blocked:
+            self.negotiate(next_position)
+        return False
 
     def check_collision(self, position):
-        for agent in self.model.grid.agents:
-            if agent is not self and self.model.grid.positions[agent] == position:
-                return agent
+        agent = self.model.grid.agent_at(position)
+        if agent is not None and agent is not self:
+            return agent
         return False
 
     def negotiate(self, position):
@@ -171,124 +188,368 @@ class Car(ap.Agent):
                 self.velocity = 0
                 other_car.velocity = 1
 
-# Definición del ambiente
-class Environment(ap.Grid):
-    def setup(self):
-        self.traffic_lights = ap.AgentList(self.model, 4, TrafficLight)
-        self.cars = ap.AgentList(self.model, 7, Car)  # Cambié el número de coches a 8
-        self.add_agents(self.traffic_lights, [(3, 3), (9, 3), (9, 9), (2, 9)])
+# OccupancyGrid se apoya en ap.objects.SpatialEnvironment, que no es parte de la
+# interfaz documentada de agentpy: está escrita contra esta versión.
+AGENTPY_VERSION = '0.1.5'
+if ap.__version__ != AGENTPY_VERSION:
+    warnings.warn(f"OccupancyGrid se escribió para agentpy {AGENTPY_VERSION} (instalada: {ap.__version__})")
+
+# Grid dispersa que mantiene un índice de ocupación (id de agente por celda).
+# A diferencia de ap.Grid no crea un AgentSet por celda ni la lista de todas las
+# posiciones, así que el costo depende de los agentes y no del área del mapa.
+# Hereda de SpatialEnvironment (la base de ap.Grid, que aporta record_positions)
+# y solo implementa lo que usa el modelo: add_agents, remove_agents, move_to,
+# move_by, positions, agents y agent_at. Lo demás de ap.Grid (neighbors, apply,
+# attr_grid, campos...) no existe aquí y da AttributeError.
+class OccupancyGrid(ap.objects.SpatialEnvironment):
+    def __init__(self, model, shape, torus=False, **kwargs):
+        super().__init__(model)
+        self.torus = torus
+        self.positions = {}
+        self.cells = {}  # Solo celdas ocupadas: posición -> lista de agentes
+        self.shape = tuple(shape)
+        self.ndim = len(self.shape)
+        self.occupancy = np.full(self.shape, -1, dtype=np.int32)  # -1 = celda libre
+        self.agents_by_id = {}
+        self._set_var_ignore()
+        self.setup(**kwargs)
+
+    @property
+    def agents(self):
+        return ap.AgentIter(self.model, self.positions.keys())
+
+    def add_agents(self, agents, positions):
+        # A diferencia de ap.Grid, las posiciones son obligatorias (no hay posiciones al azar ni vacías)
+        agents = ap.tools.make_list(agents)
+        positions = list(positions)
+        if len(positions) < len(agents):
+            raise ValueError(f"Faltan posiciones: {len(agents)} agentes, {len(positions)} posiciones")
+        for agent, position in zip(agents, positions):
+            position = tuple(position)
+            self.cells.setdefault(position, []).append(agent)
+            self.positions[agent] = position
+            self.occupancy[position] = agent.id
+            self.agents_by_id[agent.id] = agent
+
+    def remove_agents(self, agents):
+        for agent in ap.tools.make_list(agents):
+            pos = self.positions.pop(agent)
+            self.cells[pos].remove(agent)
+            self._refresh_cell(pos)
+            del self.agents_by_id[agent.id]
+
+    def move_to(self, agent, pos):
+        pos_old = self.positions[agent]
+        if pos != pos_old:
+            pos = self._border_behavior(pos)
+            self.cells[pos_old].remove(agent)
+            self._refresh_cell(pos_old)
+            self.cells.setdefault(pos, []).append(agent)
+            self.positions[agent] = pos
+            self.occupancy[pos] = agent.id
+
+    def move_by(self, agent, path):
+        self.move_to(agent, tuple(p + c for p, c in zip(self.positions[agent], path)))
+
+    def _border_behavior(self, position):
+        # Igual que ap.Grid: con torus da la vuelta, si no se queda en el borde
+        if self.torus:
+            return tuple(p % n for p, n in zip(position, self.shape))
+        return tuple(min(max(p, 0), n - 1) for p, n in zip(position, self.shape))
+
+    def _refresh_cell(self, pos):
+        # Si otro agente sigue en la celda, el índice apunta a él
+        remaining = self.cells[pos]
+        if remaining:
+            self.occupancy[pos] = remaining[0].id
+        else:
+            del self.cells[pos]
+            self.occupancy[pos] = -1
 
-        car_positions = [(5, 3), (5, 2), (3, 7), (3,8), (7, 9), (7, 10), (9, 5), (10, 5)]
-        car_directions = ['frente', 'frente', 'right', 'right', 'left', 'left', 'left', 'left']  # Añadí más direcciones
-        self.add_agents(self.cars, car_positions)
+    def agent_at(self, position):
+        agent_id = self.occupancy[position[0], position[1]]
+        if agent_id < 0:
+            return None
+        return self.agents_by_id[agent_id]
 
-        for car, direction in zip(self.cars, car_directions):
+# Definición del ambiente: semáforos y coches del escenario (model.city)
+class Environment(OccupancyGrid):
+    def setup(self):
+        city = self.model.city
+        self.traffic_lights = ap.AgentList(self.model, len(city.lights), TrafficLight)
+        self.cars = ap.AgentList(self.model, len(city.cars), Car)
+        self.add_agents(self.traffic_lights, city.lights)
+        self.add_agents(self.cars, city.cars)
+
+        for car, direction in zip(self.cars, city.directions):
             car.direction = direction
 
         # Asignar semáforos a los coches basado en los sectores
         for car in self.cars:
             car.trafficLight = self.assign_traffic_light(car)
 
-        # Definir vecinos para los semáforos (sentido de las manecillas del reloj)
-        self.traffic_lights[0].neighbors.append(self.traffic_lights[1])
-        self.traffic_lights[1].neighbors.append(self.traffic_lights[2])
-        self.traffic_lights[2].neighbors.append(self.traffic_lights[3])
-        self.traffic_lights[3].neighbors.append(self.traffic_lights[0])
+        # Definir vecinos para los semáforos de cada intersección (sentido de las manecillas del reloj)
+        for group in city.light_groups():
+            for k, i in enumerate(group):
+                following = group[(k + 1) % len(group)]
+                self.traffic_lights[i].neighbors.append(self.traffic_lights[following])
 
     def assign_traffic_light(self, car):
-        pos = self.positions[car]
-        if pos[0] < 6 and pos[1] < 6:
-            return self.traffic_lights[0]  # Sector 1 
-        elif pos[0] < 6 and pos[1] >= 6:
-            return self.traffic_lights[3]  # Sector 2
-        elif pos[0] >= 6 and pos[1] < 6:
-            return self.traffic_lights[1]  # Sector 3
-        elif pos[0] >= 6 and pos[1] >= 6:
-            return self.traffic_lights[2]  # Sector 4 
+        return self.light_at(self.positions[car])
+
+    def light_at(self, position):
+        # Sector precalculado a partir del mapa: intersección más cercana y cuadrante
+        sector = self.model.lookup.sector(position)
+        if sector < len(self.traffic_lights):
+            return self.traffic_lights[sector]
+        return None
 
 # Definición del modelo
 class TrafficModel(ap.Model):
+    # Ciclo de los semáforos: pasan a amarillo en la fase yellow_at y a rojo en red_at
+    cycle_length = 26
+    yellow_at = 10
+    red_at = 13
+    signals = None  # Agenda de transiciones (semaforos.py); se crea en el primer paso
+    planner = None  # Planeación con reservas (conflicts='reservations')
+    fleet = None  # Llegadas continuas (arrivals, ver flota.py)
+    graph = None  # Grafo de intersecciones (routing='graph', ver grafo.py)
+    controller = None  # Semáforos por demanda (controller='actuated', ver controladores.py)
+    fast_forward = False
+    idle = False  # ¿En el último tick ningún coche podía avanzar?
+
     def setup(self):
-        self.grid_map = np.array([
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-        ])
-        self.grid = ap.Grid(self, (self.grid_map.shape[0], self.grid_map.shape[1]), torus=False)
-        self.environment = Environment(self, (self.grid_map.shape[0], self.grid_map.shape[1]), torus=False)
+        # Escenario: None (el cruce original de 12x12), ruta a un mapa o un CityMap (ver mapas.py)
+        self.city = resolve_city(self.p.get('map'))
+        self.set_map(self.city.grid)
+        self.grid = OccupancyGrid(self, self.grid_map.shape, torus=False)
+        self.environment = Environment(self, self.grid_map.shape, torus=False)
         self.traffic_lights = self.environment.traffic_lights
         self.cars = self.environment.cars
         self.global_timer = 0  # Temporizador global
-
-        self.grid.add_agents(self.traffic_lights, positions=[(3, 3), (9, 3), (9, 9), (3, 9)])
-        self.grid.add_agents(self.cars, positions=[(5, 3), (5, 2), (3, 7), (3,8), (7, 9), (7, 10), (9, 5), (10, 5)])
-
-        initial_green_light = random.choice(self.traffic_lights)
-        initial_green_light.state = "green"
+        # 'astar' (ruta por coche), 'flow' (campo de flujo por destino) o 'graph' (A* sobre el grafo de
+        # intersecciones, guardado en disco junto al mapa)
+        self.routing = self.p.get('routing', 'astar')
+        self.path_cache = path_cache
+        if self.routing == 'graph':
+            self.graph = load_graph(self.grid_map, self.map_version, self.city.source)
+        self.cycle_length = self.p.get('cycle_length', TrafficModel.cycle_length)
+        self.yellow_at = self.p.get('yellow_at', TrafficModel.yellow_at)
+        self.red_at = self.p.get('red_at', TrafficModel.red_at)
+        if not 0 < self.yellow_at < self.red_at < self.cycle_length:
+            raise ValueError(f"Ciclo inválido: amarillo en {self.yellow_at}, rojo en {self.red_at}, "
+                             f"longitud {self.cycle_length}")
+
+        self.grid.add_agents(self.traffic_lights, positions=self.city.lights)
+        self.grid.add_agents(self.cars, positions=self.city.cars)
+
+        # Un semáforo inicial en verde por intersección
+        for group in self.city.light_groups():
+            initial_green_light = random.choice([self.traffic_lights[i] for i in group])
+            initial_green_light.state = "green"
+        # Semáforos: 'fixed' (el ciclo fijo con el anillo de mensajes), 'actuated' (verde según la demanda
+        # de cada acceso, ver controladores.py) o un controlador propio
+        self.controller = make_controller(self.p.get('controller'), self)
+        self.light_index = {id(tl): i for i, tl in enumerate(self.traffic_lights)}
+
+        # Con fast_forward, run_ticks se salta los tramos en los que nada puede cambiar (antes de crear
+        # el motor: las zonas de 'tiled' lo leen en sus procesos)
+        self.fast_forward = self.p.get('fast_forward', False)
+
+        # Motor 'agents' (un agente a la vez), 'vector' (arreglos NumPy, los agentes son una vista)
+        # o 'tiled' (el vectorial repartido por zonas del mapa en `workers` procesos, ver particion.py)
+        engine = self.p.get('engine')
+        if engine == 'vector':
+            self.engine = VectorEngine(self)
+        elif engine == 'tiled':
+            self.engine = TiledEngine(self, self.p.get('workers', 2))
+        else:
+            self.engine = None
+        # Conflictos entre coches: 'negotiate' (chocan y negocian en cada tick) o 'reservations'
+        # (planean juntos sobre una tabla de reservas espacio-temporal, ver reservas.py)
+        self.conflicts = self.p.get('conflicts', 'negotiate')
+        if self.conflicts == 'reservations':
+            if self.engine is not None or self.controller is not None:
+                raise ValueError("Las reservas solo funcionan con el motor de agentes y el ciclo fijo")
+            self.planner = CooperativePlanner(self, self.p.get('window', WINDOW))
+        # Operación continua: en cada tick entran coches por los puntos de entrada (las posiciones
+        # iniciales del escenario) con probabilidad `arrivals` y salen los que llegan a su destino o
+        # llevan `patience` ticks atorados
+        arrivals = self.p.get('arrivals')
+        if arrivals is not None:
+            if self.engine is not None or self.planner is not None:
+                raise ValueError("Las llegadas continuas solo funcionan con el motor de agentes "
+                                 "y conflicts='negotiate'")
+            self.fleet = Fleet(self, Car, arrivals, self.p.get('patience', PATIENCE))
+
+    def set_map(self, grid_map):
+        # El mapa es de solo lectura: un mapa nuevo pasa por aquí para invalidar rutas y campos de flujo
+        # (los cambios de celdas durante la corrida, por edit_cells). Un mapa ya de solo lectura (p. ej.
+        # un .npy con memoria mapeada) se usa sin copiarlo.
+        if isinstance(grid_map, np.ndarray) and not grid_map.flags.writeable:
+            self.grid_map = grid_map
+        else:
+            self.grid_map = np.array(grid_map)
+            self.grid_map.flags.writeable = False
+        self.map_version = map_version(self.grid_map)
+        self.flow_fields = FlowFields(self.grid_map)
+        self.lookup = SpatialLookup(self.grid_map)
+        self.routes = DistanceFields(self.grid_map)
+
+    def set_cell(self, position, value):
+        self.edit_cells([position], value)
+
+    def edit_cells(self, positions, value):
+        # Cierra (value 0) o abre celdas durante la corrida (p. ej. un carril bloqueado). Las distancias
+        # a los destinos se reparan de forma incremental (DistanceFields) y solo cambian de ruta los coches
+        # cuya ruta pasa por una celda cerrada o, al abrir, los que ahora tienen una más corta. Las
+        # intersecciones (lookup) no cambian: un cierre no mueve semáforos ni salidas. Con routing='graph'
+        # se recalculan las aristas del grafo en las regiones editadas.
+        if isinstance(self.engine, TiledEngine) or self.planner is not None:
+            raise ValueError("Los cambios del mapa no funcionan con el motor por zonas ni con reservas")
+        rows, cols = np.asarray(positions, dtype=np.int64).reshape(-1, 2).T
+        grid_map = self.grid_map.copy()
+        grid_map[rows, cols] = value
+        grid_map.flags.writeable = False
+        cells = rows * grid_map.shape[1] + cols
+        if self.graph is not None:
+            # Los tramos pendientes se expanden con el grafo anterior (pueden cruzar las celdas editadas)
+            for car in self.cars:
+                if car.legs:
+                    car.path, car.cursor, car.legs = car.remaining_path(), 0, deque()
+            self.graph = self.graph.edited(grid_map, cells)  # Copia: el original es compartido
+        self.grid_map = grid_map
+        self.map_version = map_version(grid_map)
+        self.flow_fields = FlowFields(grid_map)
+        self.routes.update(cells, value != 0)
+        if self.routing == 'flow':
+            return
+        if self.engine is not None:
+            self.engine.reroute(self.routes, cells, closed=value == 0)
+            return
+        closed = {(int(r), int(c)) for r, c in zip(rows, cols)} if value == 0 else None
+        width = grid_map.shape[1]
+        for car in self.cars:
+            if not car.path or car.destination is None:
+                continue
+            path = car.remaining_path()
+            if closed is not None and not any(cell in closed for cell in path[1:]):
+                continue
+            try:
+                old = [row * width + col for row, col in path]
+                cells = self.routes.repair(car.destination, old)
+            except ValueError as e:
+                print(e)
+                cells = ()
+            if len(cells) != len(old) or closed is not None:
+                rows, cols = np.divmod(cells, width)
+                car.path, car.cursor, car.legs = tuple(zip(rows.tolist(), cols.tolist())), 0, deque()
 
     def step(self):
+        if self.engine is None and self.signals is None and self.controller is None:
+            self.signals = SignalScheduler(self.traffic_lights, self.cycle_length, self.yellow_at,
+                                           self.red_at, now=self.global_timer)
         self.global_timer += 1
-        for traffic_light in self.traffic_lights:
-            traffic_light.update(self.global_timer)
+        if self.engine is not None:
+            self.engine.step(self.global_timer)
+            self.idle = self.engine.idle
+            return
+        if self.controller is not None:
+            states = np.array([STATES.index(tl.state) for tl in self.traffic_lights], dtype=np.int8)
+            self.controller.step(states, self.approach_queues(), self.global_timer)
+            for traffic_light, state in zip(self.traffic_lights, states):
+                traffic_light.state = STATES[state]
+        else:
+            # Solo los semáforos con una transición pendiente en este tick (mismo orden que recorrerlos todos)
+            for traffic_light in self.signals.due(self.global_timer):
+                traffic_light.update(self.global_timer)
+        if self.planner is not None:
+            self.planner.step(self.global_timer)
+            return
+        if self.fast_forward:
+            self.idle = self.fleet is None and self.cars_waiting()  # Con llegadas ningún tick se repite
         for car in self.cars:
             car.update()
+        if self.fleet is not None:
+            self.fleet.step(self.global_timer)
+
+    def cars_waiting(self):
+        # Ningún coche puede avanzar en este tick (se evalúa tras actualizar los semáforos). Solo avanzan
+        # coches en verde, y un coche cuya siguiente celda está ocupada solo entra si el ocupante sale
+        # antes; toda cadena así termina en un coche en verde con la celda libre, así que basta con
+        # que no haya ninguno (p. ej. la cola detrás de un coche que ya llegó nunca avanza).
+        for car in self.cars:
+            light = car.trafficLight
+            if light is None or light.state != "green":
+                continue
+            if car.destination is None or (self.routing != 'flow' and not car.path):
+                return False  # Aún no calcula su ruta
+            target = car.next_position()
+            if target is not None and not car.check_collision(target):
+                return False
+        return True
+
+    def approach_queues(self):
+        # Demanda de cada acceso: coches de cada semáforo que avanzarían con verde (su siguiente celda
+        # está libre o aún no calculan su ruta)
+        lights = []
+        for car in self.cars:
+            if car.trafficLight is None:
+                continue
+            if car.destination is None or (self.routing != 'flow' and not car.path):
+                lights.append(self.light_index[id(car.trafficLight)])
+                continue
+            target = car.next_position()
+            if target is not None and not car.check_collision(target):
+                lights.append(self.light_index[id(car.trafficLight)])
+        return np.bincount(np.array(lights, dtype=np.int64), minlength=len(self.traffic_lights))
+
+    def next_signal_event(self):
+        # Tick de la siguiente transición de semáforo posible (None si no habrá más)
+        if self.controller is not None:
+            if self.engine is not None:
+                states, queues = self.engine.light_state[:-1], self.engine.approach_queues()
+            else:
+                states = np.array([STATES.index(tl.state) for tl in self.traffic_lights], dtype=np.int8)
+                queues = self.approach_queues()
+            return self.controller.next_event(states, queues, self.global_timer)
+        if self.engine is not None:
+            return self.engine.next_signal_event(self.global_timer)
+        return self.signals.next_event() if self.signals is not None else None
+
+    def run_ticks(self, ticks):
+        # Simula `ticks` ticks. Con fast_forward, tras un tick en el que ningún coche pudo avanzar
+        # salta hasta el tick previo al siguiente evento de semáforo: los ticks intermedios repetirían
+        # el mismo estado (mismas posiciones, y las negociaciones y rutas ya quedaron fijas en ese tick).
+        end = self.global_timer + ticks
+        while self.global_timer < end:
+            if self.fast_forward and self.idle:
+                following = self.next_signal_event()
+                self.global_timer = end if following is None else max(self.global_timer, min(end, following - 1))
+                if self.global_timer == end:
+                    break
+            self.step()
+        self.update()
 
     def update(self):
-        pass  # Aquí puedes actualizar la lógica de recolección de datos o visualización
+        # Con el motor vectorial, los agentes se actualizan desde los arreglos
+        if self.engine is not None:
+            self.engine.sync()
 
     def end(self):
-        pass  # Aquí puedes manejar la lógica de finalización del modelo
-
-# Función de animación personalizada
-def animation_plot(model, ax):
-    ax.clear()
-    grid = model.grid
-    grid_map = model.grid_map
-
-    for x in range(grid_map.shape[0]):
-        for y in range(grid_map.shape[1]):
-            if grid_map[x, y] == 0:
-                ax.add_patch(plt.Rectangle((y, x), 1, 1, color='dimgray'))  # No transitable
-            elif grid_map[x, y] == 1:
-                ax.add_patch(plt.Rectangle((y, x), 1, 1, color='lightgray'))  # Calle
-
-    positions = [grid.positions[agent] for agent in grid.agents]
-
-    colors = []
-    for agent in grid.agents:
-        if isinstance(agent, TrafficLight):
-            if agent.state == "red":
-                colors.append('red')
-            elif agent.state == "yellow":
-                colors.append('yellow')
-            else:
-                colors.append('green')
-        else:
-            colors.append('blue')
-
-    x, y = zip(*positions)
-    ax.scatter(y, x, c=colors, s=100, marker='s')  # 's' es para cuadros
-    ax.set_xlim(-1, grid_map.shape[1])
-    ax.set_ylim(-1, grid_map.shape[0])
-    ax.set_xticks(range(grid_map.shape[1]))
-    ax.set_yticks(range(grid_map.shape[0]))
-    ax.grid(True)
+        # Aquí puedes manejar la lógica de finalización del modelo
+        if self.engine is not None:
+            self.engine.close()
+
+# La visualización (matplotlib, IPython) vive en visualizacion.py y solo se
+# importa al usarla: importar este módulo basta para simular sin gráficos.
+def __getattr__(name):
+    if name == 'animation_plot':
+        from visualizacion import animation_plot
+        return animation_plot
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Ejecución del modelo
-parameters = {
-    'steps': 100
-}
-
-fig, ax = plt.subplots()
-model = TrafficModel(parameters)
-animation = ap.animate(model, fig, ax, animation_plot)
-IPython.display.HTML(animation.to_jshtml())
+if __name__ == "__main__":
+    from visualizacion import main
+    main()
@@ -0,0 +1,362 @@
+import numpy as np
+
+from rutas import MOVES
+from semaforos import next_tick
+
+# Motor de simulación por arreglos (struct-of-arrays). Mantiene posiciones,
+# cursores de ruta, semáforos asignados y velocidades de todos los coches en
+# arreglos NumPy y resuelve cada tick con operaciones por lotes. Reproduce el
+# orden secuencial de TrafficModel.step: los coches con índice menor mueven
+# primero, así que ocupan (o liberan) celdas antes del turno de los siguientes.
+# Los agentes TrafficLight y Car quedan como vista y se actualizan con sync().
+
+RED, YELLOW, GREEN = 0, 1, 2
+STATES = ("red", "yellow", "green")
+
+EMPTY = -1  # Celda libre en el índice de ocupación
+STATIC = -2  # Celda ocupada por un agente que no es coche (p. ej. un semáforo)
+NO_CAR = np.iinfo(np.int64).max
+
+
+def advance_lights(states, neighbors, global_timer, cycle):
+    # Estados (índices en STATES) tras el tick `global_timer`. Las transiciones de
+    # TrafficLight.update solo ocurren en dos fases del ciclo.
+    cycle_length, yellow_at, red_at = cycle
+    phase = global_timer % cycle_length
+    if phase == yellow_at:
+        states[states == GREEN] = YELLOW
+    elif phase == red_at:
+        # En orden, como en TrafficModel.step: un semáforo amarillo que ya recibió
+        # verde de uno anterior en este tick se queda en verde y no avisa a sus vecinos
+        for i in np.flatnonzero(states == YELLOW):
+            if states[i] == YELLOW:
+                states[i] = RED
+                states[neighbors[i]] = GREEN
+
+
+class VectorEngine:
+    def __init__(self, model):
+        self.model = model
+        self.lights = list(model.traffic_lights)
+        self.cars = list(model.cars)
+        self.rows, self.cols = model.grid_map.shape
+        self.flow = model.routing == 'flow'
+        self.cycle = (model.cycle_length, model.yellow_at, model.red_at)  # Mismo ciclo que TrafficLight.update
+        self.offsets = np.array([dr * self.cols + dc for dr, dc in MOVES], dtype=np.int64)
+
+        # Semáforos: estado y anillo de mensajes (al ponerse en rojo dan verde a sus vecinos)
+        light_index = {id(tl): i for i, tl in enumerate(self.lights)}
+        # La posición extra al final queda siempre en rojo: es la de los coches sin semáforo (índice -1)
+        self.light_state = np.array([STATES.index(tl.state) for tl in self.lights] + [RED], dtype=np.int8)
+        self.light_neighbors = [np.array([light_index[id(n)] for n in tl.neighbors], dtype=np.int64)
+                                for tl in self.lights]
+
+        # Coches
+        for car in self.cars:
+            if car.destination is None:
+                car.setDestino()
+        positions = np.array([model.grid.positions[car] for car in self.cars], dtype=np.int64).reshape(-1, 2)
+        destinations = np.array([car.destination for car in self.cars], dtype=np.int64).reshape(-1, 2)
+        self.cell = positions[:, 0] * self.cols + positions[:, 1]
+        self.dest = destinations[:, 0] * self.cols + destinations[:, 1]
+        self.dest_row, self.dest_col = destinations[:, 0].copy(), destinations[:, 1].copy()
+        self.distance = self.distance_to_destination(self.cell, np.arange(len(self.cars)))
+        self.light = np.array([light_index[id(car.trafficLight)] if car.trafficLight else -1
+                               for car in self.cars], dtype=np.int64)
+        self.velocity = np.array([car.velocity for car in self.cars], dtype=np.int8)
+
+        # Rutas concatenadas en un solo arreglo; path_cells[path_start + cursor] es la celda actual
+        # y next_cell guarda la siguiente (-1 si la ruta terminó o no hay ruta)
+        self.path_start = np.zeros(len(self.cars), dtype=np.int64)
+        self.path_len = np.zeros(len(self.cars), dtype=np.int64)
+        self.cursor = np.zeros(len(self.cars), dtype=np.int64)
+        self.path_cells = np.empty(0, dtype=np.int64)
+        self.next_cell = np.full(len(self.cars), -1, dtype=np.int64)
+        self.path_changed = np.ones(len(self.cars), dtype=bool)  # Rutas que sync() debe copiar a los agentes
+        self.set_paths(np.arange(len(self.cars)), [car.remaining_path() for car in self.cars])
+
+        # Índice de ocupación plano: id de coche, EMPTY o STATIC
+        self.occ = np.full(self.rows * self.cols, EMPTY, dtype=np.int64)
+        for pos in model.grid.positions.values():
+            self.occ[pos[0] * self.cols + pos[1]] = STATIC
+        self.occ[self.cell] = np.arange(len(self.cars))
+
+        # Arreglos auxiliares para reducciones por celda y por coche sin ordenar
+        self.first_entry = np.full(self.rows * self.cols, NO_CAR, dtype=np.int64)
+        self.last_write = np.full(len(self.cars), -1, dtype=np.int64)
+        self.idle = False  # Ver TrafficModel.run_ticks
+
+    def set_paths(self, cars, paths):
+        cells = [np.array(path, dtype=np.int64).reshape(-1, 2) for path in paths]
+        lengths = np.array([len(c) for c in cells], dtype=np.int64)
+        self.path_len[cars] = 0
+        if len(self.path_cells) > 2 * self.path_len.sum():
+            self.compact_paths()  # Las rutas reemplazadas ya ocupan más que las vigentes
+        self.path_start[cars] = len(self.path_cells) + np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        self.path_len[cars] = lengths
+        self.cursor[cars] = 0
+        self.path_changed[cars] = True
+        if lengths.sum():
+            flat = np.concatenate(cells)
+            self.path_cells = np.concatenate((self.path_cells, flat[:, 0] * self.cols + flat[:, 1]))
+        self.advance_paths(cars)
+
+    def paths_of(self, cars):
+        # Celdas de las rutas completas de `cars`, concatenadas en ese orden
+        lengths = self.path_len[cars]
+        starts = np.cumsum(lengths) - lengths
+        return self.path_cells[np.repeat(self.path_start[cars] - starts, lengths) + np.arange(lengths.sum())]
+
+    def compact_paths(self):
+        # Deja en path_cells solo las rutas vigentes (set_paths agrega al final y no reutiliza el lugar
+        # de las rutas que reemplaza)
+        self.path_cells = self.paths_of(np.arange(len(self.cars)))
+        self.path_start = np.cumsum(self.path_len) - self.path_len
+
+    def reroute(self, routes, cells, closed):
+        # Tras editar el mapa (TrafficModel.edit_cells): al cerrar, repara las rutas que pasan por una
+        # celda cerrada; al abrir, cambia las que ahora tienen una más corta
+        current = self.path_start + self.cursor
+        end = self.path_start + self.path_len
+        routed = self.path_len > 0
+        if closed:
+            hits = np.concatenate(([0], np.cumsum(np.isin(self.path_cells, cells))))
+            candidates = np.flatnonzero(routed & (hits[end] > hits[np.minimum(current + 1, end)]))
+        else:
+            candidates = np.flatnonzero(routed)
+        affected, paths = [], []
+        for i in candidates:
+            old = self.path_cells[current[i]:end[i]]
+            try:
+                cells = routes.repair(divmod(int(self.dest[i]), self.cols), old)
+            except ValueError as e:
+                print(e)
+                cells = old[:0]
+            if closed or len(cells) != len(old):
+                affected.append(i)
+                paths.append(np.stack(np.divmod(cells, self.cols), axis=1))
+        if affected:
+            self.set_paths(np.array(affected, dtype=np.int64), paths)
+
+    def advance_paths(self, cars):
+        has_next = self.cursor[cars] + 1 < self.path_len[cars]
+        self.next_cell[cars] = -1
+        with_next = cars[has_next]
+        self.next_cell[with_next] = self.path_cells[self.path_start[with_next] + self.cursor[with_next] + 1]
+
+    def step(self, global_timer):
+        self.update_lights(global_timer)
+        if self.model.fast_forward:
+            self.idle = self.cars_waiting()
+        self.update_cars()
+
+    def cars_waiting(self):
+        # Igual que TrafficModel.cars_waiting: ningún coche en verde tiene libre su siguiente celda
+        green = np.flatnonzero(self.light_state[self.light] == GREEN)
+        if self.flow:
+            idx, target = self.next_cells_flow(green, report=False)
+        else:
+            if (self.path_len[green] == 0).any():
+                return False  # Aún no calcula su ruta
+            idx = green[self.next_cell[green] >= 0]
+            target = self.next_cell[idx]
+        return not (self.occ[target] == EMPTY).any()
+
+    def next_signal_event(self, global_timer):
+        # Siguiente fase en la que algún semáforo puede cambiar: amarillo si hay verdes, rojo si hay amarillos
+        cycle_length, yellow_at, red_at = self.cycle
+        events = [next_tick(global_timer, phase, cycle_length)
+                  for state, phase in ((GREEN, yellow_at), (YELLOW, red_at)) if (self.light_state == state).any()]
+        return min(events, default=None)
+
+    def update_lights(self, global_timer):
+        controller = self.model.controller
+        if controller is not None:
+            controller.step(self.light_state[:-1], self.approach_queues(), global_timer)
+            return
+        advance_lights(self.light_state, self.light_neighbors, global_timer, self.cycle)
+
+    def approach_queues(self):
+        # Igual que TrafficModel.approach_queues: coches de cada semáforo con la siguiente celda libre
+        # o sin ruta todavía
+        cars = np.flatnonzero(self.light >= 0)
+        if self.flow:
+            idx, target = self.next_cells_flow(cars, report=False)
+            unplanned = cars[:0]
+        else:
+            unplanned = cars[self.path_len[cars] == 0]
+            idx = cars[self.next_cell[cars] >= 0]
+            target = self.next_cell[idx]
+        ready = np.concatenate((idx[self.occ[target] == EMPTY], unplanned))
+        return np.bincount(self.light[ready], minlength=len(self.lights))
+
+    def next_cells(self):
+        # Devuelve los coches que intentan avanzar y la celda a la que quieren ir
+        if self.flow:
+            return self.next_cells_flow()
+        need = np.flatnonzero(self.path_len == 0)
+        if need.size:
+            self.plan(need)
+        idx = np.flatnonzero(self.next_cell >= 0)
+        return idx, self.next_cell[idx]
+
+    def plan(self, cars):
+        planned, paths = [], []
+        for i in cars:
+            start = divmod(int(self.cell[i]), self.cols)
+            goal = divmod(int(self.dest[i]), self.cols)
+            try:
+                # Con el grafo de intersecciones la ruta se expande completa: aquí se guarda en arreglos
+                graph = self.model.graph
+                path = graph.path(start, goal) if graph is not None else None
+                if path is None:
+                    path = self.model.path_cache.find_path(self.model.grid_map, self.model.map_version, start, goal)
+                if not path:
+                    print(f"No se puede calcular la ruta para el coche {self.cars[i]}")
+                else:
+                    planned.append(i)
+                    paths.append(np.array(path, dtype=np.int64))  # Compacta: no guarda las tuplas de todas las rutas
+            except ValueError as e:
+                print(e)
+        if planned:
+            self.set_paths(np.array(planned, dtype=np.int64), paths)
+
+    def next_cells_flow(self, cars=None, report=True):
+        # report=False solo consulta (sin avisar de coches sin ruta)
+        cars = np.arange(len(self.cars)) if cars is None else cars
+        moving = cars[self.cell[cars] != self.dest[cars]]
+        idx, targets = [], []
+        for dest in np.unique(self.dest[moving]):
+            group = moving[self.dest[moving] == dest]
+            try:
+                field = self.model.flow_fields.field(divmod(int(dest), self.cols)).ravel()
+            except ValueError as e:
+                for _ in group if report else ():
+                    print(e)
+                continue
+            move = field[self.cell[group]]
+            for i in group[move < 0] if report else ():
+                print(f"No se puede calcular la ruta para el coche {self.cars[i]}")
+            idx.append(group[move >= 0])
+            targets.append(self.cell[group[move >= 0]] + self.offsets[move[move >= 0]])
+        if not idx:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        idx, targets = np.concatenate(idx), np.concatenate(targets)
+        order = np.argsort(idx)
+        return idx[order], targets[order]
+
+    def update_cars(self):
+        idx, target = self.next_cells()
+        n = len(self.cars)
+        green = self.light_state[self.light[idx]] == GREEN
+        may_move = np.zeros(n, dtype=bool)
+        may_move[idx[green]] = True
+
+        # Bloquea la celda destino un semáforo, un coche que aún no tiene su turno
+        # (índice mayor) o uno que no puede moverse en este tick
+        occupant = self.occ[target]
+        waits = (occupant == STATIC) | (occupant > idx) | ((occupant >= 0) & ~may_move[occupant])
+        blocker = np.where(waits, occupant, EMPTY)
+
+        # Celdas libres al inicio del tick: entra el primer coche en verde
+        free = occupant == EMPTY
+        moved, winner = self.contest(idx, target, green & free)
+        blocked_by_mover = idx > winner
+        blocker = np.where(blocked_by_mover, winner, blocker)
+
+        # El resto espera a saber si el ocupante (en verde y con índice menor) se movió
+        # antes; se resuelve por rondas, siguiendo las colas de adelante hacia atrás
+        pending = np.flatnonzero(~waits & ~free)
+        if pending.size:
+            known = np.ones(n, dtype=bool)  # ¿Se sabe ya si el coche se movió en este tick?
+            known[idx[pending[green[pending]]]] = False
+            car_moved = np.zeros(n, dtype=bool)
+            car_moved[idx[moved]] = True
+        while pending.size:
+            occ_p = occupant[pending]
+            ready = known[occ_p]
+            batch, pending, occ_b = pending[ready], pending[~ready], occ_p[ready]
+
+            stays = ~car_moved[occ_b]
+            blocker[batch[stays]] = occ_b[stays]
+            freed = batch[~stays]
+            enters, winner = self.contest(idx[freed], target[freed], green[freed])
+            behind = idx[freed] > winner
+            moved[freed[enters]] = True
+            car_moved[idx[freed[enters]]] = True
+            blocker[freed[behind]] = winner[behind]
+            blocked_by_mover[freed[behind]] = True
+            known[idx[batch]] = True
+
+        self.negotiate(idx, target, blocker, blocked_by_mover)
+
+        movers = idx[moved]
+        self.occ[self.cell[movers]] = EMPTY
+        self.occ[target[moved]] = movers
+        self.cell[movers] = target[moved]
+        self.distance[movers] = self.distance_to_destination(self.cell[movers], movers)
+        if not self.flow:
+            self.cursor[movers] += 1
+            self.advance_paths(movers)
+
+    def contest(self, idx, target, candidates):
+        # Para cada celda libre entra el candidato de menor índice (el primero en su turno);
+        # devuelve quién entra y, por coche, el índice del que entró a su celda (o NO_CAR)
+        c = np.flatnonzero(candidates)
+        np.minimum.at(self.first_entry, target[c], idx[c])
+        winner = self.first_entry[target]
+        self.first_entry[target[c]] = NO_CAR
+        return idx == winner, winner
+
+    def negotiate(self, idx, target, blocker, blocked_by_mover):
+        # Mismo criterio que Car.negotiate, aplicado en orden de turno: la última escritura gana.
+        # El otro coche está en la celda destino; si acaba de entrar, su distancia aún no está actualizada.
+        blocked = np.flatnonzero(blocker >= 0)
+        if not blocked.size:
+            return
+        me, other = idx[blocked], blocker[blocked]
+        my_distance = self.distance[me]
+        other_distance = self.distance[other]
+        entered = np.flatnonzero(blocked_by_mover[blocked])
+        other_distance[entered] = self.distance_to_destination(target[blocked[entered]], other[entered])
+        mine = (my_distance < other_distance).astype(np.int8)
+        self.velocity[me] = mine
+
+        # Para cada coche bloqueador, la última negociación en la que fue "el otro";
+        # gana sobre su propia escritura si ocurrió en un turno posterior al suyo
+        order = np.arange(len(blocked))
+        np.maximum.at(self.last_write, other, order)
+        last = order[self.last_write[other] == order]
+        self.last_write[other] = -1
+        self_blocked = np.zeros(len(self.cars), dtype=bool)
+        self_blocked[me] = True
+        cars = other[last]
+        later = (me[last] > cars) | ~self_blocked[cars]
+        self.velocity[cars[later]] = 1 - mine[last[later]]
+
+    def distance_to_destination(self, cells, cars):
+        # Distancia de Manhattan (heuristic) de cada celda al destino del coche correspondiente
+        rows, cols = np.divmod(cells, self.cols)
+        return np.abs(rows - self.dest_row[cars]) + np.abs(cols - self.dest_col[cars])
+
+    def close(self):
+        pass  # Sin recursos que liberar (ver TiledEngine.close)
+
+    def sync(self):
+        # Copia el estado de los arreglos a los agentes (vista para el servidor y la animación)
+        for tl, state in zip(self.lights, self.light_state):
+            tl.state = STATES[state]
+        grid = self.model.grid
+        rows, cols = np.divmod(self.cell, self.cols)
+        for car, row, col, velocity, cursor in zip(self.cars, rows.tolist(), cols.tolist(),
+                                                   self.velocity.tolist(), self.cursor.tolist()):
+            if grid.positions[car] != (row, col):
+                grid.move_to(car, (row, col))
+            car.velocity = velocity
+            car.cursor = cursor
+        # Las rutas completas solo se copian cuando cambian; los agentes avanzan con el cursor
+        for i in np.flatnonzero(self.path_changed):
+            start = self.path_start[i]
+            path_rows, path_cols = np.divmod(self.path_cells[start:start + self.path_len[i]], self.cols)
+            self.cars[i].path = list(zip(path_rows.tolist(), path_cols.tolist()))
+        self.path_changed[:] = False
@@ -0,0 +1,310 @@
+import mmap
+import multiprocessing
+import threading
+
+import numpy as np
+
+from motor_vectorial import EMPTY, GREEN, NO_CAR, STATIC, VectorEngine
+
+# Motor vectorial repartido por zonas en varios procesos. El mapa se divide en
+# rectángulos (uno por proceso) y cada proceso resuelve los coches que están en
+# su zona sobre arreglos en memoria compartida. El resultado es el mismo que el
+# de VectorEngine (y el de los agentes): cada tick se resuelve por fases
+# separadas por barreras, y en cada fase un proceso solo escribe datos de sus
+# propios coches.
+#
+#   A. Siguiente celda y si el semáforo está en verde.
+#   B. Quién se mueve. Un coche depende del ocupante de su celda destino (con
+#      índice menor, así que no hay ciclos) y de los que compiten por la misma
+#      celda (vecinos de esa celda, en la franja de dos celdas alrededor de la
+#      zona). Se resuelve por rondas: cada proceso avanza lo que puede con lo ya
+#      publicado por los demás y entre rondas hay una barrera (intercambio de halo).
+#   C. Negociación y movimientos: se liberan las celdas de los que salen, y tras
+#      la barrera se ocupan las nuevas. Cada coche toma la velocidad de la última
+#      negociación (en orden de turno) en la que participó; las que involucran a
+#      un coche de otra zona se publican a esa zona.
+#   D. Los coches que cruzaron a otra zona se entregan al proceso vecino.
+#
+# Los procesos se crean con fork y heredan el modelo (no disponible en Windows).
+
+UNKNOWN, MOVED, STAYED = 0, 1, 2
+
+
+def shared(array):
+    # Copia de `array` en memoria anónima compartida con los procesos que se creen después (fork)
+    array = np.asarray(array)
+    buffer = mmap.mmap(-1, max(array.nbytes, 1))
+    out = np.frombuffer(buffer, dtype=array.dtype, count=array.size).reshape(array.shape)
+    out[...] = array
+    return out
+
+
+def tile_grid(workers, shape):
+    # Filas y columnas de zonas (filas * columnas = workers) con el menor borde total entre zonas
+    rows, cols = shape
+    pairs = [(a, workers // a) for a in range(1, workers + 1) if workers % a == 0]
+    return min(pairs, key=lambda p: ((p[0] - 1) * cols + (p[1] - 1) * rows, p))
+
+
+# Motor con el que se planea en paralelo (lo heredan los procesos de planeación)
+_planning = None
+
+
+def _plan(cars):
+    # En un proceso hijo: rutas A* de `cars`; devuelve sus largos y las celdas nuevas concatenadas
+    _planning.plan(cars)
+    return _planning.path_len[cars], _planning.paths_of(cars)
+
+
+class TiledEngine(VectorEngine):
+    def __init__(self, model, workers=2):
+        super().__init__(model)
+        self.context = multiprocessing.get_context('fork')
+        self.tiles = tile_grid(workers, (self.rows, self.cols))
+        row_edges = np.linspace(0, self.rows, self.tiles[0] + 1).astype(np.int64)
+        col_edges = np.linspace(0, self.cols, self.tiles[1] + 1).astype(np.int64)
+        tile_row = np.searchsorted(row_edges, np.arange(self.rows), side='right') - 1
+        tile_col = np.searchsorted(col_edges, np.arange(self.cols), side='right') - 1
+        self.tile_of = (tile_row[:, None] * self.tiles[1] + tile_col[None, :]).ravel()  # Zona de cada celda
+        self.workers = workers
+        n = len(self.cars)
+
+        if not self.flow:
+            self.plan_all()
+
+        # Estado que escriben los procesos (el resto se hereda y no cambia)
+        self.cell, self.distance, self.velocity = shared(self.cell), shared(self.distance), shared(self.velocity)
+        self.cursor, self.occ, self.light_state = shared(self.cursor), shared(self.occ), shared(self.light_state)
+        # Siguiente celda de cada coche (con A* se actualiza solo al moverse, como en VectorEngine)
+        self.next_cell = self.target = shared(self.next_cell)
+        self.status = shared(np.full(n, STAYED, dtype=np.int8))  # ¿Se movió en este tick? (coches en verde)
+        self.waiting = shared(np.zeros(workers, dtype=bool))  # cars_waiting por zona (fast_forward)
+        self.pending = shared(np.zeros((2, workers), dtype=np.int64))  # Coches sin resolver por ronda (par/impar)
+        # Entregas entre zonas: cada zona escribe los coches que salieron y a qué zona van
+        heights, widths = np.diff(row_edges), np.diff(col_edges)
+        capacity = 2 * int(heights.max() + widths.max())  # Celdas del borde de la zona más grande
+        self.out_car = shared(np.zeros((workers, capacity), dtype=np.int64))
+        self.out_tile = shared(np.zeros((workers, capacity), dtype=np.int64))
+        self.out_count = shared(np.zeros(workers, dtype=np.int64))
+        # Negociaciones con coches de otra zona (coche bloqueado, bloqueador, resultado, zona del
+        # bloqueador); el coche bloqueado está a lo más a dos celdas del borde
+        self.votes = shared(np.zeros((workers, 4, 2 * capacity), dtype=np.int64))
+        self.vote_count = shared(np.zeros(workers, dtype=np.int64))
+        self.stopping = shared(np.zeros(1, dtype=bool))
+
+        self.tick = self.context.Barrier(workers + 1)  # Inicio y fin de cada tick (con este proceso)
+        self.rounds = self.context.Barrier(workers)  # Entre fases y rondas (solo las zonas)
+        self.processes = [self.context.Process(target=self.work, args=(tile,), daemon=True,
+                                               name=f"zona-{tile}") for tile in range(workers)]
+        for process in self.processes:
+            process.start()
+
+    def plan_all(self):
+        # Las rutas no dependen de la ocupación: todas se calculan al inicio, en paralelo por zona
+        # (el motor vectorial las calcula en el primer tick). Quedan en arreglos que comparten
+        # todos los procesos; los coches sin ruta ya no se vuelven a intentar.
+        global _planning
+        need = np.flatnonzero(self.path_len == 0)
+        zones = self.tile_of[self.cell[need]]
+        groups = [need[zones == tile] for tile in range(self.workers)]
+        _planning = self
+        try:
+            with self.context.Pool(self.workers) as pool:
+                results = pool.map(_plan, groups)
+        finally:
+            _planning = None
+        cars = np.concatenate(groups)
+        lengths = np.concatenate([length for length, _ in results])
+        self.path_len[cars] = lengths
+        self.path_start[cars] = len(self.path_cells) + np.cumsum(lengths) - lengths
+        self.path_cells = np.concatenate([self.path_cells] + [cells for _, cells in results])
+        self.cursor[cars] = 0
+        self.path_changed[cars] = True
+        self.advance_paths(cars)
+
+    def step(self, global_timer):
+        self.update_lights(global_timer)
+        try:
+            self.tick.wait()  # Las zonas simulan el tick
+            self.tick.wait()
+        except threading.BrokenBarrierError:
+            raise RuntimeError("Falló un proceso del motor por zonas") from None
+        self.idle = self.model.fast_forward and bool(self.waiting.all())
+
+    def close(self):
+        # Detiene los procesos de las zonas
+        if not self.processes:
+            return
+        self.stopping[0] = True
+        try:
+            self.tick.wait()
+        except threading.BrokenBarrierError:
+            pass
+        for process in self.processes:
+            process.join()
+        self.processes = []
+
+    # Lo que sigue corre en los procesos de las zonas
+
+    def work(self, tile):
+        own = np.flatnonzero(self.tile_of[self.cell] == tile)
+        try:
+            while True:
+                self.tick.wait()
+                if self.stopping[0]:
+                    return
+                own = self.receive(tile, own)
+                own = self.simulate(tile, own)
+                self.tick.wait()
+        except threading.BrokenBarrierError:
+            return
+        except BaseException:
+            self.tick.abort()  # Despierta a los demás procesos y al modelo
+            self.rounds.abort()
+            raise
+
+    def receive(self, tile, own):
+        # Coches que otras zonas entregaron a esta en el tick anterior
+        incoming = [own]
+        for source in range(self.workers):
+            count = self.out_count[source]
+            cars = self.out_car[source, :count]
+            incoming.append(cars[self.out_tile[source, :count] == tile])
+        return np.sort(np.concatenate(incoming))
+
+    def simulate(self, tile, own):
+        # A. Siguiente celda de cada coche propio y si puede moverse (verde)
+        if self.flow:
+            idx, target = self.next_cells_flow(own)
+            self.target[own] = -1
+            self.target[idx] = target
+        else:
+            idx = own[self.target[own] >= 0]
+            target = self.target[idx]
+        green = self.light_state[self.light[idx]] == GREEN
+        self.status[idx[green]] = UNKNOWN
+        if self.model.fast_forward:
+            # Igual que VectorEngine.cars_waiting, para los coches de esta zona
+            lit = own[self.light_state[self.light[own]] == GREEN]
+            targets = self.target[lit]
+            self.waiting[tile] = (self.flow or not (self.path_len[lit] == 0).any()) and \
+                not (self.occ[targets[targets >= 0]] == EMPTY).any()
+        self.rounds.wait()
+
+        # B. Quién se mueve (mismas reglas que VectorEngine.update_cars)
+        moved, blocker, by_mover = self.resolve(tile, idx, target, green)
+
+        # C. Negociación con la distancia al inicio del tick. Las que involucran a un coche de otra
+        # zona se le publican a esa zona. Luego se liberan las celdas de los que salen.
+        blocked = np.flatnonzero(blocker >= 0)
+        me, other = idx[blocked], blocker[blocked]
+        other_distance = self.distance[other]
+        entered = np.flatnonzero(by_mover[blocked])
+        other_distance[entered] = self.distance_to_destination(target[blocked[entered]], other[entered])
+        mine = (self.distance[me] < other_distance).astype(np.int64)
+        zones = self.tile_of[self.cell[other]]  # El otro coche sigue en su celda inicial
+        away = zones != tile
+        count = np.count_nonzero(away)
+        self.votes[tile, :, :count] = me[away], other[away], mine[away], zones[away]
+        self.vote_count[tile] = count
+        movers, cells = idx[moved], target[moved]
+        self.occ[self.cell[movers]] = EMPTY
+        self.rounds.wait()
+
+        self.occ[cells] = movers
+        self.cell[movers] = cells
+        self.distance[movers] = self.distance_to_destination(cells, movers)
+        if not self.flow:
+            self.cursor[movers] += 1
+            self.advance_paths(movers)
+        self.velocity[me] = mine
+        self.settle(tile, me[~away], other[~away], mine[~away], me)
+
+        # D. Entrega de los coches que salieron de la zona
+        zones = self.tile_of[self.cell[own]]
+        leaving = zones != tile
+        count = np.count_nonzero(leaving)
+        self.out_car[tile, :count] = own[leaving]
+        self.out_tile[tile, :count] = zones[leaving]
+        self.out_count[tile] = count
+        return own[~leaving]
+
+    def resolve(self, tile, idx, target, green):
+        n = len(idx)
+        moved = np.zeros(n, dtype=bool)
+        blocker = np.full(n, EMPTY, dtype=np.int64)
+        by_mover = np.zeros(n, dtype=bool)
+
+        # Bloquea la celda un semáforo, un coche que aún no tiene su turno o uno que no puede moverse
+        occupant = self.occ[target]
+        waits = (occupant == STATIC) | (occupant > idx) | ((occupant >= 0) & ~self.can_move(np.maximum(occupant, 0)))
+        blocker[waits & (occupant >= 0)] = occupant[waits & (occupant >= 0)]
+
+        # Celdas libres al inicio del tick: entra el primer coche en verde de los que la buscan
+        free = np.flatnonzero(occupant == EMPTY)
+        self.enter(free, idx, target, green, np.full(len(free), -1), moved, blocker, by_mover)
+
+        # El resto depende de si el ocupante (de otra zona, quizá) ya se movió; por rondas
+        depends = ~waits & (occupant != EMPTY)
+        pending = np.flatnonzero(depends)
+        self.status[idx[~depends]] = np.where(moved[~depends], MOVED, STAYED)
+        rounds = 0
+        while True:
+            while pending.size:
+                state = self.status[occupant[pending]]
+                ready = state != UNKNOWN
+                if not ready.any():
+                    break
+                batch, pending = pending[ready], pending[~ready]
+                stays = state[ready] == STAYED
+                blocker[batch[stays]] = occupant[batch[stays]]
+                freed = batch[~stays]
+                self.enter(freed, idx, target, green, occupant[freed], moved, blocker, by_mover)
+                self.status[idx[batch]] = np.where(moved[batch], MOVED, STAYED)
+            self.pending[rounds % 2, tile] = pending.size
+            self.rounds.wait()
+            if not self.pending[rounds % 2].any():
+                return moved, blocker, by_mover
+            rounds += 1
+
+    def enter(self, cars, idx, target, green, floor, moved, blocker, by_mover):
+        # Para celdas que quedan libres: entra el coche en verde de menor índice (mayor que `floor`,
+        # el ocupante que salió) entre los vecinos que la buscan; los demás quedan detrás de él
+        winner = self.first_candidate(target[cars], floor)
+        moved[cars] = green[cars] & (idx[cars] == winner)
+        behind = cars[idx[cars] > winner]
+        blocker[behind] = winner[idx[cars] > winner]
+        by_mover[behind] = True
+
+    def first_candidate(self, cells, floor):
+        # Menor coche en verde, de índice mayor que `floor`, que busca cada celda (NO_CAR si ninguno)
+        neighbors, inside = self.neighbors(cells)
+        cars = np.where(inside, self.occ[np.where(inside, neighbors, 0)], EMPTY)
+        safe = np.maximum(cars, 0)
+        candidate = (cars >= 0) & (self.target[safe] == cells[:, None]) & self.can_move(safe) & (cars > floor[:, None])
+        return np.where(candidate, cars, NO_CAR).min(axis=1, initial=NO_CAR)
+
+    def can_move(self, cars):
+        # En verde y con siguiente celda
+        return (self.target[cars] >= 0) & (self.light_state[self.light[cars]] == GREEN)
+
+    def neighbors(self, cells):
+        # Celdas vecinas (en el orden de MOVES) y si están dentro del mapa
+        rows, cols = np.divmod(cells, self.cols)
+        inside = np.stack((cols + 1 < self.cols, cols > 0, rows + 1 < self.rows, rows > 0), axis=1)
+        return cells[:, None] + self.offsets, inside
+
+    def settle(self, tile, me, other, mine, blocked):
+        # Como VectorEngine.negotiate: el coche que bloqueó a otros toma el resultado de la última de
+        # esas negociaciones (en orden de turno) si fue posterior a la suya. Incluye las publicadas
+        # por otras zonas sobre coches de esta.
+        for source in range(self.workers):
+            if source != tile:
+                votes = self.votes[source, :, :self.vote_count[source]]
+                here = votes[3] == tile
+                me, other, mine = (np.concatenate((a, b[here])) for a, b in zip((me, other, mine), votes))
+        order = np.lexsort((me, other))
+        me, other, mine = me[order], other[order], mine[order]
+        last = np.append(other[1:] != other[:-1], True)[:len(other)]  # Última de cada bloqueador
+        later = last & ((me > other) | ~np.isin(other, blocked))
+        self.velocity[other[later]] = 1 - mine[later]
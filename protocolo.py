@@ -0,0 +1,229 @@
+import struct
+
+import numpy as np
+
+from motor_vectorial import STATES
+
+# Protocolo de actualizaciones del servidor. Con 'delta' se envía un keyframe
+# (estado completo) al conectar y cada KEYFRAME_INTERVAL ticks; entre keyframes
+# solo viajan los semáforos y coches que cambiaron, identificados por su id de
+# agente (estable durante toda la sesión). Cada mensaje lleva un número de
+# secuencia y los deltas indican sobre cuál se aplican ('base'); si el cliente
+# pierde uno, basta con esperar al siguiente keyframe.
+#
+# Con llegadas continuas (ver flota.py) los coches entran y salen: un delta
+# incluye a los que entraron y a los que salieron, estos con la posición GONE.
+# Un keyframe solo trae a los coches en el mapa.
+#
+# Los clientes suscritos a un área (ver vistas.py) reciben lo mismo restringido a
+# ella; sus keyframes indican el área en 'viewport' y, si traen mapa, es el
+# recorte de esa área.
+KEYFRAME_INTERVAL = 50
+GONE = (-1, -1)
+
+# Codificación binaria (opcional, little-endian), construida directamente de los
+# arreglos NumPy del frame:
+#   cabecera HEADER: tipo (0 keyframe, 1 delta), banderas, reservado, seq, base,
+#                    número de semáforos, número de coches
+#   si banderas & HAS_VIEWPORT: fila y columna iniciales y finales del área (uint32[4])
+#   si banderas & HAS_MAP: filas y columnas (uint32) y el mapa en uint8
+#   semáforos: ids uint32[n]; en keyframes, posiciones int32[n, 2]; estados uint8[n] (índice en STATES)
+#   coches: ids uint32[n]; posiciones int32[n, 2] (fila, columna)
+KINDS = ('keyframe', 'delta')
+HEADER = struct.Struct('<BBHIIII')
+MAP_SHAPE = struct.Struct('<II')
+VIEWPORT = struct.Struct('<IIII')
+HAS_MAP = 1
+HAS_VIEWPORT = 2
+
+
+def car_positions(model):
+    # Posiciones (fila, columna) de los coches en el orden de model.cars
+    if model.engine is not None:
+        return np.stack(np.divmod(model.engine.cell, model.engine.cols), axis=1)
+    return np.array([model.grid.positions[car] for car in model.cars], dtype=np.int64).reshape(-1, 2)
+
+
+def light_states(model):
+    # Estado de cada semáforo como índice en STATES
+    if model.engine is not None:
+        return model.engine.light_state[:-1].copy()
+    return np.array([STATES.index(tl.state) for tl in model.traffic_lights], dtype=np.int8)
+
+
+def full_snapshot(model):
+    # Formato JSON original: todos los semáforos y coches en cada tick
+    return {
+        'traffic_lights': [{'position': model.grid.positions[tl], 'state': tl.state} for tl in model.traffic_lights],
+        'cars': [{'position': model.grid.positions[car]} for car in model.cars]
+    }
+
+
+# Estado publicado de un tick: su frame (delta o keyframe) y el estado completo,
+# para armar keyframes de resincronización. No se modifica una vez creado, así
+# que puede pasarse entre hilos.
+class Tick:
+    def __init__(self, frame, positions, states, car_ids):
+        self.seq = frame['seq']
+        self.frame = frame
+        self.positions = positions
+        self.states = states
+        self.car_ids = car_ids
+
+
+class DeltaEncoder:
+    # Con keyframe_interval=1 todos los mensajes son keyframes (estado completo)
+    def __init__(self, model, keyframe_interval=KEYFRAME_INTERVAL):
+        self.model = model
+        self.keyframe_interval = keyframe_interval
+        self.light_ids = np.array([tl.id for tl in model.traffic_lights], dtype=np.int64)
+        self.light_positions = np.array([model.grid.positions[tl] for tl in model.traffic_lights],
+                                        dtype=np.int64).reshape(-1, 2)
+        self.car_ids = np.array([car.id for car in model.cars], dtype=np.int64)
+        self.fleet_version = model.fleet.version if model.fleet is not None else None
+        self.seq = 0
+        self.last_keyframe = None
+        self.last = None  # Tick del último frame emitido
+
+    def encode(self, include_map=False):
+        # Siguiente mensaje en JSON
+        return frame_to_json(self.frame(include_map))
+
+    def encode_binary(self, include_map=False):
+        return frame_to_bytes(self.frame(include_map))
+
+    def snapshot(self, include_map=False, tick=None):
+        # Keyframe de un tick ya emitido (por defecto el último), sin avanzar la secuencia.
+        # Solo lee datos inmutables, así que puede llamarse desde otro hilo pasando `tick`.
+        tick = tick or self.last
+        frame = {'type': 'keyframe', 'seq': tick.seq, 'base': tick.seq,
+                 'light_ids': self.light_ids, 'light_positions': self.light_positions, 'light_states': tick.states,
+                 'car_ids': tick.car_ids, 'car_positions': tick.positions}
+        if include_map:
+            frame['map'] = self.model.grid_map
+        return frame
+
+    def current_car_ids(self):
+        # Ids en el orden de model.cars; solo se rehacen si entró o salió algún coche
+        fleet = self.model.fleet
+        if fleet is not None and fleet.version != self.fleet_version:
+            self.fleet_version = fleet.version
+            self.car_ids = np.array([car.id for car in self.model.cars], dtype=np.int64)
+        return self.car_ids
+
+    def frame(self, include_map=False):
+        # Siguiente frame como arreglos: keyframe si toca (o si se pide el mapa), delta en otro caso
+        positions, states = car_positions(self.model), light_states(self.model)
+        car_ids = self.current_car_ids()
+        if include_map or self.last is None or self.seq - self.last_keyframe >= self.keyframe_interval:
+            self.last_keyframe = self.seq
+            frame = {'type': 'keyframe', 'seq': self.seq, 'base': self.seq,
+                     'light_ids': self.light_ids, 'light_positions': self.light_positions, 'light_states': states,
+                     'car_ids': car_ids, 'car_positions': positions}
+            if include_map:
+                frame['map'] = self.model.grid_map
+        else:
+            changed = np.flatnonzero(states != self.last.states)
+            if car_ids is self.last.car_ids:
+                moved = np.flatnonzero((positions != self.last.positions).any(axis=1))
+                ids, moved_positions = car_ids[moved], positions[moved]
+            else:
+                ids, moved_positions = self.fleet_changes(car_ids, positions)
+            frame = {'type': 'delta', 'seq': self.seq, 'base': self.seq - 1,
+                     'light_ids': self.light_ids[changed], 'light_states': states[changed],
+                     'car_ids': ids, 'car_positions': moved_positions}
+        self.last = Tick(frame, positions, states, car_ids)
+        self.seq += 1
+        return frame
+
+    def fleet_changes(self, car_ids, positions):
+        # Coches que salieron desde el último frame (en GONE) y los que entraron o se movieron. Un coche
+        # que salió y volvió a entrar (mismo id, ahora al final de model.cars) va en ambas partes, así
+        # que aplicar el delta en orden deja a los coches en el orden de model.cars.
+        last_ids, last_positions = self.last.car_ids, self.last.positions
+        known = np.isin(car_ids, last_ids)
+        moved = ~known
+        reentered = np.zeros(0, dtype=np.int64)
+        if known.any():
+            order = np.argsort(last_ids)
+            index = order[np.searchsorted(last_ids, car_ids[known], sorter=order)]
+            moved[known] = (positions[known] != last_positions[index]).any(axis=1)
+            out_of_order = index < np.maximum.accumulate(index)
+            moved[np.flatnonzero(known)[out_of_order]] = True
+            reentered = car_ids[known][out_of_order]
+        gone = np.concatenate([last_ids[~np.isin(last_ids, car_ids)], reentered])
+        return (np.concatenate([gone, car_ids[moved]]),
+                np.concatenate([np.tile(GONE, (len(gone), 1)), positions[moved]]).astype(np.int64))
+
+
+def keyframe_to_full_json(frame):
+    # Formato original (full_snapshot y, con mapa, el mensaje inicial) a partir de un keyframe
+    message = {'map': frame['map'].tolist()} if 'map' in frame else {}
+    message['traffic_lights'] = [{'position': p, 'state': STATES[s]} for p, s
+                                 in zip(frame['light_positions'].tolist(), frame['light_states'].tolist())]
+    message['cars'] = [{'position': p} for p in frame['car_positions'].tolist()]
+    return message
+
+
+def frame_to_json(frame):
+    message = {'type': frame['type'], 'seq': frame['seq']}
+    if frame['type'] == 'delta':
+        message['base'] = frame['base']
+    if 'viewport' in frame:
+        message['viewport'] = list(frame['viewport'])
+    if 'map' in frame:
+        message['map'] = frame['map'].tolist()
+    light_ids, states = frame['light_ids'].tolist(), [STATES[s] for s in frame['light_states']]
+    if frame['type'] == 'keyframe':
+        message['traffic_lights'] = [{'id': i, 'position': p, 'state': s} for i, p, s
+                                     in zip(light_ids, frame['light_positions'].tolist(), states)]
+    else:
+        message['traffic_lights'] = [{'id': i, 'state': s} for i, s in zip(light_ids, states)]
+    message['cars'] = [{'id': i, 'position': p} for i, p
+                       in zip(frame['car_ids'].tolist(), frame['car_positions'].tolist())]
+    return message
+
+
+def frame_to_bytes(frame):
+    keyframe = frame['type'] == 'keyframe'
+    flags = (HAS_MAP if 'map' in frame else 0) | (HAS_VIEWPORT if 'viewport' in frame else 0)
+    parts = [HEADER.pack(KINDS.index(frame['type']), flags, 0, frame['seq'],
+                         frame['base'], len(frame['light_ids']), len(frame['car_ids']))]
+    if 'viewport' in frame:
+        parts.append(VIEWPORT.pack(*frame['viewport']))
+    if 'map' in frame:
+        parts += [MAP_SHAPE.pack(*frame['map'].shape), np.asarray(frame['map'], dtype=np.uint8).tobytes()]
+    parts.append(frame['light_ids'].astype('<u4').tobytes())
+    if keyframe:
+        parts.append(frame['light_positions'].astype('<i4').tobytes())
+    parts += [frame['light_states'].astype(np.uint8).tobytes(),
+              frame['car_ids'].astype('<u4').tobytes(), frame['car_positions'].astype('<i4').tobytes()]
+    return b''.join(parts)
+
+
+def bytes_to_frame(data):
+    # Inverso de frame_to_bytes (referencia para clientes y pruebas); los arreglos son vistas de `data`
+    kind, flags, _, seq, base, n_lights, n_cars = HEADER.unpack_from(data)
+    offset = HEADER.size
+    frame = {'type': KINDS[kind], 'seq': seq, 'base': base}
+
+    def take(dtype, count, shape=None):
+        nonlocal offset
+        array = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        offset += array.nbytes
+        return array.reshape(shape) if shape else array
+
+    if flags & HAS_VIEWPORT:
+        frame['viewport'] = VIEWPORT.unpack_from(data, offset)
+        offset += VIEWPORT.size
+    if flags & HAS_MAP:
+        rows, cols = MAP_SHAPE.unpack_from(data, offset)
+        offset += MAP_SHAPE.size
+        frame['map'] = take(np.uint8, rows * cols, (rows, cols))
+    frame['light_ids'] = take('<u4', n_lights)
+    if kind == KINDS.index('keyframe'):
+        frame['light_positions'] = take('<i4', 2 * n_lights, (n_lights, 2))
+    frame['light_states'] = take(np.uint8, n_lights)
+    frame['car_ids'] = take('<u4', n_cars)
+    frame['car_positions'] = take('<i4', 2 * n_cars, (n_cars, 2))
+    return frame
@@ -0,0 +1,243 @@
+import heapq
+from collections import defaultdict
+
+import numpy as np
+
+from motor_vectorial import GREEN, RED, STATES, advance_lights
+from rutas import MOVES, bfs_distances
+
+# Planeación cooperativa con una tabla de reservas espacio-temporal (A* cooperativo
+# por ventanas). En lugar de chocar con otro coche y negociar en cada tick, cada
+# coche planea sus siguientes `window` ticks sobre pares (celda, tick) libres en
+# la tabla, esperando o rodeando a los demás, y los reserva. Los semáforos no
+# dependen de los coches, así que su estado futuro se conoce y un coche solo
+# planea avanzar en ticks en los que su semáforo estará en verde.
+#
+# Al terminar su plan, el coche se queda en la última celda (la retiene) hasta que
+# vuelve a planear, así que un plan solo puede terminar en una celda que nadie
+# más tenga reservada después. Por eso los planes nunca chocan entre sí y los
+# coches no revisan colisiones al moverse. Un coche que llega a su destino lo
+# retiene para siempre, como en el modelo original.
+
+WINDOW = 8  # Ticks que planea cada coche
+MAX_EXPANSIONS = 512  # Por búsqueda; si no alcanza, el coche espera y vuelve a planear en el siguiente tick
+NO_SLOTS = {}
+
+
+class ReservationTable:
+    def __init__(self):
+        self.slots = defaultdict(dict)  # tick -> {celda: coche}
+        self.holds = {}  # celda -> (coche, desde qué tick): el coche se queda ahí indefinidamente
+        self.oldest = 0
+        self.last = 0  # Último tick con reservas
+
+    def owner(self, cell, tick):
+        car = self.slots.get(tick, NO_SLOTS).get(cell)
+        if car is None:
+            hold = self.holds.get(cell)
+            if hold is not None and hold[1] <= tick:
+                return hold[0]
+        return car
+
+    def free_from(self, cell, tick, car):
+        # ¿Puede `car` quedarse en `cell` desde `tick` en adelante?
+        hold = self.holds.get(cell)
+        if hold is not None and hold[0] != car:
+            return False
+        return all(self.slots.get(t, NO_SLOTS).get(cell, car) == car for t in range(tick, self.last + 1))
+
+    def reserve(self, car, cells, start):
+        # `cells` son las celdas de `car` en los ticks start + 1, start + 2...
+        for tick, cell in enumerate(cells, start + 1):
+            self.slots[tick][cell] = car
+        self.last = max(self.last, start + len(cells))
+
+    def hold(self, car, cell, tick):
+        self.holds[cell] = (car, tick)
+
+    def release(self, car, cell):
+        if self.holds.get(cell, (None,))[0] == car:
+            del self.holds[cell]
+
+    def expire(self, tick):
+        # Descarta los ticks anteriores a `tick`
+        while self.oldest < tick:
+            self.slots.pop(self.oldest, None)
+            self.oldest += 1
+
+
+class CooperativePlanner:
+    def __init__(self, model, window=WINDOW):
+        self.model = model
+        self.window = window
+        self.cars = list(model.cars)
+        self.rows, self.cols = model.grid_map.shape
+        self.passable = (np.asarray(model.grid_map) != 0).ravel()
+        self.cycle = (model.cycle_length, model.yellow_at, model.red_at)
+        lights = list(model.traffic_lights)
+        light_index = {id(tl): i for i, tl in enumerate(lights)}
+        self.lights = lights
+        self.light_neighbors = [np.array([light_index[id(n)] for n in tl.neighbors], dtype=np.int64)
+                                for tl in lights]
+
+        for car in self.cars:
+            if car.destination is None:
+                car.setDestino()
+        positions = [model.grid.positions[car] for car in self.cars]
+        self.cell = [row * self.cols + col for row, col in positions]
+        self.dest = [int(car.destination[0]) * self.cols + int(car.destination[1]) for car in self.cars]
+        self.light = [light_index[id(car.trafficLight)] if car.trafficLight else -1 for car in self.cars]
+        self.distances = {}  # Destino -> distancia de cada celda (BFS, sin contar a los demás coches)
+
+        self.table = ReservationTable()
+        self.moves = defaultdict(list)  # tick -> [(coche, celda)] a ejecutar en ese tick
+        self.due = defaultdict(list)  # tick -> coches que vuelven a planear al terminar ese tick
+        self.parked = [False] * len(self.cars)
+        self.backoff = [1] * len(self.cars)  # Ticks hasta volver a planear si el plan quedó vacío
+        self.replans = 0
+        self.expansions = 0
+
+        now = model.global_timer
+        self.table.expire(now)
+        for i, cell in enumerate(self.cell):
+            self.table.hold(i, cell, now)  # Los que aún no planean son obstáculos
+        self.plan(range(len(self.cars)), now)
+
+    def step(self, now):
+        # Ejecuta los movimientos planeados para `now` (los semáforos ya se actualizaron) y
+        # vuelve a planear a los coches cuyo plan terminó
+        self.table.expire(now)
+        grid = self.model.grid
+        for car in self.cars:
+            car.velocity = 0
+        for i, cell in self.moves.pop(now, ()):
+            self.cell[i] = cell
+            grid.move_to(self.cars[i], divmod(cell, self.cols))
+            self.cars[i].velocity = 1
+        self.plan(sorted(self.due.pop(now, ())), now)
+
+    def plan(self, cars, now):
+        green = self.forecast(now)
+        for i in cars:
+            if self.parked[i]:
+                continue
+            self.replans += 1
+            start = self.cell[i]
+            self.table.release(i, start)
+            path, parked = self.search(i, start, now, green[:, self.light[i]])
+            while path and path[-1] == (path[-2] if len(path) > 1 else start):
+                path.pop()  # Las esperas finales equivalen a retener la celda
+            self.table.reserve(i, [start] + path, now - 1)  # También la celda actual (para los intercambios)
+            if not path and not parked:
+                # Sin avance posible (p. ej. en la cola detrás de un coche estacionado): retiene la
+                # celda y espera cada vez más, hasta una ventana, antes de volver a planear
+                self.due[now + self.backoff[i]].append(i)
+                self.backoff[i] = min(2 * self.backoff[i], self.window)
+                self.table.hold(i, start, now)
+                continue
+            self.backoff[i] = 1
+            self.table.hold(i, path[-1] if path else start, now + len(path))
+            previous = start
+            for tick, cell in enumerate(path, now + 1):
+                if cell != previous:
+                    self.moves[tick].append((i, cell))
+                previous = cell
+            self.parked[i] = parked
+            if not parked:
+                self.due[now + len(path)].append(i)
+
+    def forecast(self, now):
+        # ¿Está en verde cada semáforo en los ticks now..now + window? (la última columna, la de
+        # los coches sin semáforo, siempre en rojo)
+        states = np.array([STATES.index(tl.state) for tl in self.lights] + [RED], dtype=np.int8)
+        green = np.empty((self.window + 1, len(states)), dtype=bool)
+        green[0] = states == GREEN
+        for k in range(1, self.window + 1):
+            advance_lights(states, self.light_neighbors, now + k, self.cycle)
+            green[k] = states == GREEN
+        return green
+
+    def distance_field(self, goal):
+        field = self.distances.get(goal)
+        if field is None:
+            field = self.distances[goal] = bfs_distances(self.model.grid_map, divmod(goal, self.cols)).ravel()
+        return field
+
+    def search(self, car, start, now, green):
+        # A* sobre (celda, tick) de now a now + window: esperar o moverse a una celda vecina libre
+        # (con el semáforo en verde), sin intercambiar lugar con otro coche. Devuelve las celdas
+        # de los ticks planeados y si el coche se queda estacionado en su destino.
+        goal = self.dest[car]
+        if start == goal:
+            return [], True
+        try:
+            distance = self.distance_field(goal)
+        except ValueError as e:
+            print(e)
+            return [], True
+        if self.light[car] < 0:
+            return [], True  # Sin semáforo no avanza nunca
+        if distance[start] < 0 and not self.reachable_neighbor(start, distance):
+            print(f"No se puede calcular la ruta para el coche {self.cars[car]}")
+            return [], False
+        if not green[1:].any():
+            return [], False  # En rojo toda la ventana
+
+        table, cols, window = self.table, self.cols, self.window
+        layer = window + 1
+        parent = {start * layer: None}
+        heap = [(self.estimate(start, distance), 0, start)]  # (f, -tick, celda): a igual f, el más avanzado
+        for _ in range(MAX_EXPANSIONS):
+            if not heap:
+                break
+            _, k, cell = heapq.heappop(heap)
+            k = -k
+            self.expansions += 1
+            if cell == goal and table.free_from(goal, now + k, car):
+                return self.path(parent, cell * layer + k), True
+            if k == window:
+                if table.free_from(cell, now + k, car):
+                    return self.path(parent, cell * layer + k), False
+                continue
+            tick = now + k + 1
+            row, col = divmod(cell, cols)
+            for (dr, dc) in ((0, 0),) + (MOVES if green[k + 1] else ()):
+                r, c = row + dr, col + dc
+                if not (0 <= r < self.rows and 0 <= c < cols):
+                    continue
+                following = r * cols + c
+                key = following * layer + k + 1
+                if key in parent or not self.passable[following] and following != cell:
+                    continue
+                if table.owner(following, tick) not in (None, car):
+                    continue
+                if following != cell:
+                    other = table.owner(following, tick - 1)
+                    if other is not None and other != car and table.owner(cell, tick) == other:
+                        continue  # Intercambio de lugares
+                parent[key] = cell * layer + k
+                heapq.heappush(heap, (k + 1 + self.estimate(following, distance), -(k + 1), following))
+        return [], False  # Sin plan: espera y vuelve a intentar en el siguiente tick
+
+    def estimate(self, cell, distance):
+        # Distancia al destino; desde una celda fuera de la calle, la del mejor vecino más uno
+        d = distance[cell]
+        if d >= 0:
+            return d
+        return self.reachable_neighbor(cell, distance) or len(distance)
+
+    def reachable_neighbor(self, cell, distance):
+        row, col = divmod(cell, self.cols)
+        options = [distance[(row + dr) * self.cols + col + dc] + 1 for dr, dc in MOVES
+                   if 0 <= row + dr < self.rows and 0 <= col + dc < self.cols
+                   and distance[(row + dr) * self.cols + col + dc] >= 0]
+        return min(options, default=0)
+
+    def path(self, parent, key):
+        layer = self.window + 1
+        cells = []
+        while parent[key] is not None:
+            cells.append(key // layer)
+            key = parent[key]
+        cells.reverse()
+        return cells
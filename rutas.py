@@ -0,0 +1,354 @@
+import hashlib
+import heapq
+import threading
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+# Heurística de A* (distancia de Manhattan)
+def heuristic(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+# Arreglos de trabajo de A* (gscore, came_from, cerrados), reutilizados entre búsquedas
+# del mismo hilo. Cada búsqueda limpia solo las celdas que tocó, así que una ruta
+# corta no paga el área de todo el mapa.
+_scratch = threading.local()
+
+def search_buffers(size):
+    buffers = getattr(_scratch, 'buffers', None)
+    if buffers is None or len(buffers[2]) < size:
+        buffers = (array('l', [-1]) * size, array('l', [-1]) * size, bytearray(size))
+        _scratch.buffers = buffers
+    return buffers
+
+# Búsqueda A* sobre arreglos planos indexados por id de celda (fila * ancho + columna).
+# Las entradas obsoletas del heap se descartan al sacarlas en lugar de buscar
+# pertenencia en el heap. El orden de expansión (f, fila, columna) es el mismo
+# que el de la versión con diccionarios, así que devuelve las mismas rutas.
+# `passable` permite reutilizar la máscara de celdas transitables entre búsquedas.
+def a_star_search(grid, start, goal, passable=None):
+    grid = np.asarray(grid)
+    if not (0 <= start[0] < grid.shape[0] and 0 <= start[1] < grid.shape[1]):
+        raise ValueError(f"Start position out of bounds: {start}")
+    if not (0 <= goal[0] < grid.shape[0] and 0 <= goal[1] < grid.shape[1]):
+        raise ValueError(f"Goal position out of bounds: {goal}")
+
+    if grid[goal[0]][goal[1]] == 0:
+        raise ValueError(f"Goal position is not traversable: {goal}")
+
+    rows, cols = grid.shape
+    if passable is None:
+        passable = passable_mask(grid)
+    start_id = int(start[0]) * cols + int(start[1])
+    goal_id = int(goal[0]) * cols + int(goal[1])
+    goal_row, goal_col = divmod(goal_id, cols)
+
+    gscore, came_from, closed = search_buffers(rows * cols)  # gscore -1 = no visitado
+    gscore[start_id] = 0
+    touched = [start_id]
+    oheap = [(heuristic(divmod(start_id, cols), (goal_row, goal_col)), start_id)]
+    try:
+        while oheap:
+            current = heapq.heappop(oheap)[1]
+            if closed[current]:
+                continue  # Entrada obsoleta
+
+            if current == goal_id:
+                data = []
+                while current != start_id:
+                    data.append(divmod(current, cols))
+                    current = came_from[current]
+                data.append(tuple(start))
+                data.reverse()
+                return data
+
+            closed[current] = 1
+            row, col = divmod(current, cols)
+            tentative_g_score = gscore[current] + 1
+            # Mismo orden de vecinos que antes: derecha, izquierda, abajo, arriba
+            for neighbor, inside in ((current + 1, col + 1 < cols), (current - 1, col > 0),
+                                     (current + cols, row + 1 < rows), (current - cols, row > 0)):
+                if not inside or not passable[neighbor] or closed[neighbor]:
+                    continue
+                old_g = gscore[neighbor]
+                if old_g < 0:
+                    touched.append(neighbor)
+                if old_g < 0 or tentative_g_score < old_g:
+                    came_from[neighbor] = current
+                    gscore[neighbor] = tentative_g_score
+                    n_row, n_col = divmod(neighbor, cols)
+                    heapq.heappush(oheap, (tentative_g_score + abs(n_row - goal_row) + abs(n_col - goal_col), neighbor))
+
+        return []
+    finally:
+        for cell in touched:
+            gscore[cell] = -1
+            closed[cell] = 0
+
+def passable_mask(grid):
+    return (np.asarray(grid) != 0).ravel().tobytes()
+
+# Movimientos en el mismo orden de preferencia que A*: derecha, izquierda, abajo, arriba
+MOVES = ((0, 1), (0, -1), (1, 0), (-1, 0))
+
+# Campos de siguiente salto por destino. Se calcula una sola BFS inversa desde
+# cada destino (expandiendo la frontera completa con NumPy) y todos los coches
+# que van a esa salida leen su siguiente celda en O(1).
+class FlowFields:
+    def __init__(self, grid):
+        self.grid = np.asarray(grid)
+        self.fields = {}
+
+    def field(self, goal):
+        goal = (int(goal[0]), int(goal[1]))
+        if goal not in self.fields:
+            self.fields[goal] = next_hop_field(self.grid, goal)
+        return self.fields[goal]
+
+    def next_hop(self, goal, position):
+        move = self.field(goal)[position[0], position[1]]
+        if move < 0:
+            return None
+        return (position[0] + MOVES[move][0], position[1] + MOVES[move][1])
+
+def bfs_distances(grid, goal):
+    grid = np.asarray(grid)
+    if not (0 <= goal[0] < grid.shape[0] and 0 <= goal[1] < grid.shape[1]):
+        raise ValueError(f"Goal position out of bounds: {goal}")
+    if grid[goal[0]][goal[1]] == 0:
+        raise ValueError(f"Goal position is not traversable: {goal}")
+
+    rows, cols = grid.shape
+    passable = (grid != 0).ravel()
+    dist = np.full(rows * cols, -1, dtype=np.int32)  # -1 = inalcanzable
+    frontier = np.array([goal[0] * cols + goal[1]])
+    dist[frontier] = 0
+    d = 0
+    while frontier.size:
+        d += 1
+        row, col = np.divmod(frontier, cols)
+        candidates = np.concatenate((frontier[col + 1 < cols] + 1, frontier[col > 0] - 1,
+                                     frontier[row + 1 < rows] + cols, frontier[row > 0] - cols))
+        candidates = np.unique(candidates[passable[candidates] & (dist[candidates] < 0)])
+        dist[candidates] = d
+        frontier = candidates
+    return dist.reshape(rows, cols)
+
+def next_hop_field(grid, goal):
+    # Índice en MOVES hacia la celda vecina más cercana al destino (-1 = sin ruta o ya llegó)
+    dist = bfs_distances(grid, goal)
+    rows, cols = dist.shape
+    padded = np.pad(dist, 1, constant_values=-1)
+    neighbors = [padded[1 + dr:1 + dr + rows, 1 + dc:1 + dc + cols] for dr, dc in MOVES]
+    field = np.full((rows, cols), -1, dtype=np.int8)
+    for move in reversed(range(len(MOVES))):  # El primer movimiento preferido queda al final
+        field[(dist > 0) & (neighbors[move] == dist - 1)] = move
+
+    # Celdas fuera de la calle (p. ej. un coche que arranca en una celda 0), igual
+    # que A*, salen hacia el vecino transitable más cercano al destino
+    unreachable = np.iinfo(np.int32).max
+    best = np.stack([np.where(n >= 0, n, unreachable) for n in neighbors]).min(axis=0)
+    off_road = (dist < 0) & (best < unreachable)
+    for move in reversed(range(len(MOVES))):
+        field[off_road & (neighbors[move] == best)] = move
+    return field
+
+# Distancia de cada celda a cada destino (la de bfs_distances), reparada de forma
+# incremental cuando se cierran o abren celdas en lugar de recalcularla: es LPA*
+# con costos unitarios y sin heurística, y solo toca las celdas cuya distancia
+# cambia. Al cerrar, se invalidan las celdas que ya no tienen un vecino a
+# distancia d - 1 (en orden de distancia, así que el soporte de cada una ya es
+# definitivo) y se recalculan desde la frontera con las que siguen válidas. Al
+# abrir, la mejora se propaga como una BFS desde las celdas abiertas. Las rutas
+# afectadas se reparan (repair) bajando por la distancia solo en el tramo que cambió.
+class DistanceFields:
+    def __init__(self, grid):
+        self.grid = np.asarray(grid)
+        self.rows, self.cols = self.grid.shape
+        self.passable = None  # Máscara plana de celdas transitables; se crea al primer uso
+        self.fields = {}  # Destino -> distancias (planas, -1 = inalcanzable)
+        self.touched = 0  # Celdas revisadas por las reparaciones (medida de trabajo)
+
+    def field(self, goal):
+        goal = (int(goal[0]), int(goal[1]))
+        dist = self.fields.get(goal)
+        if dist is None:
+            grid = self.mask().reshape(self.rows, self.cols)
+            dist = self.fields[goal] = bfs_distances(grid, goal).ravel()
+        return dist
+
+    def mask(self):
+        if self.passable is None:
+            self.passable = (self.grid != 0).ravel()
+        return self.passable
+
+    def neighbors(self, cell):
+        row, col = divmod(cell, self.cols)
+        if col + 1 < self.cols:
+            yield cell + 1
+        if col > 0:
+            yield cell - 1
+        if row + 1 < self.rows:
+            yield cell + self.cols
+        if row > 0:
+            yield cell - self.cols
+
+    def update(self, cells, passable):
+        # Cambia las celdas (ids planos) a transitables o cerradas y repara los campos calculados
+        cells = [int(c) for c in cells if self.mask()[c] != passable]
+        if not cells:
+            return
+        self.passable[cells] = passable
+        for goal, dist in list(self.fields.items()):
+            if not self.passable[goal[0] * self.cols + goal[1]]:
+                del self.fields[goal]  # Destino cerrado: field() avisará al pedirlo
+            elif passable:
+                self.improve(dist, cells)
+            else:
+                self.worsen(dist, cells)
+
+    def worsen(self, dist, closed):
+        dist = memoryview(dist)  # Acceso por celda con enteros de Python, mucho más rápido que con NumPy
+        heap, invalid = [], []
+        for cell in closed:
+            if dist[cell] >= 0:
+                heap += [(dist[cell] + 1, n) for n in self.neighbors(cell) if dist[n] == dist[cell] + 1]
+                dist[cell] = -1
+        heapq.heapify(heap)
+        while heap:
+            d, cell = heapq.heappop(heap)
+            self.touched += 1
+            if dist[cell] != d or any(dist[n] == d - 1 for n in self.neighbors(cell)):
+                continue  # Ya invalidada, o aún tiene un vecino que la lleva al destino
+            dist[cell] = -1
+            invalid.append(cell)
+            for n in self.neighbors(cell):
+                if dist[n] == d + 1:
+                    heapq.heappush(heap, (d + 1, n))
+        # Nuevas distancias de las invalidadas, desde las vecinas que siguen válidas
+        for cell in invalid:
+            known = [dist[n] for n in self.neighbors(cell) if dist[n] >= 0]
+            if known:
+                heap.append((min(known) + 1, cell))
+        heapq.heapify(heap)
+        pending = set(invalid)
+        while heap:
+            d, cell = heapq.heappop(heap)
+            self.touched += 1
+            if cell not in pending:
+                continue
+            pending.discard(cell)
+            dist[cell] = d
+            for n in self.neighbors(cell):
+                if n in pending:
+                    heapq.heappush(heap, (d + 1, n))
+
+    def improve(self, dist, opened):
+        dist = memoryview(dist)
+        heap = []
+        for cell in opened:
+            known = [dist[n] for n in self.neighbors(cell) if dist[n] >= 0]
+            if known:
+                heap.append((min(known) + 1, cell))
+        heapq.heapify(heap)
+        while heap:
+            d, cell = heapq.heappop(heap)
+            self.touched += 1
+            if 0 <= dist[cell] <= d:
+                continue
+            dist[cell] = d
+            for n in self.neighbors(cell):
+                if self.passable[n] and not 0 <= dist[n] <= d + 1:
+                    heapq.heappush(heap, (d + 1, n))
+
+    def repair(self, goal, old):
+        # Ruta más corta al destino a partir de la anterior (`old`: ids planos desde la celda actual).
+        # Conserva el tramo final que sigue siendo el más corto y baja por la distancia solo hasta
+        # volver a él, prefiriendo las celdas de la ruta anterior. Devuelve ids planos
+        # (vacío si ya no hay ruta); desde una celda fuera de la calle sale primero al vecino más
+        # cercano al destino, como A*.
+        dist = self.field(goal)
+        old = np.asarray(old, dtype=np.int64)
+        tight = dist[old] == len(old) - 1 - np.arange(len(old))
+        suffix = np.logical_and.accumulate(tight[::-1])[::-1]
+        if suffix[0]:
+            return old
+        # Del inicio se conserva el tramo en el que cada paso sigue acercando al destino (aunque la
+        # distancia haya cambiado), así que solo se rehace el desvío alrededor de lo que cambió
+        steady = np.logical_and.accumulate(dist[old] == dist[old[0]] - np.arange(len(old)))
+        keep = max(int(np.argmin(steady)) - 1, 0) if dist[old[0]] >= 0 else 0
+        rejoin = dict(zip(old[suffix].tolist(), np.flatnonzero(suffix).tolist()))
+        cells = old[:keep + 1].tolist()
+        cell = cells[-1]
+        if dist[cell] < 0:
+            options = [n for n in self.neighbors(cell) if dist[n] >= 0]
+            if not options:
+                return np.empty(0, dtype=np.int64)
+            cell = min(options, key=dist.__getitem__)
+            cells.append(cell)
+        while cell not in rejoin:
+            options = [n for n in self.neighbors(cell) if dist[n] == dist[cell] - 1]
+            cell = next((n for n in options if n in rejoin), options[0])
+            cells.append(cell)
+        return np.concatenate((np.array(cells, dtype=np.int64), old[rejoin[cell] + 1:]))
+
+# Versión del mapa: huella del contenido. Dos modelos con el mismo mapa comparten
+# versión (y por tanto rutas en caché); cualquier cambio en el mapa produce otra.
+def map_version(grid):
+    grid = np.ascontiguousarray(grid)
+    digest = hashlib.blake2b(grid.data, digest_size=8)  # Sin copiar (sirve también con memmap)
+    digest.update(repr((grid.shape, grid.dtype.str)).encode())
+    return digest.hexdigest()
+
+# Caché LRU acotada de rutas A*, con clave (versión del mapa, inicio, destino)
+class PathCache:
+    # La usan a la vez los hilos de simulación de todas las sesiones (trabajador.py): el diccionario
+    # y la máscara se leen y cambian con el candado tomado; A* corre fuera de él.
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.passable = (None, None)  # (versión, máscara) del último mapa buscado
+        self.lock = threading.Lock()
+
+    def find_path(self, grid, version, start, goal):
+        key = (version, tuple(start), tuple(goal))
+        with self.lock:
+            path = self.entries.pop(key, None)
+            if path is not None:
+                self.hits += 1
+                self.entries[key] = path  # Al final: usada más recientemente
+                return path
+            self.misses += 1
+            passable = self.passable
+            if passable[0] != version:
+                passable = self.passable = (version, passable_mask(grid))
+        path = tuple(a_star_search(grid, start, goal, passable[1]))
+        with self.lock:
+            self.entries[key] = path
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return path  # Tupla compartida: los coches avanzan un cursor sin modificarla
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.passable = (None, None)
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            hits, misses, size = self.hits, self.misses, len(self.entries)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'size': size,
+            'hit_rate': hits / total if total else 0.0,
+        }
+
+# Caché compartida por todos los modelos del proceso (p. ej. las sesiones del servidor)
+path_cache = PathCache()
@@ -0,0 +1,41 @@
+import heapq
+
+# Agenda de transiciones de semáforos. Un semáforo solo cambia en verde al llegar
+# a la fase de amarillo o en amarillo al llegar a la de rojo, así que basta con
+# programar esa siguiente transición cuando entra en cada estado y, en cada tick,
+# actualizar solo los semáforos con un evento pendiente, en el mismo orden que
+# TrafficModel.step. Los eventos que quedan obsoletos (p. ej. un amarillo que
+# volvió a verde por un mensaje) no cambian nada al procesarse.
+
+
+def next_tick(now, phase, cycle_length):
+    # Primer tick posterior a `now` que cae en `phase` del ciclo
+    return now + ((phase - now) % cycle_length or cycle_length)
+
+
+class SignalScheduler:
+    def __init__(self, lights, cycle_length, yellow_at, red_at, now=0):
+        self.lights = list(lights)
+        self.index = {id(light): i for i, light in enumerate(self.lights)}
+        self.cycle_length = cycle_length
+        self.phases = {"green": yellow_at, "yellow": red_at}
+        self.events = []  # Heap de (tick, índice del semáforo)
+        for light in self.lights:
+            self.watch(light, now)
+
+    def watch(self, light, now):
+        # Programa la siguiente transición posible según el estado actual del semáforo
+        phase = self.phases.get(light.state)
+        if phase is not None:
+            heapq.heappush(self.events, (next_tick(now, phase, self.cycle_length), self.index[id(light)]))
+
+    def due(self, now):
+        # Semáforos con un evento en este tick, en orden de índice y sin repetir
+        indices = set()
+        while self.events and self.events[0][0] <= now:
+            indices.add(heapq.heappop(self.events)[1])
+        return [self.lights[i] for i in sorted(indices)]
+
+    def next_event(self):
+        # Tick del siguiente evento pendiente (None si ningún semáforo va a cambiar)
+        return self.events[0][0] if self.events else None
@@ -1,264 +1,334 @@
 import asyncio
 import json
+import os
+import sys
+import time
 import websockets
-import agentpy as ap
-import numpy as np
-import random
+from urllib.parse import parse_qs, urlparse
+import metricas
+from difusion import Hub
+from grabacion import Recorder, Recording
+from modelo import TrafficModel
+from protocolo import KEYFRAME_INTERVAL, bytes_to_frame, frame_to_bytes, frame_to_json, full_snapshot
+from rutas import path_cache
+from trabajador import SimulationWorker
 
-class TrafficLight(ap.Agent):
-    def setup(self):
-        self.state = "red"
-        self.timer = 0
-        self.cycle = ["green", "yellow", "red"]
-        self.neighbors = []
-
-    def update(self, global_timer):
-        cycle_length = 26
-        if self.state == "green" and global_timer % cycle_length == 10:
-            self.state = "yellow"
-        elif self.state == "yellow" and global_timer % cycle_length == 13:
-            self.state = "red"
-            self.sendMessage()
-        elif self.state == "red" and global_timer % cycle_length == 0:
-            pass
-
-    def sendMessage(self):
-        for neighbor in self.neighbors:
-            neighbor.receiveMessage()
-
-    def receiveMessage(self):
-        self.state = "green"
-
-def heuristic(a, b):
-    return abs(a[0] - b[0]) + abs(a[1] - b[1])
-
-def a_star_search(grid, start, goal):
-    neighbors = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-    close_set = set()
-    came_from = {}
-    gscore = {start: 0}
-    fscore = {start: heuristic(start, goal)}
-    oheap = []
-    heapq.heappush(oheap, (fscore[start], start))
-
-    while oheap:
-        current = heapq.heappop(oheap)[1]
-
-        if current == goal:
-            data = []
-            while current in came_from:
-                data.append(current)
-                current = came_from[current]
-            data.append(start)
-            data.reverse()
-            return data
-
-        close_set.add(current)
-        for i, j in neighbors:
-            neighbor = current[0] + i, current[1] + j
-            tentative_g_score = gscore[current] + 1
-
-            if 0 <= neighbor[0] < grid.shape[0] and 0 <= neighbor[1] < grid.shape[1]:
-                if grid[neighbor[0]][neighbor[1]] == 0:
-                    continue
-            else:
-                continue
-
-            if neighbor in close_set and tentative_g_score >= gscore.get(neighbor, float('inf')):
-                continue
-
-            if tentative_g_score < gscore.get(neighbor, float('inf')) or neighbor not in [i[1] for i in oheap]:
-                came_from[neighbor] = current
-                gscore[neighbor] = tentative_g_score
-                fscore[neighbor] = tentative_g_score + heuristic(neighbor, goal)
-                heapq.heappush(oheap, (fscore[neighbor], neighbor))
-
-    return []
-
-class Car(ap.Agent):
-    def setup(self):
-        self.velocity = 0
-        self.next = np.array([0, 0])
-        self.path = []
-        self.trafficLight = None
-        self.destination = None
-        self.direction = None
-        self.path = []
-        self.neighbors = []
-
-    def sendMessage(self):
-        for neighbor in self.neighbors:
-            neighbor.receiveMessage()
-
-    def setDestino(self):
-        self.destination = self.calcDestino(self.model.grid.positions[self], self.direction, self.model.grid_map)
-
-    def calcDestino(self, posicion, direccion, grid):
-        columna, fila = posicion
-        destino = [columna, fila]
-        if columna < 6 and fila < 6:
-            destino = [columna, len(grid)-1]  
-        elif columna < 6 and fila >= 6:
-            destino = [len(grid)-1, fila]
-        elif columna >= 6 and fila < 6:
-            destino = [0, fila] 
-        elif columna >= 6 and fila >= 6:
-            destino = [columna, 0]
-
-        while grid[destino[0]][destino[1]] == 0:
-            if direccion == 'frente':
-                destino[0] += 1 if columna < grid.shape[0] // 2 else -1
-            elif direccion == 'left':
-                destino[1] += 1
-            elif direccion == 'right':
-                destino[1] -= 1
-
-        return destino
-
-    def receiveMessage(self):
-        self.velocity = 1
+async def send_initial_data(websocket, model):
+    data = {'map': model.grid_map.tolist(), **full_snapshot(model)}
+    await websocket.send(json.dumps(data))
 
-    def update(self):
-        if self.destination is None:
-            self.setDestino()
-        if not self.path:
+async def send_position_update(websocket, model):
+    await websocket.send(json.dumps(full_snapshot(model)))
+
+async def send(websocket, data):
+    await websocket.send(data)
+
+async def send_stats(websocket, interval):
+    # Mensaje periódico con las métricas (solo si el cliente lo pide con ?stats=segundos)
+    while True:
+        await asyncio.sleep(interval)
+        await websocket.send(json.dumps({'stats': metricas.registry.snapshot()}))
+
+# Ruta a un mapa (.npy, .txt o .csv, con su .json de semáforos y coches); sin definir, el cruce original
+MAPA = os.environ.get('MAPA')
+# 'sesion': una simulación por conexión; 'difusion': una simulación por escenario compartida por todos
+MODO = os.environ.get('MODO', 'sesion')
+# Ritmo objetivo de la simulación (corre en su propio hilo, ver trabajador.py)
+TICKS_POR_SEGUNDO = float(os.environ.get('TICKS_POR_SEGUNDO', 10))
+# Puerto del endpoint HTTP de métricas (ver metricas.py); sin definir, sin instrumentación
+METRICAS_PUERTO = os.environ.get('METRICAS_PUERTO')
+# Carpeta de grabaciones (ver grabacion.py): si está definida, las simulaciones en modo
+# difusión se graban ahí, y ?replay=archivo repite una grabación de esa carpeta
+GRABACIONES = os.environ.get('GRABACIONES')
+# Probabilidad de llegada por entrada y tick (ver flota.py): si está definida, las simulaciones
+# con deltas corren en operación continua, con coches que entran y salen
+LLEGADAS = float(os.environ['LLEGADAS']) if os.environ.get('LLEGADAS') else None
+# Ruteo de los coches: 'astar', 'flow' o 'graph' (grafo de intersecciones, que se guarda junto al
+# mapa y se lee de ahí en los siguientes arranques, ver grafo.py)
+RUTAS = os.environ.get('RUTAS', 'astar')
+# Semáforos: 'fixed' (ciclo fijo) o 'actuated' (verde según la demanda de cada acceso, ver controladores.py)
+SEMAFOROS = os.environ.get('SEMAFOROS', 'fixed')
+# Escenarios disponibles en modo difusión (?scenario=nombre)
+ESCENARIOS = {'default': MAPA}
+hubs = {}
+
+def start_simulation(map_spec, keyframe_interval=KEYFRAME_INTERVAL, max_steps=None, record_to=None):
+    model = TrafficModel({'map': map_spec, 'arrivals': LLEGADAS, 'routing': RUTAS, 'controller': SEMAFOROS})
+    model.setup()
+    recorder = Recorder(record_to, TICKS_POR_SEGUNDO) if record_to else None
+    worker = SimulationWorker(model, rate=TICKS_POR_SEGUNDO, keyframe_interval=keyframe_interval,
+                              max_steps=max_steps, recorder=recorder)
+    return worker, Hub(worker.encoder, ticks_per_second=TICKS_POR_SEGUNDO)
+
+async def run_hub(hub, worker, name):
+    await hub.follow(worker)
+    # La simulación corre mientras tenga suscriptores; el siguiente cliente empieza una nueva
+    if hubs.get(name) is hub:
+        del hubs[name]
+    stats = {**worker.metrics.stats(), **hub.stats()}
+    print(f"Simulación '{name}' terminada: {stats['ticks']} ticks a {stats['ticks_per_second']:.1f}/s, "
+          f"retraso máx. {stats['max_lag_ms']:.1f} ms, {stats['late_ticks']} ticks atrasados, "
+          f"{stats['frames_lost']} frames perdidos")
+
+def view_options(query):
+    # ?viewport=r0,c0,r1,c1&rate=x (ver vistas.py); sin viewport, el mapa completo en cada tick
+    viewport = [int(v) for v in query['viewport'][0].split(',')] if 'viewport' in query else None
+    rate = float(query['rate'][0]) if 'rate' in query else None
+    if viewport is not None and len(viewport) != 4:
+        raise ValueError(f"Viewport inválido: {query['viewport'][0]}")
+    return viewport, rate
+
+def stats_interval(query):
+    # ?stats=segundos: cada cuánto enviar las métricas (None si no se piden)
+    if 'stats' not in query:
+        return None
+    try:
+        interval = float(query['stats'][0])
+    except ValueError:
+        interval = float('nan')
+    if not 0 < interval < float('inf'):
+        raise ValueError(f"Intervalo de métricas inválido: {query['stats'][0]}")
+    return interval
+
+async def subscribe(websocket, hub, query, encoding):
+    # Suscriptor con las opciones de la conexión, o None (y el socket cerrado) si no son válidas
+    try:
+        return hub.subscribe(encoding, *view_options(query))
+    except ValueError as error:
+        await websocket.close(reason=str(error))
+        return None
+
+async def read_view_commands(websocket, hub, subscriber):
+    # Órdenes del cliente durante la transmisión: {"viewport": [r0, c0, r1, c1]} y {"rate": x} cambian
+    # su área y su ritmo; cualquier otro texto (p. ej. "Solicitando actualización" del cliente de Unity)
+    # pide una actualización
+    try:
+        async for message in websocket:
             try:
-                path = a_star_search(self.model.grid_map, self.model.grid.positions[self], tuple(self.destination))
-                if not path:
-                    print(f"No se puede calcular la ruta para el coche {self}")
-                else:
-                    self.path = path
-            except ValueError as e:
-                print(e)
-        
-        if len(self.path) > 1:
-            next_position = self.path[1]
-            if self.trafficLight and self.trafficLight.state == "green" and not self.check_collision(next_position):
-                self.model.grid.move_to(self, next_position)
-                self.path.pop(0)
-            elif self.check_collision(next_position):
-                self.negotiate(next_position)
-
-    def check_collision(self, position):
-        for agent in self.model.grid.agents:
-            if agent is not self and self.model.grid.positions[agent] == position:
-                return agent
-        return False
-
-    def negotiate(self, position):
-        other_car = self.check_collision(position)
-        if other_car:
-            my_distance = heuristic(self.model.grid.positions[self], self.destination)
-            other_distance = heuristic(self.model.grid.positions[other_car], other_car.destination)
-            if my_distance < other_distance:
-                self.velocity = 1
-                other_car.velocity = 0
+                command = json.loads(message)
+            except (TypeError, ValueError):
+                command = None
+            if isinstance(command, dict) and ('viewport' in command or 'rate' in command):
+                try:
+                    hub.update_view(subscriber, command.get('viewport'), command.get('rate'))
+                except (TypeError, ValueError):
+                    pass  # Área inválida: se queda con la anterior
             else:
-                self.velocity = 0
-                other_car.velocity = 1
-
-class Environment(ap.Grid):
-    def setup(self):
-        self.traffic_lights = ap.AgentList(self.model, 4, TrafficLight)
-        self.cars = ap.AgentList(self.model, 7, Car)
-        self.add_agents(self.traffic_lights, [(3, 3), (9, 3), (9, 9), (2, 9)])
-
-        car_positions = [(5, 3), (5, 2), (3, 7), (3,8), (7, 9), (7, 10), (9, 5), (10, 5)]
-        car_directions = ['frente', 'frente', 'right', 'right', 'left', 'left', 'left', 'left']
-        self.add_agents(self.cars, car_positions)
-
-        for car, direction in zip(self.cars, car_directions):
-            car.direction = direction
-
-        for car in self.cars:
-            car.trafficLight = self.assign_traffic_light(car)
-
-        self.traffic_lights[0].neighbors.append(self.traffic_lights[1])
-        self.traffic_lights[1].neighbors.append(self.traffic_lights[2])
-        self.traffic_lights[2].neighbors.append(self.traffic_lights[3])
-        self.traffic_lights[3].neighbors.append(self.traffic_lights[0])
-
-    def assign_traffic_light(self, car):
-        pos = self.positions[car]
-        if pos[0] < 6 and pos[1] < 6:
-            return self.traffic_lights[0]
-        elif pos[0] < 6 and pos[1] >= 6:
-            return self.traffic_lights[3]
-        elif pos[0] >= 6 and pos[1] < 6:
-            return self.traffic_lights[1]
-        elif pos[0] >= 6 and pos[1] >= 6:
-            return self.traffic_lights[2]
-
-class TrafficModel(ap.Model):
-    def setup(self):
-        self.grid_map = np.array([
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0],
-        ])
-        self.grid = ap.Grid(self, (self.grid_map.shape[0], self.grid_map.shape[1]), torus=False)
-        self.environment = Environment(self, (self.grid_map.shape[0], self.grid_map.shape[1]), torus=False)
-        self.traffic_lights = self.environment.traffic_lights
-        self.cars = self.environment.cars
-        self.global_timer = 0
-
-        self.grid.add_agents(self.traffic_lights, positions=[(3, 3), (9, 3), (9, 9), (3, 9)])
-        self.grid.add_agents(self.cars, positions=[(5, 3), (5, 2), (3, 7), (3,8), (7, 9), (7, 10), (9, 5), (10, 5)])
-
-        initial_green_light = random.choice(self.traffic_lights)
-        initial_green_light.state = "green"
-
-    def step(self):
-        self.global_timer += 1
-        for traffic_light in self.traffic_lights:
-            traffic_light.update(self.global_timer)
-        for car in self.cars:
-            car.update()
-
-    def update(self):
+                hub.poll(subscriber)
+    except websockets.ConnectionClosed:
         pass
 
-    def end(self):
+async def stream(websocket, hub, subscriber):
+    commands = asyncio.ensure_future(read_view_commands(websocket, hub, subscriber))
+    try:
+        while True:
+            data = await subscriber.next()
+            if data is None:
+                break
+            await send(websocket, data)
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        commands.cancel()
+        hub.unsubscribe(subscriber)
+
+async def broadcast_server(websocket, query, encoding):
+    scenario = query.get('scenario', ['default'])[0]
+    if scenario not in ESCENARIOS:
+        await websocket.close(reason=f"Escenario desconocido: {scenario}")
+        return
+    hub = hubs.get(scenario)
+    if hub is None:
+        record_to = None
+        if GRABACIONES:
+            record_to = os.path.join(GRABACIONES, f"{scenario}-{time.strftime('%Y%m%d-%H%M%S')}.trj")
+        worker, hub = start_simulation(ESCENARIOS[scenario], record_to=record_to)
+        hubs[scenario] = hub
+        hub.task = asyncio.ensure_future(run_hub(hub, worker, scenario))
+    subscriber = await subscribe(websocket, hub, query, encoding)
+    if subscriber is None:
+        return
+    await stream(websocket, hub, subscriber)
+    print(f"Suscriptor de '{scenario}' desconectado: {subscriber.dropped} mensajes descartados, "
+          f"{subscriber.resyncs} resincronizaciones")
+
+def replay_seek(value):
+    # Tick de una repetición (se ajusta a los grabados en Recording.keyframe_at)
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"Tick inválido: {value}") from None
+
+def replay_speed(value):
+    # Factor sobre el ritmo grabado (0 = pausa)
+    try:
+        speed = float(value)
+    except (TypeError, ValueError):
+        speed = float('nan')
+    if not 0 <= speed < float('inf'):
+        raise ValueError(f"Velocidad inválida: {value}")
+    return speed
+
+async def read_commands(websocket, control):
+    # Órdenes del cliente durante una repetición: {"seek": tick} y {"speed": factor} (0 = pausa).
+    # Otros mensajes (p. ej. las solicitudes de actualización del cliente de Unity) y las órdenes con
+    # valores inválidos se ignoran.
+    try:
+        async for message in websocket:
+            try:
+                command = json.loads(message)
+            except (TypeError, ValueError):
+                continue
+            if isinstance(command, dict):
+                try:
+                    seek = replay_seek(command['seek']) if 'seek' in command else control['seek']
+                    speed = replay_speed(command['speed']) if 'speed' in command else control['speed']
+                except ValueError:
+                    continue
+                control['seek'], control['speed'] = seek, speed
+                control['changed'].set()
+    finally:
+        control['closed'] = True
+        control['changed'].set()
+
+async def wait_for_change(control, delay):
+    # Espera `delay` segundos (None = hasta una orden) o hasta que el cliente mande una orden
+    control['changed'].clear()
+    try:
+        await asyncio.wait_for(control['changed'].wait(), delay)
+    except asyncio.TimeoutError:
         pass
 
-async def send_initial_data(websocket, model):
-    data = {
-        'map': model.grid_map.tolist(),
-        'traffic_lights': [{'position': model.grid.positions[tl], 'state': tl.state} for tl in model.traffic_lights],
-        'cars': [{'position': model.grid.positions[car]} for car in model.cars]
-    }
-    await websocket.send(json.dumps(data))
+async def replay_server(websocket, query, encoding):
+    # Repite una grabación leyendo los frames ya codificados del archivo (sin simular). En binario
+    # se envían tal cual; al buscar un tick se arma un solo keyframe con el estado en ese tick.
+    #   replay: archivo en GRABACIONES; from: tick inicial; speed: factor sobre el ritmo grabado
+    if not GRABACIONES:
+        await websocket.close(reason="Repeticiones desactivadas: falta la carpeta GRABACIONES")
+        return
+    name = os.path.basename(query['replay'][0])
+    try:
+        seek, speed = replay_seek(query.get('from', ['0'])[0]), replay_speed(query.get('speed', ['1'])[0])
+    except ValueError as error:
+        await websocket.close(reason=str(error))
+        return
+    try:
+        recording = Recording(os.path.join(GRABACIONES, name))
+    except (OSError, ValueError):
+        await websocket.close(reason=f"Grabación no disponible: {name}")
+        return
+    control = {'seek': seek, 'speed': speed, 'changed': asyncio.Event(), 'closed': False}
+    commands = asyncio.ensure_future(read_commands(websocket, control))
+    include_map = True  # El primer keyframe lleva el mapa
+    frames = iter(())
+    try:
+        while not control['closed']:
+            if control['seek'] is not None:
+                frame = recording.keyframe_at(control['seek'], include_map=include_map)
+                control['seek'], include_map = None, False
+                frames = recording.after(frame['seq'])
+                data = frame_to_bytes(frame) if encoding == 'binary' else json.dumps(frame_to_json(frame))
+            else:
+                _, data = next(frames, (None, None))
+                if data is None:
+                    await wait_for_change(control, None)  # Fin de la grabación: espera otra búsqueda
+                    continue
+                data = bytes(data) if encoding == 'binary' else json.dumps(frame_to_json(bytes_to_frame(data)))
+            await send(websocket, data)
+            speed = control['speed']
+            await wait_for_change(control, 1 / (recording.ticks_per_second * speed) if speed > 0 else None)
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        commands.cancel()
+        frames = None
+        recording.close()
 
-async def send_position_update(websocket, model):
-    data = {
-        'traffic_lights': [{'position': model.grid.positions[tl], 'state': tl.state} for tl in model.traffic_lights],
-        'cars': [{'position': model.grid.positions[car]} for car in model.cars]
-    }
-    await websocket.send(json.dumps(data))
+def advance(model):
+    model.step()
+    model.update()
 
 async def simulation_server(websocket, path):
-    model = TrafficModel()
-    model.setup()
-
-    await send_initial_data(websocket, model)
-
-    for _ in range(100):  # Número de pasos de simulación
-        model.step()
-        await send_position_update(websocket, model)
-        await asyncio.sleep(0.1)
-
-start_server = websockets.serve(simulation_server, "localhost", 8765)
-
-# Run the WebSocket server
-asyncio.get_event_loop().run_until_complete(start_server)
-print("WebSocket server started on ws://localhost:8765")
-asyncio.get_event_loop().run_forever()
+    # Opciones elegidas al conectar (ver protocolo.py), p. ej. ws://localhost:8765/?updates=delta&encoding=binary
+    #   updates: 'full' (por defecto, el estado completo en cada tick: el formato original que espera el
+    #            cliente de Unity) o 'delta' (deltas con keyframes periódicos)
+    #   encoding: 'json' (por defecto, el que usa el cliente de Unity) o 'binary' (frames binarios)
+    #   scenario: escenario compartido en modo difusión
+    #   viewport, rate: con deltas, recibir solo un área del mapa (fila y columna iniciales y finales) y a lo sumo
+    #                   `rate` actualizaciones por segundo; se cambian enviando {"viewport": [...], "rate": x}
+    #   replay, from, speed: repetir una grabación en vez de simular (ver replay_server)
+    #   stats: cada cuántos segundos enviar las métricas como mensaje de texto (requiere METRICAS_PUERTO)
+    query = parse_qs(urlparse(path).query)
+    updates = query.get('updates', ['full'])[0]
+    encoding = 'binary' if query.get('encoding', ['json'])[0] == 'binary' else 'json'
+    metricas.registry.count('connections')
+    try:
+        interval = stats_interval(query)
+    except ValueError as error:
+        await websocket.close(reason=str(error))
+        return
+    stats_task = None
+    if interval is not None and metricas.registry.enabled:
+        stats_task = asyncio.ensure_future(send_stats(websocket, interval))
+    try:
+        await run_session(websocket, query, updates, encoding)
+    finally:
+        if stats_task is not None:
+            stats_task.cancel()
+
+async def run_session(websocket, query, updates, encoding):
+    if 'replay' in query:
+        await replay_server(websocket, query, encoding)
+        return
+    if MODO == 'difusion':
+        # Deltas con keyframes; el formato original en JSON se arma con el keyframe de cada tick
+        await broadcast_server(websocket, query, 'full' if updates == 'full' and encoding == 'json' else encoding)
+        return
+
+    if updates == 'full' and encoding == 'json':
+        if 'viewport' in query or 'rate' in query:
+            await websocket.close(reason="Las áreas y el ritmo requieren updates=delta")
+            return
+        # Formato original: el paso corre en un hilo aparte para no bloquear los demás sockets
+        model = TrafficModel({'map': MAPA, 'routing': RUTAS, 'controller': SEMAFOROS})
+        model.setup()
+        await send_initial_data(websocket, model)
+        loop = asyncio.get_running_loop()
+        for _ in range(100):  # Número de pasos de simulación
+            await loop.run_in_executor(None, advance, model)
+            await send_position_update(websocket, model)
+            await asyncio.sleep(1 / TICKS_POR_SEGUNDO)
+    else:
+        worker, hub = start_simulation(MAPA, keyframe_interval=1 if updates == 'full' else KEYFRAME_INTERVAL,
+                                       max_steps=100)
+        model = worker.model
+        subscriber = await subscribe(websocket, hub, query, encoding)
+        if subscriber is None:
+            return
+        hub.task = asyncio.ensure_future(run_hub(hub, worker, 'sesion'))
+        await stream(websocket, hub, subscriber)
+
+    stats = model.path_cache.stats()
+    print(f"Caché de rutas: {stats['hits']} aciertos, {stats['misses']} fallos ({stats['hit_rate']:.0%})")
+
+def enable_metrics(port):
+    metricas.enable({'servidor': sys.modules[__name__]})
+    metricas.registry.gauge('path_cache_hits', lambda: path_cache.stats()['hits'])
+    metricas.registry.gauge('path_cache_misses', lambda: path_cache.stats()['misses'])
+    metricas.registry.gauge('simulations', lambda: len(hubs))
+    metricas.registry.gauge('subscribers', lambda: sum(len(hub.subscribers) for hub in hubs.values()))
+    metricas.serve(port)
+    print(f"Métricas en http://127.0.0.1:{port}/metrics")
+
+def main():
+    if METRICAS_PUERTO:
+        enable_metrics(int(METRICAS_PUERTO))
+    start_server = websockets.serve(simulation_server, "localhost", 8765)
+
+    # Run the WebSocket server
+    asyncio.get_event_loop().run_until_complete(start_server)
+    print("WebSocket server started on ws://localhost:8765")
+    asyncio.get_event_loop().run_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import contextlib
+import io
+import random
+
+import numpy as np
+import pytest
+
+from controladores import ActuatedController
+from mapas import CityMap, generate_city
+from modelo import TrafficModel
+from motor_vectorial import GREEN, RED, YELLOW
+
+
+def corrida(engine, seed, fast_forward, ticks=600):
+    random.seed(seed)
+    model = TrafficModel({'map': generate_city(3, 3, block=6, cars_per_approach=3), 'controller': 'actuated',
+                          'engine': engine, 'fast_forward': fast_forward})
+    steps = []
+    step = model.step
+    model.step = lambda: (steps.append(None), step())
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+        model.run_ticks(ticks)
+    controller = model.controller
+    return ([tl.state for tl in model.traffic_lights], [model.grid.positions[c] for c in model.cars],
+            controller.active.tolist(), controller.since.tolist(), controller.switches), len(steps)
+
+
+@pytest.mark.parametrize('engine', ['agents', 'vector'])
+@pytest.mark.parametrize('seed', [0, 1])
+def test_fast_forward_con_semaforos_actuados(engine, seed):
+    expected, ticks = corrida(engine, seed, False)
+    result, steps = corrida(engine, seed, True)
+    assert result == expected
+    assert ticks == 600 and steps < ticks
+
+
+def test_grupos_en_cualquier_orden():
+    # Dos intersecciones de tres semáforos, intercalados y con el anillo en otro orden
+    controller = ActuatedController([[4, 0, 2], [1, 5, 3]], 6, yellow_time=2, min_green=1, max_green=3)
+    states = np.full(6, RED, dtype=np.int8)
+    queues = np.zeros(6, dtype=np.int64)
+    queues[[2, 5]] = 1
+    history = []
+    for now in range(1, 8):
+        controller.step(states, queues, now)
+        history.append(states.tolist())
+    assert history[0] == [RED, GREEN, RED, RED, GREEN, RED]
+    # Sin coches en su acceso, el verde pasa por amarillo al que espera
+    assert history[1] == [RED, YELLOW, RED, RED, YELLOW, RED]
+    assert history[3] == [RED, RED, GREEN, RED, RED, GREEN]
+    # Sin otro acceso esperando el verde se queda
+    assert history[-1] == history[3]
+    assert controller.next_event(states, queues, 7) is None
+
+
+def test_mapa_con_grupos():
+    city = generate_city(2, 2, block=6)
+    groups = [list(range(i, i + 4))[::-1] for i in range(0, len(city.lights), 4)]
+    model = TrafficModel({'map': CityMap(city.grid, city.lights, city.cars, city.directions, groups=groups),
+                          'controller': 'actuated'})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+        model.run_ticks(50)
+    assert model.controller.index.tolist() == groups
+    for group in groups:
+        assert sum(model.traffic_lights[i].state != 'red' for i in group) == 1
+
+
+@pytest.mark.parametrize('groups', [[[0, 1], [1, 2]], [[0, 4]], [[-1, 0]]])
+def test_grupos_invalidos(groups):
+    with pytest.raises(ValueError):
+        ActuatedController(groups, 4, yellow_time=2)
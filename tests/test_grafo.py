@@ -0,0 +1,81 @@
+import contextlib
+import io
+import random
+
+import numpy as np
+import pytest
+
+import grafo
+from grafo import IntersectionGraph
+from mapas import DEFAULT_CARS, DEFAULT_DIRECTIONS, DEFAULT_GRID, DEFAULT_LIGHTS, CityMap, generate_city
+from modelo import TrafficModel
+from rutas import a_star_search, map_version
+
+
+def cerrado_de_origen():
+    # El cruce original con una celda del borde cerrada: la columna 4 ya no es una franja completa
+    grid = np.array(DEFAULT_GRID, dtype=np.int8)
+    grid[0, 4] = 0
+    return grid
+
+
+def comparar(graph, grid, pairs):
+    # Largo de la ruta del grafo (o de A* si el grafo no la resuelve) contra A* sobre celdas
+    resolved = 0
+    for start, goal in pairs:
+        path = graph.path(start, goal)
+        expected = a_star_search(grid, start, goal)
+        if path is not None:
+            resolved += 1
+            assert len(path) == len(expected), (start, goal)
+            assert all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 for a, b in zip(path, path[1:]))
+            assert all(grid[cell] for cell in path)
+    return resolved
+
+
+def test_mapa_con_calles_fuera_de_las_franjas():
+    grid = cerrado_de_origen()
+    graph = IntersectionGraph(grid)
+    cells = [tuple(int(v) for v in c) for c in np.argwhere(grid != 0)]
+    pairs = [(a, b) for a in cells for b in cells]
+    resolved = comparar(graph, grid, pairs)
+    assert 0 < resolved < len(pairs)  # Unas rutas salen del grafo y otras van por A*
+    assert graph.route((0, 5), (11, 4)) is None  # Destino fuera del grafo
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_ciudad_con_cierres_de_origen(seed):
+    rng = np.random.default_rng(seed)
+    grid = np.array(generate_city(3, 3, block=4).grid)
+    roads = np.argwhere(grid != 0)
+    for r, c in roads[rng.choice(len(roads), 4, replace=False)]:
+        grid[r, c] = 0
+    graph = IntersectionGraph(grid)
+    cells = np.argwhere(grid != 0)
+    pairs = [tuple(tuple(int(v) for v in cells[i]) for i in rng.choice(len(cells), 2)) for _ in range(300)]
+    comparar(graph, grid, pairs)
+
+
+def test_modelo_con_ruteo_por_grafo():
+    city = CityMap(cerrado_de_origen(), DEFAULT_LIGHTS, DEFAULT_CARS, DEFAULT_DIRECTIONS)
+    lengths = []
+    for routing in ('astar', 'graph'):
+        random.seed(0)
+        model = TrafficModel({'map': city, 'routing': routing})
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.setup()
+            model.step()
+        lengths.append([len(car.remaining_path()) for car in model.cars])
+    assert lengths[0] == lengths[1]
+
+
+def test_cache_de_grafos_acotada(monkeypatch):
+    monkeypatch.setattr(grafo, 'GRAPH_CACHE_SIZE', 2)
+    monkeypatch.setattr(grafo, '_graphs', grafo.OrderedDict())
+    grids = [generate_city(n, 2, block=4).grid for n in (1, 2, 3)]
+    versions = [map_version(grid) for grid in grids]
+    first = grafo.load_graph(grids[0], versions[0])
+    grafo.load_graph(grids[1], versions[1])
+    assert grafo.load_graph(grids[0], versions[0]) is first  # Ahora el más reciente
+    grafo.load_graph(grids[2], versions[2])
+    assert list(grafo._graphs) == [versions[0], versions[2]]
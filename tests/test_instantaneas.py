@@ -0,0 +1,52 @@
+import contextlib
+import io
+import random
+
+import pytest
+
+from instantaneas import Checkpoint, checkpoint, resume
+from mapas import generate_city
+from modelo import TrafficModel
+from protocolo import car_positions
+
+
+def estado(model):
+    s = (model.global_timer, [tl.state for tl in model.traffic_lights], [car.id for car in model.cars],
+         car_positions(model).tolist())
+    if model.fleet is not None:
+        s += (repr(sorted(model.fleet.stats().items())),)
+    return s
+
+
+def corrida(model, ticks):
+    states = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(ticks):
+            model.step()
+            model.update()
+            states.append(estado(model))
+    return states
+
+
+CITY = generate_city(3, 3, block=6)
+
+
+@pytest.mark.parametrize('parameters', [{}, {'map': CITY, 'routing': 'graph'}, {'map': CITY, 'arrivals': 0.02},
+                                        {'map': CITY, 'engine': 'vector', 'controller': 'actuated'},
+                                        {'map': CITY, 'arrivals': 0.005, 'fast_forward': True}],
+                         ids=['default', 'graph', 'arrivals', 'vector-actuated', 'fast-forward'])
+def test_la_corrida_restaurada_sigue_igual(parameters):
+    random.seed(0)
+    model = TrafficModel(parameters)
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+    corrida(model, 50)
+    ck = Checkpoint.from_bytes(checkpoint(model).to_bytes())
+    expected = corrida(model, 60)
+    random.seed(1)  # El modelo restaurado no depende de la semilla global
+    assert corrida(resume(parameters, ck), 60) == expected
+
+
+def test_no_es_una_instantanea():
+    with pytest.raises(ValueError):
+        Checkpoint.from_bytes(b'XXXX\x01\x00\x00\x00')
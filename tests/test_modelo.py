@@ -0,0 +1,67 @@
+import contextlib
+import io
+import random
+
+import numpy as np
+import pytest
+
+from mapas import generate_city
+from modelo import OccupancyGrid, TrafficModel
+from rutas import a_star_search
+
+
+def test_rutas_reparadas_miden_lo_mismo_que_a_star():
+    random.seed(0)
+    model = TrafficModel({'map': generate_city(3, 3, block=6), 'engine': 'vector'})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+        model.step()
+    engine = model.engine
+    # La celda más transitada, sin coches ni destinos encima
+    uses = np.bincount(engine.path_cells, minlength=engine.rows * engine.cols)
+    uses[engine.cell] = 0
+    uses[engine.dest] = 0
+    cell = divmod(int(np.argmax(uses)), engine.cols)
+
+    grid = model.grid_map.copy()
+    grid[cell] = 0
+    model.edit_cells([cell], 0)
+    for i in range(len(engine.cars)):
+        expected = a_star_search(grid, divmod(int(engine.cell[i]), engine.cols),
+                                 divmod(int(engine.dest[i]), engine.cols))
+        assert engine.path_len[i] - engine.cursor[i] == len(expected), i
+
+
+def test_reabrir_devuelve_las_rutas_cortas():
+    random.seed(0)
+    model = TrafficModel({'map': generate_city(2, 2, block=6)})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+        model.step()
+    before = [len(car.remaining_path()) for car in model.cars]
+    road = tuple(np.argwhere(np.asarray(model.grid_map) != 0)[40])
+    model.edit_cells([road], 0)
+    model.edit_cells([road], 1)
+    assert [len(car.remaining_path()) for car in model.cars] == before
+
+
+def test_indice_de_ocupacion():
+    model = TrafficModel({'map': generate_city(2, 2, block=6)})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+    grid = OccupancyGrid(model, (5, 5))
+    a, b = model.cars[0], model.cars[1]
+    grid.add_agents([a, b], positions=[(0, 0), (0, 0)])
+    assert grid.agent_at((0, 0)) is b  # El último en llegar
+    grid.move_to(b, (1, 0))
+    assert grid.agent_at((0, 0)) is a and grid.agent_at((1, 0)) is b
+    grid.move_to(b, (0, 0))
+    grid.move_to(a, (1, 0))
+    assert grid.agent_at((0, 0)) is b and grid.agent_at((1, 0)) is a
+    grid.move_by(b, (-1, 9))  # Sin torus se queda en el borde
+    assert grid.positions[b] == (0, 4)
+    grid.remove_agents(a)
+    assert grid.agent_at((1, 0)) is None and list(grid.agents) == [b]
+    # Lo que no implementa no se hereda de ap.Grid
+    with pytest.raises(AttributeError):
+        grid.neighbors(b)
@@ -0,0 +1,71 @@
+import contextlib
+import io
+import random
+
+import pytest
+
+from mapas import generate_city
+from modelo import TrafficModel
+
+
+def estado(model):
+    return ([tl.state for tl in model.traffic_lights], [model.grid.positions[c] for c in model.cars],
+            [c.velocity for c in model.cars], [list(c.remaining_path()) for c in model.cars])
+
+
+def gemelos(parameters, seed):
+    models = []
+    for engine in ('agents', 'vector'):
+        random.seed(seed)
+        model = TrafficModel({**parameters, 'engine': engine})
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.setup()
+        models.append(model)
+    return models
+
+
+@pytest.mark.parametrize('parameters', [{'routing': 'astar'}, {'routing': 'flow'},
+                                        {'map': generate_city(3, 3, block=6), 'routing': 'graph'},
+                                        {'map': generate_city(3, 3, block=6), 'controller': 'actuated'}],
+                         ids=['astar', 'flow', 'graph', 'actuated'])
+@pytest.mark.parametrize('seed', [0, 1])
+def test_igual_que_el_motor_de_agentes(parameters, seed):
+    models = gemelos(parameters, seed)
+    for t in range(80):
+        for model in models:
+            with contextlib.redirect_stdout(io.StringIO()):
+                model.step()
+                model.update()
+        assert estado(models[0]) == estado(models[1]), t
+
+
+def test_cierre_a_mitad_de_corrida():
+    # Tras cerrar celdas, ambos motores reparan las rutas igual y siguen juntos
+    models = gemelos({'map': generate_city(3, 3, block=6)}, 0)
+    for t in range(60):
+        for model in models:
+            with contextlib.redirect_stdout(io.StringIO()):
+                if t == 10:
+                    model.edit_cells([(7, 3), (7, 4), (20, 11)], 0)
+                model.step()
+                model.update()
+        assert estado(models[0]) == estado(models[1]), t
+
+
+def test_rutas_reemplazadas_no_se_acumulan():
+    random.seed(0)
+    model = TrafficModel({'map': generate_city(3, 3, block=6), 'engine': 'vector'})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+        model.step()
+        engine = model.engine
+        cell = tuple(map(int, divmod(int(engine.path_cells[engine.path_start[0] + 2]), engine.cols)))
+        for _ in range(30):
+            model.edit_cells([cell], 0)
+            model.edit_cells([cell], 1)
+            model.update()
+            assert len(engine.path_cells) <= 3 * engine.path_len.sum()
+    for i, car in enumerate(model.cars):
+        start = engine.path_start[i]
+        cells = [divmod(int(c), engine.cols) for c in engine.path_cells[start:start + engine.path_len[i]]]
+        assert list(car.path) == cells and car.cursor == engine.cursor[i]
@@ -0,0 +1,46 @@
+import contextlib
+import io
+import random
+
+import pytest
+
+from mapas import generate_city
+from modelo import TrafficModel
+
+
+def estado(model):
+    return ([tl.state for tl in model.traffic_lights], [model.grid.positions[c] for c in model.cars],
+            [c.velocity for c in model.cars], [list(c.remaining_path()) for c in model.cars])
+
+
+@pytest.mark.parametrize('fast_forward', [False, True], ids=['cada-tick', 'fast-forward'])
+@pytest.mark.parametrize('workers', [2, 3])
+@pytest.mark.parametrize('seed', [0, 1])
+def test_igual_que_el_motor_vectorial(workers, seed, fast_forward):
+    models = []
+    for engine in ('vector', 'tiled'):
+        random.seed(seed)
+        model = TrafficModel({'map': generate_city(3, 3), 'engine': engine, 'workers': workers,
+                              'fast_forward': fast_forward})
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.setup()
+        models.append(model)
+    vector, tiled = models
+    processes = list(tiled.engine.processes)
+    assert len(processes) == workers
+    steps = []
+    step = tiled.step
+    tiled.step = lambda: (steps.append(None), step())
+    try:
+        for t in range(120):
+            for model in models:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    model.run_ticks(1)
+            assert estado(tiled) == estado(vector), t
+            assert tiled.global_timer == vector.global_timer
+    finally:
+        tiled.end()
+    # Con fast_forward las zonas también detectan los tramos sin movimiento y se saltan ticks
+    assert (len(steps) < 120) == fast_forward
+    assert tiled.engine.processes == []
+    assert all(not process.is_alive() and process.exitcode == 0 for process in processes)
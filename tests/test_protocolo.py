@@ -0,0 +1,23 @@
+import contextlib
+import io
+import json
+import random
+
+from mapas import generate_city
+from modelo import TrafficModel
+from protocolo import DeltaEncoder, full_snapshot, keyframe_to_full_json
+
+
+def test_formato_original_desde_keyframes():
+    # Lo que reciben los suscriptores 'full' del Hub es lo mismo que el servidor enviaba antes
+    random.seed(0)
+    model = TrafficModel({'map': generate_city(2, 2)})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+        encoder = DeltaEncoder(model, keyframe_interval=1)
+        first = keyframe_to_full_json(encoder.frame(include_map=True))
+        assert json.dumps(first) == json.dumps({'map': model.grid_map.tolist(), **full_snapshot(model)})
+        for _ in range(30):
+            model.step()
+            model.update()
+            assert json.dumps(keyframe_to_full_json(encoder.frame())) == json.dumps(full_snapshot(model))
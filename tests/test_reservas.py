@@ -0,0 +1,41 @@
+import contextlib
+import io
+import random
+
+import pytest
+
+from mapas import generate_city
+from modelo import TrafficModel
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_los_planes_no_chocan_ni_se_cruzan(seed):
+    random.seed(seed)
+    model = TrafficModel({'map': generate_city(3, 3, block=6, cars_per_approach=3), 'conflicts': 'reservations'})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.setup()
+    planner = model.planner
+    cols = planner.cols
+    before = [model.grid.positions[car] for car in model.cars]
+    moves = 0
+    for t in range(300):
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.step()
+        now = model.global_timer
+        after = [model.grid.positions[car] for car in model.cars]
+        # Nunca dos coches en la misma celda
+        assert len(set(after)) == len(after), t
+        # Nunca dos coches que intercambian lugares
+        origin = {cell: i for i, cell in enumerate(before)}
+        for i, cell in enumerate(after):
+            j = origin.get(cell)
+            assert j is None or j == i or after[j] != before[i], t
+        for i, (old, new) in enumerate(zip(before, after)):
+            # Cada coche se mueve a una celda vecina o se queda, y la celda en la que está es suya en
+            # la tabla de reservas
+            assert abs(old[0] - new[0]) + abs(old[1] - new[1]) <= 1, (t, i)
+            assert planner.cell[i] == new[0] * cols + new[1]
+            assert planner.table.owner(planner.cell[i], now) == i, (t, i)
+        moves += sum(old != new for old, new in zip(before, after))
+        before = after
+    assert moves > 0
@@ -0,0 +1,166 @@
+import heapq
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from rutas import PathCache, a_star_search, heuristic, passable_mask
+
+
+# A* original de modelo.py (diccionarios y búsqueda lineal en el heap): la referencia
+def a_star_anterior(grid, start, goal):
+    if not (0 <= start[0] < grid.shape[0] and 0 <= start[1] < grid.shape[1]):
+        raise ValueError(f"Start position out of bounds: {start}")
+    if not (0 <= goal[0] < grid.shape[0] and 0 <= goal[1] < grid.shape[1]):
+        raise ValueError(f"Goal position out of bounds: {goal}")
+
+    if grid[goal[0]][goal[1]] == 0:
+        raise ValueError(f"Goal position is not traversable: {goal}")
+
+    neighbors = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+    close_set = set()
+    came_from = {}
+    gscore = {start: 0}
+    fscore = {start: heuristic(start, goal)}
+    oheap = []
+    heapq.heappush(oheap, (fscore[start], start))
+
+    while oheap:
+        current = heapq.heappop(oheap)[1]
+
+        if current == goal:
+            data = []
+            while current in came_from:
+                data.append(current)
+                current = came_from[current]
+            data.append(start)
+            data.reverse()
+            return data
+
+        close_set.add(current)
+        for i, j in neighbors:
+            neighbor = current[0] + i, current[1] + j
+            tentative_g_score = gscore[current] + 1
+
+            if 0 <= neighbor[0] < grid.shape[0] and 0 <= neighbor[1] < grid.shape[1]:
+                if grid[neighbor[0]][neighbor[1]] == 0:
+                    continue
+            else:
+                continue
+
+            if neighbor in close_set and tentative_g_score >= gscore.get(neighbor, float('inf')):
+                continue
+
+            if tentative_g_score < gscore.get(neighbor, float('inf')) or neighbor not in [i[1] for i in oheap]:
+                came_from[neighbor] = current
+                gscore[neighbor] = tentative_g_score
+                fscore[neighbor] = tentative_g_score + heuristic(neighbor, goal)
+                heapq.heappush(oheap, (fscore[neighbor], neighbor))
+
+    return []
+
+
+def mapa_aleatorio(rng, size, densidad):
+    grid = (rng.random((size, size)) < densidad).astype(int)
+    celdas = np.argwhere(grid == 1)
+    start, goal = celdas[rng.choice(len(celdas), 2, replace=False)]
+    return grid, tuple(int(v) for v in start), tuple(int(v) for v in goal)
+
+
+@pytest.mark.parametrize('densidad', [0.5, 0.7, 0.9])
+def test_igual_que_la_version_anterior(densidad):
+    # Con densidad 0.5 muchos destinos quedan aislados: ambas versiones devuelven []
+    rng = np.random.default_rng(int(densidad * 10))
+    vacias = 0
+    for _ in range(150):
+        grid, start, goal = mapa_aleatorio(rng, int(rng.integers(3, 40)), densidad)
+        esperada = a_star_anterior(grid, start, goal)
+        assert a_star_search(grid, start, goal) == esperada, (grid.tolist(), start, goal)
+        vacias += esperada == []
+    if densidad == 0.5:
+        assert vacias > 0
+
+
+def test_destino_inalcanzable():
+    grid = np.ones((6, 6), dtype=int)
+    grid[:, 3] = 0
+    assert a_star_search(grid, (0, 0), (5, 5)) == a_star_anterior(grid, (0, 0), (5, 5)) == []
+
+
+def test_inicio_igual_al_destino():
+    grid = np.ones((4, 4), dtype=int)
+    assert a_star_search(grid, (2, 1), (2, 1)) == a_star_anterior(grid, (2, 1), (2, 1)) == [(2, 1)]
+
+
+def test_inicio_en_celda_cerrada():
+    # Como antes, el inicio no necesita ser transitable
+    grid = np.ones((3, 5), dtype=int)
+    grid[1, 0] = 0
+    assert a_star_search(grid, (1, 0), (1, 4)) == a_star_anterior(grid, (1, 0), (1, 4))
+
+
+@pytest.mark.parametrize('start, goal', [((-1, 0), (1, 1)), ((0, 0), (3, 0)), ((0, 0), (1, 1))])
+def test_errores(start, goal):
+    grid = np.ones((3, 3), dtype=int)
+    grid[1, 1] = 0
+    with pytest.raises(ValueError):
+        a_star_anterior(grid, start, goal)
+    with pytest.raises(ValueError):
+        a_star_search(grid, start, goal)
+
+
+def test_mascara_reutilizada():
+    rng = np.random.default_rng(1)
+    grid, start, goal = mapa_aleatorio(rng, 30, 0.7)
+    passable = passable_mask(grid)
+    for _ in range(3):
+        assert a_star_search(grid, start, goal, passable) == a_star_anterior(grid, start, goal)
+
+
+def test_cache_por_version_del_mapa():
+    # Dos mapas con la misma ruta pedida: cada versión guarda la suya
+    grid = np.ones((5, 5), dtype=int)
+    cerrado = grid.copy()
+    cerrado[0:4, 2] = 0
+    cache = PathCache(maxsize=4)
+    for _ in range(2):
+        assert list(cache.find_path(grid, 'a', (0, 0), (0, 4))) == a_star_anterior(grid, (0, 0), (0, 4))
+        assert list(cache.find_path(cerrado, 'b', (0, 0), (0, 4))) == a_star_anterior(cerrado, (0, 0), (0, 4))
+    assert cache.stats()['misses'] == 2 and cache.stats()['hits'] == 2
+
+
+def test_cache_entre_hilos():
+    # Varios hilos con mapas distintos sobre una caché chica: cada ruta es la de su mapa
+    rng = np.random.default_rng(3)
+    mapas = [mapa_aleatorio(rng, 25, 0.75)[0] for _ in range(3)]
+    consultas = []
+    for version, grid in enumerate(mapas):
+        celdas = np.argwhere(grid == 1)
+        for _ in range(20):
+            start, goal = (tuple(int(v) for v in c) for c in celdas[rng.choice(len(celdas), 2)])
+            consultas.append((version, start, goal, a_star_anterior(grid, start, goal)))
+    cache = PathCache(maxsize=8)
+    errores = []
+
+    def trabajar(orden):
+        try:
+            for _ in range(5):
+                for version, start, goal, esperada in orden:
+                    assert list(cache.find_path(mapas[version], version, start, goal)) == esperada
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=trabajar, args=([consultas[j] for j in rng.permutation(len(consultas))],))
+             for _ in range(6)]
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Cambios de hilo frecuentes, para que las carreras aparezcan
+    try:
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+    finally:
+        sys.setswitchinterval(intervalo)
+    assert not errores
+    assert cache.stats()['size'] <= 8
@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import deque
+
+from protocolo import KEYFRAME_INTERVAL, DeltaEncoder
+
+# Simulación en un hilo propio, a su propio ritmo, desacoplada del bucle de
+# asyncio que atiende los sockets. Cada tick se publica como un Tick inmutable
+# en un anillo con un solo escritor: el hilo solo reemplaza referencias (atómico
+# con el GIL), así que los lectores no necesitan candados. Si un lector se
+# atrasa más que la capacidad del anillo, pierde esos frames y se resincroniza
+# con el último tick.
+RING_CAPACITY = 64
+
+
+class TickRing:
+    def __init__(self, capacity=RING_CAPACITY):
+        self.entries = [None] * capacity
+        self.latest = None  # Último Tick publicado (la ranura de "último valor")
+
+    def push(self, tick):
+        self.entries[tick.seq % len(self.entries)] = tick
+        self.latest = tick
+
+    def since(self, seq):
+        # Ticks posteriores a `seq` en orden y cuántos se perdieron; si se perdió
+        # alguno, solo devuelve el último (el lector debe resincronizarse)
+        latest = self.latest
+        ticks = []
+        for s in range(seq + 1, latest.seq + 1):
+            tick = self.entries[s % len(self.entries)]
+            if tick is None or tick.seq != s:
+                return [latest], latest.seq - seq - 1
+            ticks.append(tick)
+        return ticks, 0
+
+
+class TickMetrics:
+    def __init__(self, window=50):
+        self.ticks = 0
+        self.late_ticks = 0  # Ticks que terminaron después de su hora
+        self.lag = 0.0  # Retraso del último tick respecto a su hora programada (s)
+        self.max_lag = 0.0
+        self.step_time = 0.0  # Duración del último step + frame (s)
+        self.times = deque(maxlen=window)
+
+    def record(self, finished, lag, step_time):
+        self.ticks += 1
+        self.lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.late_ticks += lag > 0
+        self.step_time = step_time
+        self.times.append(finished)
+
+    def ticks_per_second(self):
+        if len(self.times) < 2:
+            return 0.0
+        return (len(self.times) - 1) / (self.times[-1] - self.times[0])
+
+    def stats(self):
+        return {
+            'ticks': self.ticks,
+            'ticks_per_second': self.ticks_per_second(),
+            'lag_ms': self.lag * 1e3,
+            'max_lag_ms': self.max_lag * 1e3,
+            'late_ticks': self.late_ticks,
+            'step_ms': self.step_time * 1e3,
+        }
+
+
+class SimulationWorker(threading.Thread):
+    def __init__(self, model, rate=10.0, keyframe_interval=KEYFRAME_INTERVAL, max_steps=None,
+                 capacity=RING_CAPACITY, on_tick=None, recorder=None):
+        super().__init__(daemon=True)
+        self.model = model
+        self.interval = 1 / rate
+        self.max_steps = max_steps
+        self.encoder = DeltaEncoder(model, keyframe_interval)
+        self.ring = TickRing(capacity)
+        self.recorder = recorder  # grabacion.Recorder: guarda cada tick publicado
+        self.ring.push(self.publish_frame())  # Estado inicial (seq 0)
+        self.metrics = TickMetrics()
+        self.on_tick = on_tick  # Se llama desde el hilo tras cada tick (p. ej. loop.call_soon_threadsafe)
+        self.stopped = threading.Event()
+
+    def publish_frame(self):
+        self.encoder.frame()
+        if self.recorder is not None:
+            self.recorder.write(self.encoder, self.encoder.last)
+        return self.encoder.last
+
+    def tick(self):
+        # Un paso de simulación publicado en el anillo (también sirve sin hilo)
+        self.model.step()
+        self.model.update()
+        self.ring.push(self.publish_frame())
+        if self.on_tick is not None:
+            self.on_tick()
+
+    def run(self):
+        deadline = time.perf_counter()
+        while not self.stopped.is_set() and (self.max_steps is None or self.metrics.ticks < self.max_steps):
+            deadline += self.interval
+            start = time.perf_counter()
+            self.tick()
+            now = time.perf_counter()
+            lag = max(0.0, now - deadline)
+            self.metrics.record(now, lag, now - start)
+            if lag > self.interval:
+                deadline = now  # Muy atrasado: sigue desde ahora en lugar de encadenar ticks sin pausa
+            else:
+                self.stopped.wait(deadline - now)
+        self.stopped.set()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.on_tick is not None:
+            self.on_tick()  # Avisa a los lectores que terminó
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,125 @@
+import numpy as np
+
+from protocolo import GONE
+
+# Suscripciones por área de interés. Un cliente puede suscribirse a un
+# rectángulo del mapa (viewport: fila y columna iniciales, fila y columna
+# finales sin incluir) y a un ritmo de actualizaciones por segundo, y cambiar
+# ambos durante la sesión. Recibe un keyframe con los semáforos, los coches y el
+# recorte del mapa de su área, y después deltas con lo que cambió dentro de ella:
+# los coches que se movieron o entraron al área y, con la posición GONE, los que
+# salieron. Los deltas son respecto al último frame enviado a ese cliente (su
+# 'base'), así que a menor ritmo simplemente abarcan más ticks.
+#
+# Los coches de cada tick se ordenan una sola vez por teselas de TILE x TILE
+# celdas (SpatialIndex) y cada área lee solo las teselas que cubre, así que el
+# costo de armar los frames de un cliente y sus bytes crecen con lo que ve y no
+# con el tamaño de la ciudad.
+TILE = 16  # Potencia de dos: la tesela de cada punto sale con desplazamientos
+
+
+class SpatialIndex:
+    # Puntos agrupados por tesela: order[bounds[t]:bounds[t + 1]] son los de la tesela t
+    def __init__(self, positions, shape, tile=TILE):
+        self.tile = tile
+        self.positions = positions
+        self.tile_cols = -(-shape[1] // tile)
+        tiles = -(-shape[0] // tile) * self.tile_cols
+        shift = tile.bit_length() - 1
+        if tile != 1 << shift:
+            raise ValueError(f"El tamaño de tesela debe ser potencia de dos: {tile}")
+        key = (positions[:, 0] >> shift) * self.tile_cols + (positions[:, 1] >> shift)
+        # Con claves de 16 bits NumPy ordena por conteo (radix), en tiempo lineal
+        self.order = np.argsort(key.astype(np.uint16 if tiles <= 1 << 16 else np.int64), kind='stable')
+        self.bounds = np.zeros(tiles + 1, dtype=np.int64)
+        np.cumsum(np.bincount(key, minlength=tiles), out=self.bounds[1:])
+
+    def query(self, rect):
+        # Índices de los puntos dentro de rect (las teselas de una misma fila son contiguas)
+        r0, c0, r1, c1 = rect
+        t = self.tile
+        rows = np.arange(r0 // t, (r1 - 1) // t + 1) * self.tile_cols
+        spans = zip(self.bounds[rows + c0 // t].tolist(), self.bounds[rows + (c1 - 1) // t + 1].tolist())
+        index = np.concatenate([self.order[a:b] for a, b in spans] or [self.order[:0]])
+        p = self.positions[index]
+        return index[(p[:, 0] >= r0) & (p[:, 0] < r1) & (p[:, 1] >= c0) & (p[:, 1] < c1)]
+
+
+def clip_viewport(viewport, shape):
+    # (r0, c0, r1, c1) recortado al mapa; sin área, ValueError
+    r0, c0, r1, c1 = (int(v) for v in viewport)
+    r0, r1 = max(r0, 0), min(r1, shape[0])
+    c0, c1 = max(c0, 0), min(c1, shape[1])
+    if r0 >= r1 or c0 >= c1:
+        raise ValueError(f"Viewport vacío: {list(viewport)}")
+    return r0, c0, r1, c1
+
+
+class View:
+    # Área de un suscriptor y lo que ya tiene el cliente de ella
+    def __init__(self, rect, rate=None):
+        self.rect = rect
+        self.rate = rate  # Actualizaciones por segundo (None: cada tick; 0: solo cuando las pide)
+        self.lights = None  # Índices de los semáforos dentro del área
+        self.seq = None  # Último tick enviado (base del siguiente delta)
+        self.keyframe = True  # El siguiente frame es keyframe
+        self.include_map = True  # ... y lleva el recorte del mapa
+        self.polled = False  # El cliente pidió una actualización
+        self.since_keyframe = 0
+        self.car_ids = np.empty(0, dtype=np.int64)  # Coches en el área, ordenados por id
+        self.car_positions = np.empty((0, 2), dtype=np.int64)
+        self.light_states = None
+
+    def move(self, rect):
+        if rect != self.rect:
+            self.rect = rect
+            self.lights = None
+            self.keyframe = self.include_map = True
+
+    def due(self, seq, ticks_per_second):
+        # ¿Le toca un frame en el tick `seq`?
+        if self.seq is None or self.keyframe or self.polled or self.rate is None:
+            return True
+        if self.rate <= 0:
+            return False
+        every = max(1, round(ticks_per_second / self.rate)) if ticks_per_second else 1
+        return seq - self.seq >= every
+
+    def frame(self, tick, cars, lights, encoder):
+        # Frame del área en `tick`; cars y lights son los SpatialIndex de coches (de ese tick) y semáforos
+        if self.lights is None:
+            self.lights = np.sort(lights.query(self.rect))
+        index = cars.query(self.rect)
+        order = np.argsort(tick.car_ids[index], kind='stable')
+        ids, positions = tick.car_ids[index][order], tick.positions[index][order]
+        states = tick.states[self.lights]
+        if self.keyframe or self.since_keyframe >= encoder.keyframe_interval:
+            frame = {'type': 'keyframe', 'seq': tick.seq, 'base': tick.seq, 'viewport': self.rect,
+                     'light_ids': encoder.light_ids[self.lights],
+                     'light_positions': encoder.light_positions[self.lights], 'light_states': states,
+                     'car_ids': ids, 'car_positions': positions}
+            if self.include_map:
+                r0, c0, r1, c1 = self.rect
+                frame['map'] = encoder.model.grid_map[r0:r1, c0:c1]
+            self.since_keyframe = 0
+        else:
+            # Respecto a lo que ya tiene el cliente: coches nuevos en el área o que se movieron, y los que
+            # salieron (con GONE)
+            k = np.minimum(np.searchsorted(self.car_ids, ids), max(len(self.car_ids) - 1, 0))
+            known = (self.car_ids[k] == ids) if len(self.car_ids) else np.zeros(len(ids), dtype=bool)
+            changed = ~known
+            changed[known] = (positions[known] != self.car_positions[k[known]]).any(axis=1)
+            stayed = np.zeros(len(self.car_ids), dtype=bool)
+            stayed[k[known]] = True
+            left = self.car_ids[~stayed]
+            lit = np.flatnonzero(states != self.light_states)
+            frame = {'type': 'delta', 'seq': tick.seq, 'base': self.seq,
+                     'light_ids': encoder.light_ids[self.lights][lit], 'light_states': states[lit],
+                     'car_ids': np.concatenate([left, ids[changed]]),
+                     'car_positions': np.concatenate([np.tile(GONE, (len(left), 1)),
+                                                      positions[changed]]).astype(np.int64)}
+            self.since_keyframe += 1
+        self.seq = tick.seq
+        self.keyframe = self.include_map = self.polled = False
+        self.car_ids, self.car_positions, self.light_states = ids, positions, states
+        return frame
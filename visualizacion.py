@@ -0,0 +1,137 @@
+import argparse
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib import animation
+from matplotlib.colors import ListedColormap
+
+from modelo import TrafficLight, TrafficModel
+from motor_vectorial import STATES
+from protocolo import car_positions, light_states
+
+# Función de animación personalizada (para ap.animate; redibuja todo en cada cuadro)
+def animation_plot(model, ax):
+    ax.clear()
+    grid = model.grid
+    grid_map = model.grid_map
+
+    for x in range(grid_map.shape[0]):
+        for y in range(grid_map.shape[1]):
+            if grid_map[x, y] == 0:
+                ax.add_patch(plt.Rectangle((y, x), 1, 1, color='dimgray'))  # No transitable
+            elif grid_map[x, y] == 1:
+                ax.add_patch(plt.Rectangle((y, x), 1, 1, color='lightgray'))  # Calle
+
+    positions = [grid.positions[agent] for agent in grid.agents]
+
+    colors = []
+    for agent in grid.agents:
+        if isinstance(agent, TrafficLight):
+            if agent.state == "red":
+                colors.append('red')
+            elif agent.state == "yellow":
+                colors.append('yellow')
+            else:
+                colors.append('green')
+        else:
+            colors.append('blue')
+
+    x, y = zip(*positions)
+    ax.scatter(y, x, c=colors, s=100, marker='s')  # 's' es para cuadros
+    ax.set_xlim(-1, grid_map.shape[1])
+    ax.set_ylim(-1, grid_map.shape[0])
+    ax.set_xticks(range(grid_map.shape[1]))
+    ax.set_yticks(range(grid_map.shape[0]))
+    ax.grid(True)
+
+# Mismo dibujo que animation_plot, pero el mapa se pinta una sola vez como imagen
+# y en cada cuadro solo cambian las posiciones y colores de semáforos y coches.
+# Con animated=True esos dos artistas quedan fuera del fondo, que se reutiliza (blitting).
+class Renderer:
+    MAX_TICKS = 50  # En mapas más grandes una marca por celda es ilegible y cara de dibujar
+
+    def __init__(self, model, ax, animated=True):
+        self.model = model
+        self.ax = ax
+        grid_map = model.grid_map
+        rows, cols = grid_map.shape
+
+        # Calle 1, no transitable 0; otros valores quedan sin pintar, como en animation_plot
+        layer = np.ma.masked_where((grid_map != 0) & (grid_map != 1), grid_map)
+        ax.imshow(layer, cmap=ListedColormap(['dimgray', 'lightgray']), vmin=0, vmax=1, origin='lower',
+                  extent=(0, cols, 0, rows), interpolation='nearest', aspect='auto', zorder=0)
+        ax.set_xlim(-1, cols)
+        ax.set_ylim(-1, rows)
+        if cols <= self.MAX_TICKS and rows <= self.MAX_TICKS:
+            ax.set_xticks(range(cols))
+            ax.set_yticks(range(rows))
+        ax.grid(True)
+
+        light_positions = np.array([model.grid.positions[tl] for tl in model.traffic_lights]).reshape(-1, 2)
+        self.lights = ax.scatter(light_positions[:, 1], light_positions[:, 0], s=100, marker='s',
+                                 animated=animated)
+        self.cars = ax.scatter([], [], c='blue', s=100, marker='s', animated=animated)
+
+    def draw(self):
+        # Actualiza los artistas con el estado actual del modelo y los devuelve (para FuncAnimation)
+        self.lights.set_color([STATES[s] for s in light_states(self.model)])
+        self.cars.set_offsets(car_positions(self.model)[:, ::-1])
+        return self.lights, self.cars
+
+    def frame(self, _):
+        self.model.step()
+        return self.draw()
+
+
+def animate(model, fig, ax, steps, interval=100):
+    # Animación en vivo con blitting; el modelo ya debe tener setup()
+    renderer = Renderer(model, ax)
+    return animation.FuncAnimation(fig, renderer.frame, frames=steps, init_func=renderer.draw,
+                                   blit=True, interval=interval, repeat=False)
+
+
+def save_video(model, path, steps, fps=10, dpi=100):
+    # Escribe cada cuadro al archivo en cuanto se dibuja, sin guardar la animación en memoria.
+    # .gif usa Pillow (que sí acumula los cuadros hasta el final); el resto, ffmpeg por tubería.
+    name = 'pillow' if path.endswith('.gif') else 'ffmpeg'
+    if not animation.writers.is_available(name):
+        raise RuntimeError(f"No está disponible el escritor de video '{name}' para {path}")
+    fig, ax = plt.subplots()
+    renderer = Renderer(model, ax, animated=False)
+    writer = animation.writers[name](fps=fps)
+    with writer.saving(fig, path, dpi):
+        renderer.draw()
+        writer.grab_frame()
+        for _ in range(steps):
+            model.step()
+            renderer.draw()
+            writer.grab_frame()
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Animación de TrafficModel")
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--map', default=None, help="Escenario (ver mapas.py); por defecto el cruce de 12x12")
+    parser.add_argument('--engine', default='agents', choices=['agents', 'vector'])
+    parser.add_argument('--video', default=None,
+                        help="Guarda la animación en este archivo (.mp4 con ffmpeg, .gif con Pillow) "
+                             "en vez de mostrarla")
+    parser.add_argument('--fps', type=int, default=10)
+    args = parser.parse_args()
+
+    model = TrafficModel({'map': args.map, 'engine': args.engine})
+    model.setup()
+    if args.video:
+        save_video(model, args.video, args.steps, fps=args.fps)
+        print(f"{args.steps} pasos -> {args.video}")
+    else:
+        fig, ax = plt.subplots()
+        # La animación se detiene si nadie guarda una referencia: se mantiene mientras dure plt.show()
+        _anim = animate(model, fig, ax, args.steps, interval=1000 / args.fps)
+        plt.show()
+
+
+# Ejecución del modelo
+if __name__ == "__main__":
+    main()